@@ -0,0 +1,131 @@
+"""Machine-readable benchmark results: save them as baselines, compare runs.
+
+A result file holds one benchmark's measurements plus the environment they
+were taken in::
+
+    {"benchmark": "primitives", "environment": {...},
+     "metrics": {"rate_limit.sliding_log.c1000.q100": {"value": 812.0,
+                                                       "unit": "ns/op",
+                                                       "better": "lower"}}}
+
+Comparing a run against a baseline flags every metric that got worse by
+more than a threshold; the benchmark scripts then exit non-zero.
+"""
+
+import json
+import os
+import platform
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+# Fraction a metric may get worse by before it counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+class Results:
+    """Measurements of one benchmark run, keyed by metric name."""
+
+    def __init__(self, benchmark: str):
+        self.benchmark = benchmark
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, value: float, unit: str, better: str = 'lower') -> None:
+        """Record a measurement; better is 'lower' or 'higher'."""
+        if better not in ('lower', 'higher'):
+            raise ValueError(f"better must be 'lower' or 'higher', not {better!r}")
+        self.metrics[name] = {'value': value, 'unit': unit, 'better': better}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'benchmark': self.benchmark, 'environment': environment(),
+                'metrics': self.metrics}
+
+
+def environment() -> Dict[str, Any]:
+    """Where the results were measured; differences make comparisons unreliable."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': os.cpu_count()
+    }
+
+
+def save(results: Results, path: str) -> None:
+    """Write results to path as JSON."""
+    with open(path, 'w') as f:
+        json.dump(results.to_dict(), f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Tuple[str, float, float, float, bool]]:
+    """Compare the metrics two result dicts have in common.
+
+    Returns (name, baseline value, current value, change, regressed) rows,
+    where change is the fraction by which the metric got worse (negative
+    if it improved).
+    """
+    rows = []
+    for name, metric in sorted(current['metrics'].items()):
+        base = baseline['metrics'].get(name)
+        if base is None:
+            continue
+        old, new = base['value'], metric['value']
+        if old == 0:
+            change = 0.0 if new == 0 else float('inf')
+        else:
+            change = (new - old) / abs(old)
+        if metric['better'] == 'higher':
+            change = -change
+        rows.append((name, old, new, change, change > threshold))
+    return rows
+
+
+def add_arguments(parser: Any) -> None:
+    """Add the --save, --compare and --threshold options to an argparse parser."""
+    parser.add_argument('--save', metavar='PATH',
+                        help='Write the results to PATH as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='Compare the results against the baseline at PATH')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Fraction a metric may worsen by before it is a regression '
+                             f'(default: {DEFAULT_THRESHOLD})')
+
+
+def finish(results: Results, args: Any) -> int:
+    """Save and compare results as the options ask; returns the exit status."""
+    if args.save:
+        save(results, args.save)
+        print(f'\nSaved {len(results.metrics)} metrics to {args.save}')
+    if not args.compare:
+        return 0
+
+    baseline = load(args.compare)
+    if baseline.get('benchmark') != results.benchmark:
+        print(f'\nWarning: comparing {results.benchmark} against a '
+              f'{baseline.get("benchmark")} baseline')
+    if baseline.get('environment') != environment():
+        print('\nWarning: the baseline was measured in a different environment')
+    rows = compare(baseline, results.to_dict(), args.threshold)
+    return report(rows, args.threshold)
+
+
+def report(rows: List[Tuple[str, float, float, float, bool]], threshold: float,
+           out: Optional[Any] = None) -> int:
+    """Print a comparison; returns 1 if anything regressed, else 0."""
+    out = out or sys.stdout
+    width = max([len(row[0]) for row in rows] + [6])
+    print(f'\n{"metric":<{width}}  {"baseline":>12}  {"current":>12}  {"change":>8}', file=out)
+    regressions = 0
+    for name, old, new, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        regressions += regressed
+        print(f'{name:<{width}}  {old:>12.4g}  {new:>12.4g}  {change:>+8.1%}{flag}', file=out)
+    print(f'\n{regressions} of {len(rows)} metrics regressed by more than {threshold:.0%}', file=out)
+    return 1 if regressions else 0
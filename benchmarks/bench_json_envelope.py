@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Microbenchmark: CPU per request of the proxy's success-response paths.
+
+Compares decoding the upstream body and re-encoding it with jsonify()
+(the path used before JSON splicing) against checking the raw bytes and
+splicing them into the envelope, with each available codec.
+
+Run from the repository root: ``python -m benchmarks.bench_json_envelope``
+"""
+
+import argparse
+import json
+import sys
+import time
+from flask import Flask, Response, jsonify
+
+from benchmarks.baseline import Results, add_arguments, finish
+from src.services.json_codec import JsonCodec, OrjsonCodec, RawJson, check_json_bytes, orjson, splice_json
+
+NOTES = 'Circuit breaker state: CLOSED'
+
+
+def make_body(size: int) -> bytes:
+    """An upstream-like JSON body of roughly size bytes."""
+    records = [{'id': i, 'name': f'item-{i}', 'tags': ['a', 'b'], 'score': i * 0.5}
+               for i in range(max(1, size // 60))]
+    return json.dumps({'status': 'success', 'received_data': records,
+                       'message': 'Data processed successfully'}).encode()
+
+
+def decode_and_jsonify(app: Flask):
+    def run(body: bytes) -> bytes:
+        with app.app_context():
+            response = jsonify({
+                'status': 'success',
+                'external_response': json.loads(body),
+                'proxy_notes': NOTES
+            })
+        return response.get_data()
+    return run
+
+
+def splice(codec):
+    def run(body: bytes) -> bytes:
+        raw = RawJson(check_json_bytes(body, 'application/json'))
+        envelope = {'status': 'success', 'external_response': raw, 'proxy_notes': NOTES}
+        return Response(splice_json(envelope, codec), mimetype='application/json').get_data()
+    return run
+
+
+def cpu_per_call(func, body: bytes, iterations: int) -> float:
+    """Process CPU seconds per call, best of three runs."""
+    func(body)
+    best = float('inf')
+    for _ in range(3):
+        start = time.process_time()
+        for _ in range(iterations):
+            func(body)
+        best = min(best, (time.process_time() - start) / iterations)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 64 * 1024, 1024 * 1024],
+                        help='Upstream body sizes in bytes')
+    parser.add_argument('--budget', type=float, default=0.5,
+                        help='Approximate CPU seconds to spend per measurement')
+    add_arguments(parser)
+    args = parser.parse_args()
+    results = Results('json_envelope')
+
+    paths = [('decode + jsonify', decode_and_jsonify(Flask(__name__))),
+             ('splice (json)', splice(JsonCodec()))]
+    if orjson is not None:
+        paths.append(('splice (orjson)', splice(OrjsonCodec())))
+
+    print(f'{"body":>10}  {"path":<18}{"us/request":>12}{"speedup":>10}')
+    for size in args.sizes:
+        body = make_body(size)
+        probe = cpu_per_call(paths[0][1], body, 1)
+        iterations = max(1, int(args.budget / 3 / max(probe, 1e-6)))
+        baseline = None
+        for name, func in paths:
+            seconds = cpu_per_call(func, body, iterations)
+            baseline = baseline or seconds
+            key = name.replace(' + ', '_').replace(' (', '_').rstrip(')')
+            results.add(f'{key}.{size}', round(seconds * 1e6, 2), 'us/request')
+            print(f'{len(body):>10}  {name:<18}{seconds * 1e6:>12.1f}{baseline / seconds:>9.1f}x')
+
+    return finish(results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Microbenchmarks: cost per call of the rate limiter, circuit breaker and retry delays.
+
+Rate limiters are measured for each algorithm over a grid of tracked client
+counts and per-client quotas. Requests come from clients picked at random,
+so with few clients and small quotas most of them are denied, and with many
+clients most are allowed.
+
+Run from the repository root: ``python -m benchmarks.bench_primitives``
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.baseline import Results, add_arguments, finish
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.rate_limiter import RATE_LIMIT_ALGORITHMS, create_rate_limiter
+from src.services.retry_strategy import RetryStrategy
+
+
+def ns_per_call(run: Callable[[], None], iterations: int, repeats: int = 3) -> float:
+    """Nanoseconds per call when run() makes iterations calls, best of repeats."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter_ns()
+        run()
+        best = min(best, (time.perf_counter_ns() - start) / iterations)
+    return best
+
+
+def bench_rate_limiter(algorithm: str, clients: int, quota: int,
+                       iterations: int) -> Tuple[float, float]:
+    """ns per is_allowed() call and the fraction of calls allowed in the first run.
+
+    Later runs see the quota used up by earlier ones, as a busy limiter would.
+    """
+    limiter = create_rate_limiter(algorithm, window_size=3600, max_requests=quota,
+                                  max_clients=clients)
+    ids = [f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}' for i in range(clients)]
+    for client_id in ids:
+        limiter.is_allowed(client_id)
+
+    picks: List[str] = [random.choice(ids) for _ in range(iterations)]
+    allowed: List[int] = []
+
+    def run() -> None:
+        is_allowed = limiter.is_allowed
+        count = 0
+        for client_id in picks:
+            count += is_allowed(client_id)
+        allowed.append(count)
+
+    return ns_per_call(run, iterations), allowed[0] / iterations
+
+
+def bench_breaker(iterations: int) -> Dict[str, float]:
+    """ns per state check and per admitted call, closed and open."""
+    breaker = CircuitBreaker()
+
+    def get_state() -> None:
+        check = breaker.get_state
+        for _ in range(iterations):
+            check()
+
+    def admit() -> None:
+        acquire, record = breaker.acquire, breaker.record_success
+        for _ in range(iterations):
+            record(acquire())
+
+    timings = {'get_state': ns_per_call(get_state, iterations),
+               'acquire_record.closed': ns_per_call(admit, iterations)}
+
+    opened = CircuitBreaker(reset_timeout=3600)
+    while opened.get_state() != 'OPEN':
+        opened.record_failure(opened.acquire())
+
+    def reject() -> None:
+        acquire = opened.acquire
+        for _ in range(iterations):
+            acquire()
+
+    timings['acquire.open'] = ns_per_call(reject, iterations)
+    return timings
+
+
+def bench_retry_delay(iterations: int, jitter: bool) -> float:
+    """ns per _calculate_delay() call, cycling through attempts 1 to 5."""
+    strategy = RetryStrategy(max_attempts=5, jitter=jitter)
+    attempts = ([1, 2, 3, 4, 5] * (iterations // 5 + 1))[:iterations]
+
+    def run() -> None:
+        calculate = strategy._calculate_delay
+        for attempt in attempts:
+            calculate(attempt)
+
+    return ns_per_call(run, iterations)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--algorithms', nargs='+', default=sorted(RATE_LIMIT_ALGORITHMS),
+                        choices=sorted(RATE_LIMIT_ALGORITHMS), help='Rate limit algorithms')
+    parser.add_argument('--clients', type=int, nargs='+',
+                        default=[10, 1000, 100_000, 1_000_000], help='Tracked client counts')
+    parser.add_argument('--quotas', type=int, nargs='+', default=[10, 100, 1000, 10_000],
+                        help='Requests allowed per client per window')
+    parser.add_argument('--iterations', type=int, default=200_000,
+                        help='Calls per measurement')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for client picks')
+    add_arguments(parser)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    # Breaker transitions log warnings; keep them out of the output and timings
+    logging.disable(logging.WARNING)
+    results = Results('primitives')
+
+    print(f'{"benchmark":<44}{"ns/op":>10}{"allowed":>10}')
+    for algorithm in args.algorithms:
+        for clients in args.clients:
+            for quota in args.quotas:
+                ns, allowed = bench_rate_limiter(algorithm, clients, quota, args.iterations)
+                name = f'rate_limit.{algorithm}.c{clients}.q{quota}'
+                results.add(name, round(ns, 1), 'ns/op')
+                print(f'{name:<44}{ns:>10.0f}{allowed:>10.0%}', flush=True)
+
+    for check, ns in bench_breaker(args.iterations).items():
+        name = f'circuit_breaker.{check}'
+        results.add(name, round(ns, 1), 'ns/op')
+        print(f'{name:<44}{ns:>10.0f}')
+
+    for jitter in (False, True):
+        name = f'retry.calculate_delay.{"jitter" if jitter else "no_jitter"}'
+        ns = bench_retry_delay(args.iterations, jitter)
+        results.add(name, round(ns, 1), 'ns/op')
+        print(f'{name:<44}{ns:>10.0f}')
+
+    return finish(results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
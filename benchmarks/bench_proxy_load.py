@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""End-to-end load test: throughput, latency percentiles and memory of /api/proxy/data.
+
+Starts the mock upstream and the proxy as subprocesses on free local ports,
+then drives POST /api/proxy/data at each concurrency level for a fixed time
+with one keep-alive connection per simulated client. Reports requests per
+second, p50/p99/p99.9 latency, the error rate and the proxy's resident
+memory (Linux only).
+
+Run from the repository root: ``python -m benchmarks.bench_proxy_load``
+
+The load generator shares the machine with both servers, so compare results
+only against baselines taken on the same machine with the same options.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks.baseline import Results, add_arguments, finish
+
+PAYLOAD = {'query': 'benchmark', 'items': list(range(10))}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(app: str, port: int, env: Dict[str, str], health: str) -> subprocess.Popen:
+    """Start a server from benchmarks.serve and wait until it answers health checks."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serve', app, '--port', str(port)],
+        env=dict(os.environ, **env), stdout=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}{health}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{app} exited with status {process.returncode}')
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{app} did not become healthy at {url}')
+
+
+def rss_mb(pid: int, field: str = 'VmRSS') -> Optional[float]:
+    """Resident memory of a process in MB from /proc, or None where unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not ordered:
+        return float('nan')
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def drive(url: str, concurrency: int, duration: float) -> Dict[str, float]:
+    """Send requests from concurrency clients for duration seconds."""
+    latencies: List[List[float]] = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+    stop_at = [0.0]
+
+    def client(index: int) -> None:
+        session = requests.Session()
+        own_latencies = latencies[index]
+        start_barrier.wait()
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at[0]:
+                break
+            try:
+                ok = session.post(url, json=PAYLOAD, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            own_latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors[index] += 1
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True)
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    stop_at[0] = time.perf_counter() + duration
+    began = time.perf_counter()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    ordered = sorted(latency for own in latencies for latency in own)
+    total = len(ordered)
+    return {
+        'requests': total,
+        'throughput_rps': total / elapsed,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'p999_ms': percentile(ordered, 0.999) * 1000,
+        'error_rate': sum(errors) / total if total else 1.0
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', choices=['proxy', 'async-proxy'], default='proxy',
+                        help='Flask (threaded WSGI) or Quart (ASGI) proxy')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64],
+                        help='Concurrent clients per level')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Seconds to run each level')
+    parser.add_argument('--warmup', type=float, default=2.0,
+                        help='Seconds of load before the first level, not measured')
+    parser.add_argument('--upstream-latency-ms', type=int, default=5,
+                        help='Latency of the mock upstream')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    mock_port, proxy_port = free_port(), free_port()
+    mock = start('mock', mock_port, {
+        'EXTERNAL_FAIL_RATE': '0',
+        'EXTERNAL_LATENCY_MS': str(args.upstream_latency_ms)
+    }, '/health')
+    try:
+        proxy = start(args.app, proxy_port, {
+            'EXTERNAL_SERVICE_URL': f'http://127.0.0.1:{mock_port}/external-api/process',
+            'RATE_LIMIT_MAX_REQUESTS': str(10 ** 9),
+            'HTTP_POOL_SIZE': str(max(args.concurrency)),
+        }, '/api/health')
+    except Exception:
+        mock.kill()
+        raise
+
+    url = f'http://127.0.0.1:{proxy_port}/api/proxy/data'
+    results = Results(f'proxy_load.{args.app}')
+    try:
+        drive(url, max(args.concurrency), args.warmup)
+        print(f'{"clients":>8}{"req/s":>10}{"p50 ms":>10}{"p99 ms":>10}'
+              f'{"p99.9 ms":>10}{"errors":>8}{"RSS MB":>9}')
+        for concurrency in args.concurrency:
+            stats = drive(url, concurrency, args.duration)
+            memory = rss_mb(proxy.pid)
+            prefix = f'c{concurrency}'
+            results.add(f'{prefix}.throughput_rps', round(stats['throughput_rps'], 1),
+                        'req/s', better='higher')
+            for key in ('p50_ms', 'p99_ms', 'p999_ms'):
+                results.add(f'{prefix}.{key}', round(stats[key], 3), 'ms')
+            results.add(f'{prefix}.error_rate', round(stats['error_rate'], 5), 'fraction')
+            if memory is not None:
+                results.add(f'{prefix}.rss_mb', round(memory, 1), 'MB')
+            print(f'{concurrency:>8}{stats["throughput_rps"]:>10.0f}{stats["p50_ms"]:>10.2f}'
+                  f'{stats["p99_ms"]:>10.2f}{stats["p999_ms"]:>10.2f}'
+                  f'{stats["error_rate"]:>8.1%}'
+                  f'{memory if memory is not None else float("nan"):>9.1f}', flush=True)
+        peak = rss_mb(proxy.pid, 'VmHWM')
+        if peak is not None:
+            results.add('peak_rss_mb', round(peak, 1), 'MB')
+            print(f'\nPeak proxy RSS: {peak:.1f} MB')
+    finally:
+        for process in (proxy, mock):
+            process.terminate()
+            process.wait(timeout=10)
+
+    return finish(results, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Run the proxy or the mock upstream in this process, for load benchmarks.
+
+``python -m benchmarks.serve {proxy,async-proxy,mock} --port PORT``
+
+The apps are configured from the environment as usual. Request logging is
+turned down so it doesn't dominate the measurements.
+"""
+
+import argparse
+import asyncio
+import logging
+
+
+def serve_wsgi(app, port: int) -> None:
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def serve_asgi(app, port: int) -> None:
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    config = Config()
+    config.bind = [f'127.0.0.1:{port}']
+    config.accesslog = None
+    asyncio.run(serve(app, config))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('app', choices=['proxy', 'async-proxy', 'mock'])
+    parser.add_argument('--port', type=int, required=True)
+    args = parser.parse_args()
+
+    if args.app == 'proxy':
+        from src.main import create_app
+        app = create_app()
+    elif args.app == 'async-proxy':
+        from src.asgi import app
+    else:
+        from external_mock_service.app import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.app in ('async-proxy', 'mock'):
+        serve_asgi(app, args.port)
+    else:
+        serve_wsgi(app, args.port)
+
+
+if __name__ == '__main__':
+    main()
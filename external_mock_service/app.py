@@ -1,49 +1,362 @@
-"""Mock external service for testing the proxy."""
+"""Mock external service for testing and load testing the proxy.
 
-from flask import Flask, request, jsonify
+Latency and faults are drawn per request from a fault profile, which can be
+changed while the service runs through /control/faults. Run it under an ASGI
+server (``hypercorn app:app``) so slow and hanging responses only hold a
+coroutine, not a worker.
+"""
+
+from quart import Quart, Response, request, jsonify
 import os
+import json
+import math
 import time
 import random
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+app = Quart(__name__)
 
-# Configuration
-FAIL_RATE = float(os.getenv('EXTERNAL_FAIL_RATE', '0.2'))
-LATENCY_MS = int(os.getenv('EXTERNAL_LATENCY_MS', '50'))
+LATENCY_DISTRIBUTIONS = ('fixed', 'lognormal', 'bimodal', 'long_tail')
+FAULTS = ('error', 'throttle', 'timeout', 'hang', 'reset', 'drip')
 
+# Fault profile settings and their defaults
+DEFAULT_PROFILE = {
+    # Latency: 'fixed' at latency_ms; 'lognormal' with median latency_ms;
+    # 'bimodal', slow_ms for slow_fraction of requests, else latency_ms;
+    # 'long_tail', Pareto from latency_ms up (smaller tail_alpha, heavier tail)
+    'latency': 'fixed',
+    'latency_ms': int(os.getenv('EXTERNAL_LATENCY_MS', '50')),
+    'latency_sigma': 0.5,
+    'slow_ms': 1000,
+    'slow_fraction': 0.05,
+    'tail_alpha': 1.5,
+    'max_latency_ms': 30000,
+    # Fraction of requests answered with 500
+    'fail_rate': float(os.getenv('EXTERNAL_FAIL_RATE', '0.2')),
+    # Fraction answered with throttle_status (429 or 503) and Retry-After
+    'throttle_rate': 0.0,
+    'throttle_status': 429,
+    'retry_after_seconds': 1,
+    # Fraction answered only after timeout_ms, past the caller's timeout
+    'timeout_rate': 0.0,
+    'timeout_ms': 15000,
+    # Fraction never answered; the connection is dropped after hang_seconds
+    'hang_rate': 0.0,
+    'hang_seconds': 300,
+    # Fraction whose connection is dropped partway through the body
+    'reset_rate': 0.0,
+    # Fraction whose body is sent drip_chunk_bytes every drip_interval_ms
+    'drip_rate': 0.0,
+    'drip_chunk_bytes': 16,
+    'drip_interval_ms': 100,
+}
 
-@app.route('/external-api/process', methods=['POST'])
-def process_data():
-    """Mock external API endpoint."""
-    # Apply latency
-    time.sleep(LATENCY_MS / 1000.0)
-    
-    # Simulate failures
-    if random.random() < FAIL_RATE:
-        logger.warning('Simulating external service failure')
-        return jsonify({
+RATE_SETTINGS = ('fail_rate', 'throttle_rate', 'timeout_rate', 'hang_rate',
+                 'reset_rate', 'drip_rate')
+
+
+def validate_profile(settings):
+    """Check fault profile settings; raises ValueError naming the bad one."""
+    if not isinstance(settings, dict):
+        raise ValueError('Expected a JSON object of settings')
+    for name, value in settings.items():
+        if name not in DEFAULT_PROFILE:
+            raise ValueError(f'Unknown setting {name!r}')
+        if name == 'latency':
+            if value not in LATENCY_DISTRIBUTIONS:
+                raise ValueError(f'latency must be one of {list(LATENCY_DISTRIBUTIONS)}')
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f'{name} must be a non-negative number')
+        elif name in RATE_SETTINGS or name == 'slow_fraction':
+            if value > 1:
+                raise ValueError(f'{name} must be between 0 and 1')
+        elif name == 'throttle_status' and value not in (429, 503):
+            raise ValueError('throttle_status must be 429 or 503')
+        elif name in ('tail_alpha', 'drip_chunk_bytes') and value == 0:
+            raise ValueError(f'{name} must be positive')
+
+
+def validate_schedule(schedule):
+    """Check an outage schedule: a list of phases, each {"seconds": n, <settings>}."""
+    if not isinstance(schedule, list):
+        raise ValueError('schedule must be a list of phases')
+    for phase in schedule:
+        if not isinstance(phase, dict):
+            raise ValueError('Each schedule phase must be an object')
+        seconds = phase.get('seconds')
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or seconds <= 0:
+            raise ValueError('Each schedule phase needs positive "seconds"')
+        validate_profile({k: v for k, v in phase.items() if k != 'seconds'})
+
+
+class FaultInjector:
+    """Draws each request's latency and fault from the current fault profile.
+
+    The profile is a base set of settings plus an optional schedule of
+    phases, each overriding some settings for a number of seconds, so
+    outages can start and end on their own. The schedule runs once from
+    when it is set, or loops if repeat is set.
+    """
+
+    def __init__(self, base=None, rng=None, clock=time.monotonic):
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.defaults = dict(DEFAULT_PROFILE, **(base or {}))
+        validate_profile(self.defaults)
+        self.reset()
+
+    def reset(self):
+        """Go back to the default profile with no schedule."""
+        self.base = dict(self.defaults)
+        self.schedule = []
+        self.repeat = False
+        self.schedule_start = self.clock()
+        self.counts = {fault: 0 for fault in ('ok',) + FAULTS}
+
+    def configure(self, settings, replace=False):
+        """Apply {"profile": {...}, "schedule": [...], "repeat": bool}.
+
+        With replace, unspecified settings return to their defaults and
+        any schedule is cleared; otherwise they are kept.
+        """
+        if not isinstance(settings, dict):
+            raise ValueError('Expected a JSON object')
+        unknown = set(settings) - {'profile', 'schedule', 'repeat'}
+        if unknown:
+            raise ValueError(f'Unknown fields {sorted(unknown)}')
+        profile = settings.get('profile', {})
+        validate_profile(profile)
+        if 'schedule' in settings:
+            validate_schedule(settings['schedule'])
+
+        base = dict(self.defaults) if replace else dict(self.base)
+        base.update(profile)
+        self._check_rates(base)
+        for phase in settings.get('schedule', []):
+            self._check_rates(dict(base, **phase))
+
+        self.base = base
+        if replace or 'schedule' in settings:
+            self.schedule = [dict(phase) for phase in settings.get('schedule', [])]
+            self.schedule_start = self.clock()
+        if replace or 'repeat' in settings:
+            self.repeat = bool(settings.get('repeat', False))
+
+    @staticmethod
+    def _check_rates(profile):
+        if sum(profile[name] for name in RATE_SETTINGS) > 1:
+            raise ValueError(f'The fault rates {list(RATE_SETTINGS)} add up to more than 1')
+
+    def active_phase(self):
+        """Index of the schedule phase in effect, or None."""
+        if not self.schedule:
+            return None
+        elapsed = self.clock() - self.schedule_start
+        total = sum(phase['seconds'] for phase in self.schedule)
+        if self.repeat:
+            elapsed %= total
+        for index, phase in enumerate(self.schedule):
+            if elapsed < phase['seconds']:
+                return index
+            elapsed -= phase['seconds']
+        return None
+
+    def profile(self):
+        """The settings in effect now: the base overridden by the active phase."""
+        index = self.active_phase()
+        if index is None:
+            return self.base
+        phase = self.schedule[index]
+        return dict(self.base, **{k: v for k, v in phase.items() if k != 'seconds'})
+
+    def latency_ms(self, profile):
+        """Draw a response latency from the profile's distribution."""
+        base = profile['latency_ms']
+        distribution = profile['latency']
+        if distribution == 'lognormal':
+            latency = base * math.exp(profile['latency_sigma'] * self.rng.gauss(0, 1))
+        elif distribution == 'bimodal':
+            slow = self.rng.random() < profile['slow_fraction']
+            latency = profile['slow_ms'] if slow else base
+        elif distribution == 'long_tail':
+            latency = base * self.rng.paretovariate(profile['tail_alpha'])
+        else:
+            latency = base
+        return min(latency, profile['max_latency_ms'])
+
+    def decide(self, call_errors=True):
+        """Draw this request's (fault or None, latency in ms, profile).
+
+        Without call_errors, 500s are left to item_fails() (batch calls).
+        """
+        profile = self.profile()
+        draw = self.rng.random()
+        fault = None
+        for name, rate in zip(FAULTS, RATE_SETTINGS):
+            if name == 'error' and not call_errors:
+                continue
+            if draw < profile[rate]:
+                fault = name
+                break
+            draw -= profile[rate]
+        self.counts[fault or 'ok'] += 1
+        return fault, self.latency_ms(profile), profile
+
+    def item_fails(self, profile):
+        """Whether one item of a batch call fails."""
+        return self.rng.random() < profile['fail_rate']
+
+    def describe(self):
+        """Profile, schedule and outcome counts, for the control endpoint."""
+        return {
+            'profile': self.base,
+            'schedule': self.schedule,
+            'repeat': self.repeat,
+            'active_phase': self.active_phase(),
+            'effective': self.profile(),
+            'counts': self.counts
+        }
+
+
+faults = FaultInjector(json.loads(os.getenv('EXTERNAL_FAULTS', '{}')))
+
+
+def _process(data, failed=False):
+    """Process one payload; returns the response body and status code."""
+    if failed:
+        return {
             'status': 'error',
             'message': 'Simulated external service failure'
-        }), 500
-    
-    # Process request
-    data = request.get_json()
-    logger.info(f'Processing request: {data}')
-    
-    return jsonify({
+        }, 500
+
+    # Bodies aren't logged above DEBUG, so logging never limits throughput
+    logger.debug(f'Processing request: {data}')
+
+    return {
         'status': 'success',
         'received_data': data,
         'processed_at': time.time(),
         'message': 'Data processed successfully by external service'
-    }), 200
+    }, 200
+
+
+async def _respond(fault, latency_ms, profile, make_body):
+    """Wait out the latency, then answer as the drawn fault dictates."""
+    if fault == 'hang':
+        await asyncio.sleep(profile['hang_seconds'])
+        return _dropped(b'')
+    await asyncio.sleep((profile['timeout_ms'] if fault == 'timeout' else latency_ms) / 1000.0)
+
+    if fault == 'throttle':
+        return jsonify({
+            'status': 'error',
+            'message': 'Simulated throttling'
+        }), profile['throttle_status'], {'Retry-After': str(profile['retry_after_seconds'])}
+    if fault == 'error':
+        body, status_code = _process(None, failed=True)
+        return jsonify(body), status_code
+
+    body, status_code = make_body()
+    if fault == 'reset':
+        encoded = json.dumps(body).encode()
+        return _dropped(encoded[:len(encoded) // 2])
+    if fault == 'drip':
+        return _drip(json.dumps(body).encode(), profile), status_code
+    return jsonify(body), status_code
+
+
+def _dropped(partial):
+    """A response whose connection is closed after partial bytes of the body."""
+    async def chunks():
+        if partial:
+            yield partial
+        raise ConnectionResetError('Simulated connection reset')
+
+    return Response(chunks(), content_type='application/json')
+
+
+def _drip(body, profile):
+    """A response sending body a few bytes at a time."""
+    size = int(profile['drip_chunk_bytes'])
+    interval = profile['drip_interval_ms'] / 1000.0
+
+    async def chunks():
+        for start in range(0, len(body), size):
+            if start:
+                await asyncio.sleep(interval)
+            yield body[start:start + size]
+
+    return Response(chunks(), content_type='application/json')
+
+
+@app.route('/external-api/process', methods=['POST'])
+async def process_data():
+    """Mock external API endpoint."""
+    fault, latency_ms, profile = faults.decide()
+    data = await request.get_json(silent=True)
+    return await _respond(fault, latency_ms, profile, lambda: _process(data))
+
+
+@app.route('/external-api/process/batch', methods=['POST'])
+async def process_batch():
+    """Mock bulk endpoint: {"items": [...]} in, one result per item out.
+
+    Latency and connection faults apply once per call; failures are
+    simulated per item.
+    """
+    fault, latency_ms, profile = faults.decide(call_errors=False)
+    payload = await request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'Expected {"items": [...]}'
+        }), 400
+
+    def make_body():
+        results = []
+        for item in items:
+            body, status_code = _process(item, faults.item_fails(profile))
+            results.append({'status_code': status_code, 'body': body})
+        return {'status': 'success', 'results': results}, 200
+
+    return await _respond(fault, latency_ms, profile, make_body)
+
+
+@app.route('/control/faults', methods=['GET'])
+async def get_faults():
+    """Current fault profile, schedule and outcome counts."""
+    return jsonify(faults.describe()), 200
+
+
+@app.route('/control/faults', methods=['PUT', 'PATCH'])
+async def set_faults():
+    """Change the fault profile: PUT replaces it, PATCH updates it.
+
+    Body: {"profile": {<settings>}, "schedule": [{"seconds": n, <settings>}],
+    "repeat": bool}, every field optional.
+    """
+    try:
+        faults.configure(await request.get_json(silent=True), replace=request.method == 'PUT')
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    logger.info(f'Fault profile changed: {faults.describe()["effective"]}')
+    return jsonify(faults.describe()), 200
+
+
+@app.route('/control/faults', methods=['DELETE'])
+async def reset_faults():
+    """Return to the profile the service started with."""
+    faults.reset()
+    return jsonify(faults.describe()), 200
 
 
 @app.route('/health', methods=['GET'])
-def health():
+async def health():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
@@ -54,5 +367,5 @@ def health():
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5001))
     logger.info(f'Starting mock external service on port {port}')
-    logger.info(f'Configured failure rate: {FAIL_RATE}, latency: {LATENCY_MS}ms')
+    logger.info(f'Fault profile: {faults.profile()}')
     app.run(host='0.0.0.0', port=port, debug=False)
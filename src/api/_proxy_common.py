@@ -0,0 +1,322 @@
+"""Request handling shared by the Flask and Quart proxy routes.
+
+Nothing here does I/O or touches a framework's request globals: the
+routes pass in their app and request headers, and get back plain
+(body, status[, headers]) tuples, which both frameworks turn into JSON
+responses. Only the parts that wait on the network or a queue live in
+proxy_routes and async_proxy_routes.
+"""
+
+import time
+import logging
+import functools
+from src.services.bulkhead import BulkheadRejected
+from src.services.circuit_breaker import CircuitOpenError
+from src.services.concurrency_limiter import ConcurrencyLimitExceeded
+from src.services.circuit_breaker_registry import is_failure_status, is_upstream_failure
+from src.services.deadline import DEADLINE_HEADER, Deadline
+from src.services.hedging import IDEMPOTENT_HEADER
+from src.services.json_codec import RawJson, splice_json
+from src.services.metrics import AsyncUpstreamCall, UpstreamCall
+from src.services.response_cache import CACHE_HEADER, canonical_key, wants_cache
+from src.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_OPEN_MESSAGE = 'External service is currently unavailable (Circuit Open).'
+CONCURRENCY_LIMIT_MESSAGE = 'External service is at its concurrency limit.'
+DEADLINE_MESSAGE = 'Request deadline exceeded.'
+UNEXPECTED_MESSAGE = 'An unexpected error occurred.'
+
+
+def error(message, status, headers=None, **fields):
+    """Error envelope response."""
+    body = {'status': 'error', 'message': message, **fields}
+    return (body, status, headers) if headers else (body, status)
+
+
+def check_rate_limit(app, client_id, cost=1):
+    """None if the client may make cost requests, else the 429 response."""
+    with span('rate_limit'):
+        allowed = app.rate_limiter.is_allowed(client_id, cost=cost)
+    app.metrics.record_rate_limit(allowed, cost=cost)
+    if allowed:
+        return None
+    reset_time = app.rate_limiter.get_reset_time(client_id)
+    return error('Rate limit exceeded. Please try again later.', 429,
+                 {'Retry-After': str(max(1, reset_time))})
+
+
+def request_deadline(app, headers):
+    """Deadline every attempt and backoff of the request must fit in."""
+    return Deadline.from_header(headers.get(DEADLINE_HEADER),
+                                app.config['REQUEST_DEADLINE_SECONDS'])
+
+
+def cache_lookup(app, headers, data):
+    """Cache key of the request if the caller opts in, and the cached hit response."""
+    if app.response_cache is None or not wants_cache(headers.get(CACHE_HEADER)):
+        return None, None
+    with span('cache'):
+        cache_key = canonical_key('POST', app.config.get('EXTERNAL_SERVICE_URL'), data)
+        cached = app.response_cache.get(cache_key)
+    if cached is None:
+        return cache_key, None
+    return cache_key, ({
+        'status': 'success',
+        'external_response': cached,
+        'proxy_notes': 'Served from response cache'
+    }, 200, {CACHE_HEADER: 'HIT'})
+
+
+class CallPlan:
+    """How proxy_data sends one request upstream."""
+
+    __slots__ = ('breaker', 'cb_state', 'hedge', 'raw', 'flight_key')
+
+    def __init__(self, app, headers, data, cache_key):
+        # Circuit breaker for the upstream endpoint the call goes to
+        self.breaker = breaker_for(app, cache_key)
+        self.cb_state = self.breaker.get_state()
+
+        # Only requests marked idempotent may be sent twice (hedged) or merged
+        idempotent = bool(headers.get(IDEMPOTENT_HEADER))
+        self.hedge = app.hedger is not None and idempotent
+
+        # Success bodies are spliced into the response without being decoded
+        self.raw = app.config['JSON_SPLICE_ENABLED']
+
+        # Identical concurrent lookups share one upstream call
+        self.flight_key = None
+        if app.single_flight is not None and (cache_key or idempotent):
+            self.flight_key = cache_key or canonical_key(
+                'POST', app.config.get('EXTERNAL_SERVICE_URL'), data
+            )
+
+
+def breaker_for(app, cache_key):
+    """Breaker for the upstream endpoint call_upstream will send the call to.
+
+    Micro-batched calls go out in bulk calls to MICRO_BATCH_ENDPOINT, so
+    they are charged to that endpoint's breaker.
+    """
+    endpoint = ''
+    if cache_key is None and app.micro_batcher is not None:
+        endpoint = app.config['MICRO_BATCH_ENDPOINT']
+    return app.circuit_breakers.for_endpoint(app.config.get('EXTERNAL_SERVICE_URL'), endpoint)
+
+
+def bulkhead_rejected(e: BulkheadRejected):
+    """503 response for a request the bulkhead turned away."""
+    return error('Service is overloaded. Please try again later.', 503,
+                 {'Retry-After': str(e.retry_after)})
+
+
+def refused(e):
+    """503 response for a call refused by the breaker or concurrency limit."""
+    if isinstance(e, CircuitOpenError):
+        return error(CIRCUIT_OPEN_MESSAGE, 503)
+    return error(CONCURRENCY_LIMIT_MESSAGE, 503)
+
+
+def upstream_error(e, deadline, plan, external_url):
+    """Response for an upstream call that raised e."""
+    if isinstance(e, CircuitOpenError):
+        logger.warning(f'Circuit breaker for {external_url} is {plan.cb_state}, rejecting request')
+    if isinstance(e, (CircuitOpenError, ConcurrencyLimitExceeded)):
+        return refused(e)
+
+    logger.error(f'Failed to call external service: {str(e)}')
+    if deadline.expired():
+        return error(DEADLINE_MESSAGE, 504)
+    return error(UNEXPECTED_MESSAGE, 500, circuit_state=plan.breaker.get_state())
+
+
+def success(app, external_response, plan, cache_key):
+    """Success envelope response, splicing a RawJson body in undecoded."""
+    envelope = {
+        'status': 'success',
+        'external_response': external_response,
+        'proxy_notes': f'Circuit breaker state: {plan.cb_state}'
+    }
+    headers = {CACHE_HEADER: 'MISS'} if cache_key else {}
+    with span('encode'):
+        if isinstance(external_response, RawJson):
+            body = splice_json(envelope, app.json_codec, sort_keys=app.json.sort_keys,
+                               ensure_ascii=app.json.ensure_ascii)
+            return app.response_class(body, mimetype='application/json'), 200, headers
+        return envelope, 200, headers
+
+
+def internal_error(route, e):
+    """500 response for an error the route didn't expect."""
+    logger.error(f'Error in {route}: {str(e)}')
+    return error('Internal server error', 500)
+
+
+def acquire_upstream(app, breaker):
+    """Take a concurrency slot and breaker permit for an upstream call.
+
+    Raises ConcurrencyLimitExceeded or CircuitOpenError if either is
+    refused; calls beyond the adaptive concurrency limit fail fast.
+    """
+    limiter = app.concurrency_limiter
+    if limiter is not None and not limiter.try_acquire():
+        raise ConcurrencyLimitExceeded('Upstream concurrency limit reached')
+
+    permit = breaker.acquire()
+    if permit is None:
+        if limiter is not None:
+            limiter.release()
+        raise CircuitOpenError('Circuit breaker is OPEN')
+    return permit
+
+
+def upstream_call(app, cache_key, hedge, raw, asynchronous=False):
+    """The client call call_upstream retries, wrapped to time each attempt.
+
+    With raw, a plain call returns the body undecoded as RawJson.
+    """
+    client = app.client_registry.get(app.config.get('EXTERNAL_SERVICE_URL'))
+
+    # Cacheable calls also need the response headers (Cache-Control); the
+    # rest go through the micro-batcher, if enabled, to share a bulk call
+    if cache_key is not None:
+        call = client.post_with_headers
+    elif app.micro_batcher is not None:
+        batcher = app.micro_batcher
+        call = batcher.submit_async if asynchronous else batcher.submit
+    elif raw:
+        call = functools.partial(client.post_raw, strict=app.config['JSON_SPLICE_STRICT'])
+    else:
+        call = client.post
+    if hedge:
+        execute = app.hedger.execute_async if asynchronous else app.hedger.execute
+        call = functools.partial(execute, call)
+
+    # Times each attempt and counts them for the metrics
+    return (AsyncUpstreamCall if asynchronous else UpstreamCall)(app.metrics, call)
+
+
+def upstream_failed(app, breaker, permit, call, start, e, deadline):
+    """Report a failed upstream call to the breaker and concurrency limiter.
+
+    Client errors and calls cut short by the caller's deadline don't count
+    against the upstream.
+    """
+    failed = is_upstream_failure(e) and not deadline.expired()
+    if failed:
+        breaker.record_failure(permit, time.monotonic() - start)
+    else:
+        breaker.record_success(permit, time.monotonic() - start)
+    if app.concurrency_limiter is not None:
+        app.concurrency_limiter.release(
+            None if deadline.expired() else call.last_seconds, dropped=failed
+        )
+
+
+def upstream_succeeded(app, breaker, permit, call, start, cache_key, external_response):
+    """Report a successful upstream call; caches the response if keyed and returns it."""
+    breaker.record_success(permit, time.monotonic() - start)
+    if app.concurrency_limiter is not None:
+        app.concurrency_limiter.release(call.last_seconds)
+
+    if cache_key is not None:
+        external_response, response_headers = external_response
+        app.response_cache.put(cache_key, external_response, response_headers)
+    return external_response
+
+
+def stream_failed(app, breaker, permit, start, e, deadline):
+    """Report a stream that couldn't be started; returns the error response."""
+    app.metrics.record_upstream(time.monotonic() - start, None)
+    logger.error(f'Failed to stream to external service: {str(e)}')
+    limiter = app.concurrency_limiter
+    if deadline.expired():
+        breaker.record_success(permit, time.monotonic() - start)
+        if limiter is not None:
+            limiter.release()
+        return error(DEADLINE_MESSAGE, 504)
+    breaker.record_failure(permit, time.monotonic() - start)
+    if limiter is not None:
+        limiter.release(time.monotonic() - start, dropped=True)
+    return error(UNEXPECTED_MESSAGE, 500, circuit_state=breaker.get_state())
+
+
+def stream_started(app, breaker, permit, start, status_code):
+    """Report a stream whose response headers arrived.
+
+    The breaker and limiter judge the upstream by its status and time to
+    headers; the body is relayed outside the concurrency limit.
+    """
+    app.metrics.record_upstream(time.monotonic() - start, status_code)
+    failed = is_failure_status(status_code)
+    if failed:
+        breaker.record_failure(permit, time.monotonic() - start)
+    else:
+        breaker.record_success(permit, time.monotonic() - start)
+    if app.concurrency_limiter is not None:
+        app.concurrency_limiter.release(time.monotonic() - start, dropped=failed)
+
+
+def batch_items(app, payload):
+    """Item payloads of a batch request body, or the 4xx response if it's invalid.
+
+    The body is a JSON array of payloads or {"items": [...]}.
+    """
+    if isinstance(payload, dict):
+        payload = payload.get('items')
+    if not isinstance(payload, list) or not payload:
+        return None, error('Batch must be a non-empty JSON array of payloads.', 400)
+    max_size = app.config['PROXY_BATCH_MAX_SIZE']
+    if len(payload) > max_size:
+        return None, error(f'Batch exceeds the maximum of {max_size} items.', 413)
+    return payload, None
+
+
+def batch_result(outcome, deadline):
+    """Per-item entry of a batch response, with the status proxy_data would give."""
+    if not isinstance(outcome, Exception):
+        return {'status': 'success', 'status_code': 200, 'external_response': outcome}
+
+    if isinstance(outcome, CircuitOpenError):
+        status_code, message = 503, CIRCUIT_OPEN_MESSAGE
+    elif isinstance(outcome, ConcurrencyLimitExceeded):
+        status_code, message = 503, CONCURRENCY_LIMIT_MESSAGE
+    elif deadline.expired():
+        status_code, message = 504, DEADLINE_MESSAGE
+    else:
+        status_code, message = 500, UNEXPECTED_MESSAGE
+    return {'status': 'error', 'status_code': status_code, 'message': message}
+
+
+def batch_response(outcomes, deadline):
+    """Batch response with each item's result and the success and failure counts."""
+    results = [batch_result(outcome, deadline) for outcome in outcomes]
+    failed = sum(1 for result in results if result['status'] != 'success')
+    return {
+        'status': 'success',
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed
+    }, 200
+
+
+def health_report(app):
+    """Health check response: the state of every resilience component."""
+    return {
+        'status': 'healthy',
+        'circuit_breakers': app.circuit_breakers.get_summary(),
+        'connection_pools': app.client_registry.get_stats(),
+        'rate_limiter': app.rate_limiter.get_stats(),
+        'retry_budget': app.retry_budget.get_stats() if app.retry_budget else None,
+        'hedging': app.hedger.get_stats() if app.hedger else None,
+        'response_cache': app.response_cache.get_stats() if app.response_cache else None,
+        'single_flight': app.single_flight.get_stats() if app.single_flight else None,
+        'micro_batching': app.micro_batcher.get_stats() if app.micro_batcher else None,
+        'concurrency_limit': (app.concurrency_limiter.get_stats()
+                              if app.concurrency_limiter else None),
+        'bulkhead': app.bulkhead.get_stats() if app.bulkhead else None,
+        'adaptive_timeouts': (app.adaptive_timeout.get_stats()
+                              if app.adaptive_timeout else None)
+    }, 200
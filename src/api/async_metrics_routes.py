@@ -0,0 +1,40 @@
+"""Prometheus metrics endpoint and request instrumentation (ASGI mode)."""
+
+from quart import Blueprint, Response, current_app, g, request
+import time
+from src.services.metrics import CONTENT_TYPE
+
+async_metrics_bp = Blueprint('async_metrics', __name__)
+
+
+@async_metrics_bp.before_app_request
+async def start_request_timer():
+    """Count the request as in flight and start timing it."""
+    g.metrics_start = time.perf_counter()
+    current_app.metrics.in_flight.inc()
+
+
+@async_metrics_bp.after_app_request
+async def remember_status(response):
+    """Keep the response status for the request's latency series."""
+    g.metrics_status = response.status_code
+    return response
+
+
+@async_metrics_bp.teardown_app_request
+async def record_request(error=None):
+    """Observe the request's latency once it is fully handled."""
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+    current_app.metrics.in_flight.dec()
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    current_app.metrics.record_request(
+        route, g.pop('metrics_status', 500), time.perf_counter() - start
+    )
+
+
+@async_metrics_bp.route('/metrics', methods=['GET'])
+async def metrics():
+    """Metrics in the Prometheus text format, aggregated on each scrape."""
+    return Response(current_app.metrics.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,190 @@
+"""Async API routes for the proxy service (ASGI mode)."""
+
+from quart import Blueprint, Response, request, current_app
+from quart.wrappers.response import IterableBody
+import time
+import logging
+from src.api import _proxy_common as common
+from src.services.bulkhead import BulkheadRejected
+from src.services.circuit_breaker import CircuitOpenError
+from src.services.concurrency_limiter import ConcurrencyLimitExceeded
+from src.services.tracing import span
+
+logger = logging.getLogger(__name__)
+async_proxy_bp = Blueprint('async_proxy', __name__, url_prefix='/api')
+
+
+@async_proxy_bp.route('/proxy/data', methods=['POST'])
+async def proxy_data():
+    """Proxy POST request to external service without blocking the event loop."""
+    try:
+        app = current_app._get_current_object()
+
+        # Check rate limit per client (IP address)
+        limited = common.check_rate_limit(app, request.remote_addr)
+        if limited:
+            return limited
+
+        # Get request data
+        with span('parse'):
+            data = await request.get_json()
+
+        deadline = common.request_deadline(app, request.headers)
+
+        # Serve repeated lookups from the response cache if the caller opts in
+        cache_key, cached = common.cache_lookup(app, request.headers, data)
+        if cached:
+            return cached
+
+        plan = common.CallPlan(app, request.headers, data, cache_key)
+
+        # Wait for a bulkhead slot; under overload, fail fast instead of queueing.
+        # The slot is released by the finally below, so nothing may raise in between
+        bulkhead = app.bulkhead
+        if bulkhead is not None:
+            try:
+                with span('queue'):
+                    await bulkhead.enter_async(bulkhead.classify(request.headers), deadline)
+            except BulkheadRejected as e:
+                return common.bulkhead_rejected(e)
+
+        try:
+            with span('upstream'):
+                args = (app, plan.breaker, data, deadline, cache_key, plan.hedge, plan.raw)
+                if plan.flight_key is None:
+                    external_response = await _call_upstream(*args)
+                else:
+                    external_response = await app.single_flight.do_async(
+                        plan.flight_key, _call_upstream, *args,
+                        wait_timeout=deadline.remaining()
+                    )
+        except Exception as e:
+            return common.upstream_error(e, deadline, plan, app.config.get('EXTERNAL_SERVICE_URL'))
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+
+        return common.success(app, external_response, plan, cache_key)
+
+    except Exception as e:
+        return common.internal_error('proxy_data', e)
+
+
+async def _call_upstream(app, breaker, data, deadline, cache_key, hedge, raw=False):
+    """Call the upstream under its breaker with retries; caches the response if keyed."""
+    permit = common.acquire_upstream(app, breaker)
+    call = common.upstream_call(app, cache_key, hedge, raw, asynchronous=True)
+
+    start = time.monotonic()
+    try:
+        external_response = await app.retry_strategy.execute_async(
+            call, data=data, deadline=deadline
+        )
+    except Exception as e:
+        common.upstream_failed(app, breaker, permit, call, start, e, deadline)
+        raise
+    finally:
+        call.finish()
+    return common.upstream_succeeded(app, breaker, permit, call, start, cache_key,
+                                     external_response)
+
+
+@async_proxy_bp.route('/proxy/stream', methods=['POST'])
+async def proxy_stream():
+    """Stream a request body to the external service and its response back.
+
+    Chunks are forwarded as they arrive; Quart's MAX_CONTENT_LENGTH bounds
+    the request data buffered ahead of the upstream. The call is not retried.
+    """
+    try:
+        app = current_app._get_current_object()
+
+        # Check rate limit per client (IP address)
+        limited = common.check_rate_limit(app, request.remote_addr)
+        if limited:
+            return limited
+
+        deadline = common.request_deadline(app, request.headers)
+        breaker = app.circuit_breakers.for_endpoint(app.config.get('EXTERNAL_SERVICE_URL'))
+        try:
+            permit = common.acquire_upstream(app, breaker)
+        except (CircuitOpenError, ConcurrencyLimitExceeded) as e:
+            return common.refused(e)
+
+        chunk_size = app.config['PROXY_STREAM_CHUNK_BYTES']
+        client = app.client_registry.get(app.config.get('EXTERNAL_SERVICE_URL'))
+
+        start = time.monotonic()
+        try:
+            upstream = await client.post_stream(
+                chunks=request.body,
+                deadline=deadline,
+                content_type=request.content_type or 'application/json'
+            )
+        except Exception as e:
+            return common.stream_failed(app, breaker, permit, start, e, deadline)
+        common.stream_started(app, breaker, permit, start, upstream.status_code)
+
+        async def relay():
+            try:
+                async for chunk in upstream.aiter_bytes(chunk_size):
+                    yield chunk
+            finally:
+                await upstream.aclose()
+
+        # The generator's finally only runs once iteration starts; the body
+        # closes the upstream whenever Quart is done with the response
+        return Response(_UpstreamBody(relay(), upstream), status=upstream.status_code,
+                        content_type=upstream.headers.get('Content-Type'))
+
+    except Exception as e:
+        return common.internal_error('proxy_stream', e)
+
+
+class _UpstreamBody(IterableBody):
+    """Streamed response body that closes its upstream response on exit."""
+
+    def __init__(self, iterable, upstream):
+        super().__init__(iterable)
+        self.upstream = upstream
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        try:
+            await super().__aexit__(exc_type, exc_value, tb)
+        finally:
+            await self.upstream.aclose()
+
+
+@async_proxy_bp.route('/proxy/batch', methods=['POST'])
+async def proxy_batch():
+    """Proxy a batch of payloads concurrently on the event loop."""
+    try:
+        app = current_app._get_current_object()
+
+        items, invalid = common.batch_items(app, await request.get_json(silent=True))
+        if invalid:
+            return invalid
+
+        # Check rate limit once, charging one request per item
+        limited = common.check_rate_limit(app, request.remote_addr, cost=len(items))
+        if limited:
+            return limited
+
+        # Every item shares the caller's deadline
+        deadline = common.request_deadline(app, request.headers)
+        breaker = common.breaker_for(app, None)
+
+        async def call_item(item):
+            return await _call_upstream(app, breaker, item, deadline, None, False)
+
+        outcomes = await app.batch_executor.map_async(call_item, items)
+        return common.batch_response(outcomes, deadline)
+
+    except Exception as e:
+        return common.internal_error('proxy_batch', e)
+
+
+@async_proxy_bp.route('/health', methods=['GET'])
+async def health():
+    """Health check endpoint."""
+    return common.health_report(current_app)
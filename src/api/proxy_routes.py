@@ -1,8 +1,14 @@
 """API routes for the proxy service."""
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, current_app
+import time
 import logging
-from src.services.external_service_client import ExternalServiceClient
+import functools
+from src.api import _proxy_common as common
+from src.services.bulkhead import BulkheadRejected
+from src.services.circuit_breaker import CircuitOpenError
+from src.services.concurrency_limiter import ConcurrencyLimitExceeded
+from src.services.tracing import span
 
 logger = logging.getLogger(__name__)
 proxy_bp = Blueprint('proxy', __name__, url_prefix='/api')
@@ -12,72 +18,163 @@ proxy_bp = Blueprint('proxy', __name__, url_prefix='/api')
 def proxy_data():
     """Proxy POST request to external service with resilience patterns."""
     try:
-        # Extract client ID from request (IP address)
-        client_id = request.remote_addr
-        
-        # Check rate limit
-        if not current_app.rate_limiter.is_allowed(client_id):
-            remaining = current_app.rate_limiter.get_remaining_requests(client_id)
-            reset_time = current_app.rate_limiter.get_reset_time(client_id)
-            return jsonify({
-                'status': 'error',
-                'message': 'Rate limit exceeded. Please try again later.'
-            }), 429
-        
+        app = current_app._get_current_object()
+
+        # Check rate limit per client (IP address)
+        limited = common.check_rate_limit(app, request.remote_addr)
+        if limited:
+            return limited
+
         # Get request data
-        data = request.get_json()
-        
-        # Circuit breaker check
-        cb_state = current_app.circuit_breaker.get_state()
-        if cb_state == 'OPEN':
-            logger.warning('Circuit breaker is OPEN, rejecting request')
-            return jsonify({
-                'status': 'error',
-                'message': 'External service is currently unavailable (Circuit Open).'
-            }), 503
-        
-        # Execute with retry strategy
-        external_url = current_app.config.get('EXTERNAL_SERVICE_URL')
-        client = ExternalServiceClient(external_url)
-        
+        with span('parse'):
+            data = request.get_json()
+
+        deadline = common.request_deadline(app, request.headers)
+
+        # Serve repeated lookups from the response cache if the caller opts in
+        cache_key, cached = common.cache_lookup(app, request.headers, data)
+        if cached:
+            return cached
+
+        plan = common.CallPlan(app, request.headers, data, cache_key)
+
+        # Wait for a bulkhead slot; under overload, fail fast instead of queueing.
+        # The slot is released by the finally below, so nothing may raise in between
+        bulkhead = app.bulkhead
+        if bulkhead is not None:
+            try:
+                with span('queue'):
+                    bulkhead.enter(bulkhead.classify(request.headers), deadline)
+            except BulkheadRejected as e:
+                return common.bulkhead_rejected(e)
+
         try:
-            external_response = current_app.retry_strategy.execute(
-                client.post,
-                data=data
+            with span('upstream'):
+                args = (app, plan.breaker, data, deadline, cache_key, plan.hedge, plan.raw)
+                if plan.flight_key is None:
+                    external_response = _call_upstream(*args)
+                else:
+                    external_response = app.single_flight.do(
+                        plan.flight_key, _call_upstream, *args,
+                        wait_timeout=deadline.remaining()
+                    )
+        except Exception as e:
+            return common.upstream_error(e, deadline, plan, app.config.get('EXTERNAL_SERVICE_URL'))
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+
+        return common.success(app, external_response, plan, cache_key)
+
+    except Exception as e:
+        return common.internal_error('proxy_data', e)
+
+
+def _call_upstream(app, breaker, data, deadline, cache_key, hedge, raw=False):
+    """Call the upstream under its breaker with retries; caches the response if keyed."""
+    permit = common.acquire_upstream(app, breaker)
+    call = common.upstream_call(app, cache_key, hedge, raw)
+
+    start = time.monotonic()
+    try:
+        external_response = app.retry_strategy.execute(call, data=data, deadline=deadline)
+    except Exception as e:
+        common.upstream_failed(app, breaker, permit, call, start, e, deadline)
+        raise
+    finally:
+        call.finish()
+    return common.upstream_succeeded(app, breaker, permit, call, start, cache_key,
+                                     external_response)
+
+
+@proxy_bp.route('/proxy/stream', methods=['POST'])
+def proxy_stream():
+    """Stream a request body to the external service and its response back.
+
+    Neither body is parsed or held whole: both are forwarded chunk by chunk,
+    so memory use doesn't grow with their size. The upstream status and
+    body are passed through as they are. A consumed request stream can't be
+    replayed, so the call is not retried.
+    """
+    try:
+        app = current_app._get_current_object()
+
+        # Check rate limit per client (IP address)
+        limited = common.check_rate_limit(app, request.remote_addr)
+        if limited:
+            return limited
+
+        deadline = common.request_deadline(app, request.headers)
+        breaker = app.circuit_breakers.for_endpoint(app.config.get('EXTERNAL_SERVICE_URL'))
+        try:
+            permit = common.acquire_upstream(app, breaker)
+        except (CircuitOpenError, ConcurrencyLimitExceeded) as e:
+            return common.refused(e)
+
+        chunk_size = app.config['PROXY_STREAM_CHUNK_BYTES']
+        body = iter(functools.partial(request.stream.read, chunk_size), b'')
+        client = app.client_registry.get(app.config.get('EXTERNAL_SERVICE_URL'))
+
+        start = time.monotonic()
+        try:
+            upstream = client.post_stream(
+                chunks=body,
+                deadline=deadline,
+                content_type=request.content_type or 'application/json'
             )
-            
-            # Update circuit breaker on success
-            current_app.circuit_breaker._on_success()
-            
-            return jsonify({
-                'status': 'success',
-                'external_response': external_response,
-                'proxy_notes': f'Circuit breaker state: {cb_state}'
-            }), 200
-        
         except Exception as e:
-            # Update circuit breaker on failure
-            current_app.circuit_breaker._on_failure()
-            
-            logger.error(f'Failed to call external service: {str(e)}')
-            return jsonify({
-                'status': 'error',
-                'message': 'An unexpected error occurred.',
-                'circuit_state': current_app.circuit_breaker.get_state()
-            }), 500
-    
+            return common.stream_failed(app, breaker, permit, start, e, deadline)
+        common.stream_started(app, breaker, permit, start, upstream.status_code)
+
+        def relay():
+            try:
+                yield from upstream.iter_content(chunk_size)
+            finally:
+                upstream.close()
+
+        response = Response(relay(), status=upstream.status_code,
+                            content_type=upstream.headers.get('Content-Type'))
+        # The generator's finally only runs once iteration starts; the WSGI
+        # server closes the response even if the client goes away before that
+        response.call_on_close(upstream.close)
+        return response
+
+    except Exception as e:
+        return common.internal_error('proxy_stream', e)
+
+
+@proxy_bp.route('/proxy/batch', methods=['POST'])
+def proxy_batch():
+    """Proxy a batch of payloads concurrently, rate limited once for all of them."""
+    try:
+        app = current_app._get_current_object()
+
+        items, invalid = common.batch_items(app, request.get_json(silent=True))
+        if invalid:
+            return invalid
+
+        # Check rate limit once, charging one request per item
+        limited = common.check_rate_limit(app, request.remote_addr, cost=len(items))
+        if limited:
+            return limited
+
+        # Every item shares the caller's deadline
+        deadline = common.request_deadline(app, request.headers)
+        breaker = common.breaker_for(app, None)
+
+        def call_item(item):
+            # Worker threads need their own app context
+            with app.app_context():
+                return _call_upstream(app, breaker, item, deadline, None, False)
+
+        outcomes = app.batch_executor.map(call_item, items)
+        return common.batch_response(outcomes, deadline)
+
     except Exception as e:
-        logger.error(f'Error in proxy_data: {str(e)}')
-        return jsonify({
-            'status': 'error',
-            'message': 'Internal server error'
-        }), 500
+        return common.internal_error('proxy_batch', e)
 
 
 @proxy_bp.route('/health', methods=['GET'])
 def health():
     """Health check endpoint."""
-    return jsonify({
-        'status': 'healthy',
-        'circuit_breaker_state': current_app.circuit_breaker.get_state()
-    }), 200
+    return common.health_report(current_app)
@@ -0,0 +1,33 @@
+"""Request tracing hooks: trace each request, report and export it."""
+
+from flask import Blueprint, current_app, g, request
+from src.services.tracing import SERVER_TIMING_HEADER, TRACEPARENT_HEADER
+
+tracing_bp = Blueprint('tracing', __name__)
+
+
+@tracing_bp.before_app_request
+def start_trace():
+    """Trace the request, continuing the caller's trace if it sent one."""
+    if current_app.tracer is None:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.trace = current_app.tracer.start(route, request.headers.get(TRACEPARENT_HEADER))
+
+
+@tracing_bp.after_app_request
+def add_server_timing(response):
+    """Report the time spent in each stage in a Server-Timing header."""
+    trace = g.get('trace')
+    if trace is not None and current_app.tracer.server_timing:
+        current_app.tracer.end(trace)
+        response.headers[SERVER_TIMING_HEADER] = trace.server_timing()
+    return response
+
+
+@tracing_bp.teardown_app_request
+def finish_trace(error=None):
+    """Export the trace once the request is fully handled."""
+    trace = g.pop('trace', None)
+    if trace is not None:
+        current_app.tracer.finish(trace)
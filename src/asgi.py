@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""ASGI entry point running the proxy on an event loop.
+
+Run with an ASGI server, e.g. ``hypercorn src.asgi:app``.
+"""
+
+import os
+import logging
+from quart import Quart
+from quart.json.provider import DefaultJSONProvider
+from src.config import Config
+from src.api.async_metrics_routes import async_metrics_bp
+from src.api.async_proxy_routes import async_proxy_bp
+from src.api.async_tracing_routes import async_tracing_bp
+from src.main import init_resilience
+from src.services.async_external_service_client import AsyncClientRegistry
+from src.services.json_codec import CodecJSONProviderMixin, get_codec
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class CodecJSONProvider(CodecJSONProviderMixin, DefaultJSONProvider):
+    """jsonify() through the configured JSON codec."""
+
+
+def create_async_app():
+    """Create and configure the Quart (ASGI) application."""
+    app = Quart(__name__)
+    app.config.from_object(Config)
+    app.json_codec = get_codec(app.config['JSON_CODEC'])
+    app.json = CodecJSONProvider(app)
+    
+    init_resilience(app)
+    
+    # Non-blocking connection pools for upstream services
+    app.client_registry = AsyncClientRegistry(
+        timeout=app.config['REQUEST_TIMEOUT'],
+        pool_size=app.config['ASYNC_POOL_SIZE'],
+        keep_alive=app.config['HTTP_KEEP_ALIVE'],
+        idle_timeout=app.config['HTTP_IDLE_TIMEOUT_SECONDS'],
+        timeouts=app.adaptive_timeout
+    )
+    
+    @app.after_serving
+    async def close_clients():
+        await app.client_registry.close()
+        if app.tracer is not None:
+            app.tracer.close()
+    
+    # Register blueprints; tracing first so its trace covers the other hooks
+    app.register_blueprint(async_tracing_bp)
+    app.register_blueprint(async_proxy_bp)
+    app.register_blueprint(async_metrics_bp)
+    
+    logger.info('Async proxy service initialized successfully')
+    return app
+
+
+app = create_async_app()
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 8000))
+    app.run(host='0.0.0.0', port=port)
@@ -19,20 +19,152 @@ class Config:
     # Rate Limiter Configuration
     RATE_LIMIT_WINDOW_SECONDS = int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', 60))
     RATE_LIMIT_MAX_REQUESTS = int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 10))
+    # 'sliding_log' (exact, O(quota) per client), 'sliding_window' (approximate, O(1))
+    # or 'gcra' (smooth pacing at MAX_REQUESTS/WINDOW with RATE_LIMIT_BURST back to back)
+    RATE_LIMIT_ALGORITHM = os.getenv('RATE_LIMIT_ALGORITHM', 'sliding_log')
+    RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', 0)) or None
+    # Hard cap on tracked clients; least recently active ones are evicted
+    RATE_LIMIT_MAX_CLIENTS = int(os.getenv('RATE_LIMIT_MAX_CLIENTS', 100000))
+    # Independently locked partitions of the client table
+    RATE_LIMIT_SHARDS = int(os.getenv('RATE_LIMIT_SHARDS', 16))
     
     # Circuit Breaker Configuration
     CB_FAILURE_THRESHOLD = int(os.getenv('CB_FAILURE_THRESHOLD', 5))
     CB_RESET_TIMEOUT_SECONDS = int(os.getenv('CB_RESET_TIMEOUT_SECONDS', 30))
     CB_HALF_OPEN_MAX_CALLS = int(os.getenv('CB_HALF_OPEN_MAX_CALLS', 2))
+    CB_SUCCESS_THRESHOLD = int(os.getenv('CB_SUCCESS_THRESHOLD', 2))
+    # Rolling window the failure and slow-call rates are measured over
+    CB_FAILURE_RATE_THRESHOLD = float(os.getenv('CB_FAILURE_RATE_THRESHOLD', 50))
+    CB_MINIMUM_CALLS = int(os.getenv('CB_MINIMUM_CALLS', 10))
+    CB_SLOW_CALL_DURATION_MS = int(os.getenv('CB_SLOW_CALL_DURATION_MS', 0))
+    CB_SLOW_CALL_RATE_THRESHOLD = float(os.getenv('CB_SLOW_CALL_RATE_THRESHOLD', 100))
+    CB_WINDOW_SECONDS = int(os.getenv('CB_WINDOW_SECONDS', 60))
+    CB_WINDOW_BUCKETS = int(os.getenv('CB_WINDOW_BUCKETS', 10))
+    # Breakers are kept per upstream host and endpoint; unused CLOSED ones expire
+    CB_IDLE_TIMEOUT_SECONDS = float(os.getenv('CB_IDLE_TIMEOUT_SECONDS', 600))
+    CB_MAX_BREAKERS = int(os.getenv('CB_MAX_BREAKERS', 1000))
+    
+    # Where rate limit and circuit breaker state lives: 'local' (per process)
+    # or 'shared_memory' (one state for all workers on the host)
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'local')
+    SHARED_STATE_PATH = os.getenv('SHARED_STATE_PATH', '/dev/shm/service-proxy')
     
     # Retry Strategy Configuration
     RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', 3))
     RETRY_INITIAL_DELAY_MS = int(os.getenv('RETRY_INITIAL_DELAY_MS', 100))
     RETRY_BACKOFF_MULTIPLIER = float(os.getenv('RETRY_BACKOFF_MULTIPLIER', 2.0))
     RETRY_MAX_DELAY_MS = int(os.getenv('RETRY_MAX_DELAY_MS', 5000))
+    # Retries are limited to a percentage of successful first attempts, plus a floor
+    RETRY_BUDGET_ENABLED = os.getenv('RETRY_BUDGET_ENABLED', 'True').lower() == 'true'
+    RETRY_BUDGET_PERCENT = float(os.getenv('RETRY_BUDGET_PERCENT', 10))
+    RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv('RETRY_BUDGET_MIN_PER_SECOND', 10))
     
     # Request timeout (in seconds)
     REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 10))
+    # Total time for a proxied request including retries; clients may ask for
+    # less with X-Request-Timeout, which is forwarded upstream as time remaining
+    REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', 30))
+    RETRY_MIN_ATTEMPT_MS = int(os.getenv('RETRY_MIN_ATTEMPT_MS', 50))
+    # Adaptive timeouts: each upstream attempt times out after
+    # ADAPTIVE_TIMEOUT_MULTIPLIER times the endpoint's recent
+    # ADAPTIVE_TIMEOUT_PERCENTILE latency, no sooner than ADAPTIVE_TIMEOUT_MIN_MS
+    # and no later than REQUEST_TIMEOUT, which also applies until the endpoint
+    # has ADAPTIVE_TIMEOUT_MIN_SAMPLES calls in its last two windows
+    ADAPTIVE_TIMEOUT_ENABLED = os.getenv('ADAPTIVE_TIMEOUT_ENABLED', 'False').lower() == 'true'
+    ADAPTIVE_TIMEOUT_PERCENTILE = float(os.getenv('ADAPTIVE_TIMEOUT_PERCENTILE', 99))
+    ADAPTIVE_TIMEOUT_MULTIPLIER = float(os.getenv('ADAPTIVE_TIMEOUT_MULTIPLIER', 2.0))
+    ADAPTIVE_TIMEOUT_MIN_MS = int(os.getenv('ADAPTIVE_TIMEOUT_MIN_MS', 50))
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES = int(os.getenv('ADAPTIVE_TIMEOUT_MIN_SAMPLES', 100))
+    ADAPTIVE_TIMEOUT_WINDOW_SECONDS = float(os.getenv('ADAPTIVE_TIMEOUT_WINDOW_SECONDS', 60))
+    
+    # Hedging: requests carrying an Idempotency-Key get a second, racing upstream
+    # call when the first is slower than the tracked latency percentile
+    HEDGING_ENABLED = os.getenv('HEDGING_ENABLED', 'False').lower() == 'true'
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 95))
+    HEDGE_BUDGET_PERCENT = float(os.getenv('HEDGE_BUDGET_PERCENT', 5))
+    HEDGE_MIN_DELAY_MS = int(os.getenv('HEDGE_MIN_DELAY_MS', 10))
+    HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', 32))
+    
+    # Adaptive cap on concurrent upstream calls; calls over it get a 503 at once.
+    # 'gradient' (Vegas-style, shrinks as latency rises over its long-term
+    # average by more than CONCURRENCY_LIMIT_TOLERANCE) or 'aimd' (grows
+    # steadily, shrinks by CONCURRENCY_LIMIT_BACKOFF on errors or calls slower
+    # than CONCURRENCY_LIMIT_LATENCY_MS, if set)
+    CONCURRENCY_LIMIT_ENABLED = os.getenv('CONCURRENCY_LIMIT_ENABLED', 'False').lower() == 'true'
+    CONCURRENCY_LIMIT_ALGORITHM = os.getenv('CONCURRENCY_LIMIT_ALGORITHM', 'gradient')
+    CONCURRENCY_LIMIT_INITIAL = int(os.getenv('CONCURRENCY_LIMIT_INITIAL', 20))
+    CONCURRENCY_LIMIT_MIN = int(os.getenv('CONCURRENCY_LIMIT_MIN', 1))
+    CONCURRENCY_LIMIT_MAX = int(os.getenv('CONCURRENCY_LIMIT_MAX', 200))
+    CONCURRENCY_LIMIT_BACKOFF = float(os.getenv('CONCURRENCY_LIMIT_BACKOFF', 0.9))
+    CONCURRENCY_LIMIT_TOLERANCE = float(os.getenv('CONCURRENCY_LIMIT_TOLERANCE', 1.5))
+    CONCURRENCY_LIMIT_LATENCY_MS = int(os.getenv('CONCURRENCY_LIMIT_LATENCY_MS', 0))
+    
+    # Bulkhead in front of upstream calls from /api/proxy/data: at most
+    # BULKHEAD_MAX_CONCURRENT at once, up to BULKHEAD_MAX_QUEUE more waiting at
+    # most BULKHEAD_MAX_QUEUE_MS. Priority ('high', 'normal' or 'low') comes from
+    # the caller's API key (BULKHEAD_API_KEYS="key:high,key:low") or X-Priority,
+    # which can't raise a request above BULKHEAD_DEFAULT_PRIORITY;
+    # when the queue is full the lowest class is shed first. Rejected requests
+    # get a 503 with Retry-After: BULKHEAD_RETRY_AFTER_SECONDS
+    BULKHEAD_ENABLED = os.getenv('BULKHEAD_ENABLED', 'False').lower() == 'true'
+    BULKHEAD_MAX_CONCURRENT = int(os.getenv('BULKHEAD_MAX_CONCURRENT', 50))
+    BULKHEAD_MAX_QUEUE = int(os.getenv('BULKHEAD_MAX_QUEUE', 100))
+    BULKHEAD_MAX_QUEUE_MS = int(os.getenv('BULKHEAD_MAX_QUEUE_MS', 1000))
+    BULKHEAD_DEFAULT_PRIORITY = os.getenv('BULKHEAD_DEFAULT_PRIORITY', 'normal')
+    BULKHEAD_API_KEYS = os.getenv('BULKHEAD_API_KEYS', '')
+    BULKHEAD_RETRY_AFTER_SECONDS = int(os.getenv('BULKHEAD_RETRY_AFTER_SECONDS', 1))
+    
+    # Response cache for requests sent with "X-Proxy-Cache: true"; entries live
+    # for the upstream's Cache-Control max-age, else RESPONSE_CACHE_TTL_SECONDS
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'False').lower() == 'true'
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 30))
+    
+    # Concurrent identical cacheable or idempotent requests share one upstream call
+    SINGLE_FLIGHT_ENABLED = os.getenv('SINGLE_FLIGHT_ENABLED', 'True').lower() == 'true'
+    
+    # POST /api/proxy/batch: items per batch, items of one batch in flight,
+    # and worker threads shared by all batches
+    PROXY_BATCH_MAX_SIZE = int(os.getenv('PROXY_BATCH_MAX_SIZE', 100))
+    PROXY_BATCH_CONCURRENCY = int(os.getenv('PROXY_BATCH_CONCURRENCY', 8))
+    PROXY_BATCH_WORKERS = int(os.getenv('PROXY_BATCH_WORKERS', 32))
+    
+    # POST /api/proxy/stream reads and forwards bodies in chunks of this size,
+    # which bounds its memory use per request
+    PROXY_STREAM_CHUNK_BYTES = int(os.getenv('PROXY_STREAM_CHUNK_BYTES', 64 * 1024))
+    
+    # Requests arriving within MICRO_BATCH_MAX_WAIT_MS of each other are sent
+    # to the upstream's bulk endpoint (EXTERNAL_SERVICE_URL/MICRO_BATCH_ENDPOINT)
+    # as one call of up to MICRO_BATCH_MAX_ITEMS
+    MICRO_BATCH_ENABLED = os.getenv('MICRO_BATCH_ENABLED', 'False').lower() == 'true'
+    MICRO_BATCH_ENDPOINT = os.getenv('MICRO_BATCH_ENDPOINT', 'batch')
+    MICRO_BATCH_MAX_ITEMS = int(os.getenv('MICRO_BATCH_MAX_ITEMS', 32))
+    MICRO_BATCH_MAX_WAIT_MS = float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', 5))
+    
+    # Splice upstream JSON into the success envelope without decoding it; the
+    # body is only sanity-checked unless JSON_SPLICE_STRICT. JSON_CODEC picks
+    # the encoder for envelopes and errors: json, orjson, or auto (orjson if installed)
+    JSON_SPLICE_ENABLED = os.getenv('JSON_SPLICE_ENABLED', 'True').lower() == 'true'
+    JSON_SPLICE_STRICT = os.getenv('JSON_SPLICE_STRICT', 'False').lower() == 'true'
+    JSON_CODEC = os.getenv('JSON_CODEC', 'auto')
+    
+    # Per-request stage timing. Traced responses get a Server-Timing header
+    # unless TRACING_SERVER_TIMING is off, and traces are appended as JSON
+    # lines to TRACING_EXPORT_PATH if set. The caller's traceparent header is
+    # continued and sent upstream
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False').lower() == 'true'
+    TRACING_SERVER_TIMING = os.getenv('TRACING_SERVER_TIMING', 'True').lower() == 'true'
+    TRACING_EXPORT_PATH = os.getenv('TRACING_EXPORT_PATH', '')
+    
+    # Upstream Connection Pool Configuration
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'False').lower() == 'true'
+    HTTP_KEEP_ALIVE = os.getenv('HTTP_KEEP_ALIVE', 'True').lower() == 'true'
+    HTTP_IDLE_TIMEOUT_SECONDS = float(os.getenv('HTTP_IDLE_TIMEOUT_SECONDS', 60))
+    HTTP_REAP_INTERVAL_SECONDS = float(os.getenv('HTTP_REAP_INTERVAL_SECONDS', 30))
+    
+    # Async (ASGI) mode: connections per upstream shared by all in-flight calls
+    ASYNC_POOL_SIZE = int(os.getenv('ASYNC_POOL_SIZE', 1000))
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -55,6 +187,7 @@ class TestingConfig(Config):
     RATE_LIMIT_MAX_REQUESTS = 5
     CB_FAILURE_THRESHOLD = 2
     CB_RESET_TIMEOUT_SECONDS = 5
+    CB_MINIMUM_CALLS = 2
 
 
 def get_config():
@@ -2,13 +2,32 @@
 """Main entry point for the resilient proxy API service."""
 
 import os
+import atexit
+import hashlib
 import logging
 from flask import Flask
-from config import Config
-from api.proxy_routes import proxy_bp
-from services.circuit_breaker import CircuitBreaker
-from services.rate_limiter import RateLimiter
-from services.retry_strategy import RetryStrategy
+from flask.json.provider import DefaultJSONProvider
+from src.config import Config
+from src.api.metrics_routes import metrics_bp
+from src.api.proxy_routes import proxy_bp
+from src.api.tracing_routes import tracing_bp
+from src.services.adaptive_timeout import AdaptiveTimeout
+from src.services.batch_executor import BatchExecutor
+from src.services.bulkhead import Bulkhead, parse_api_key_priorities
+from src.services.circuit_breaker_registry import CircuitBreakerRegistry
+from src.services.client_registry import ClientRegistry
+from src.services.concurrency_limiter import create_concurrency_limiter
+from src.services.hedging import Hedger
+from src.services.json_codec import CodecJSONProviderMixin, get_codec
+from src.services.metrics import ProxyMetrics
+from src.services.micro_batcher import MicroBatcher
+from src.services.rate_limiter import create_rate_limiter
+from src.services.response_cache import ResponseCache
+from src.services.retry_budget import RetryBudget
+from src.services.retry_strategy import RetryStrategy
+from src.services.single_flight import SingleFlight
+from src.services.shared_state import SharedCircuitBreaker
+from src.services.tracing import JsonLinesExporter, Tracer
 
 # Configure logging
 logging.basicConfig(
@@ -17,30 +36,203 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def create_app():
-    """Create and configure the Flask application."""
-    app = Flask(__name__)
-    app.config.from_object(Config)
+class CodecJSONProvider(CodecJSONProviderMixin, DefaultJSONProvider):
+    """jsonify() through the configured JSON codec."""
+
+
+def init_resilience(app):
+    """Attach the resilience components (breakers, rate limiter, retries...) to app."""
+    backend = app.config['STATE_BACKEND']
+    shared_path = app.config['SHARED_STATE_PATH']
+    
+    # Served at /metrics; recorded into per-thread cells, summed when scraped
+    app.metrics = ProxyMetrics()
+    
+    # Stage timing per request; None when disabled, so spans are no-ops
+    app.tracer = None
+    if app.config['TRACING_ENABLED']:
+        export_path = app.config['TRACING_EXPORT_PATH']
+        app.tracer = Tracer(
+            exporters=[JsonLinesExporter(export_path)] if export_path else [],
+            server_timing=app.config['TRACING_SERVER_TIMING']
+        )
     
     # Initialize resilience patterns
-    app.circuit_breaker = CircuitBreaker(
+    slow_call_ms = app.config['CB_SLOW_CALL_DURATION_MS']
+    breaker_settings = dict(
         failure_threshold=int(os.getenv('CB_FAILURE_THRESHOLD', 5)),
-        reset_timeout=int(os.getenv('CB_RESET_TIMEOUT_SECONDS', 30))
+        reset_timeout=int(os.getenv('CB_RESET_TIMEOUT_SECONDS', 30)),
+        success_threshold=app.config['CB_SUCCESS_THRESHOLD'],
+        failure_rate_threshold=app.config['CB_FAILURE_RATE_THRESHOLD'] / 100,
+        minimum_calls=app.config['CB_MINIMUM_CALLS'],
+        slow_call_duration=slow_call_ms / 1000 if slow_call_ms else None,
+        slow_call_rate_threshold=app.config['CB_SLOW_CALL_RATE_THRESHOLD'] / 100,
+        window_seconds=app.config['CB_WINDOW_SECONDS'],
+        window_buckets=app.config['CB_WINDOW_BUCKETS'],
+        half_open_max_calls=app.config['CB_HALF_OPEN_MAX_CALLS']
     )
+    breaker_factory = None
+    if backend == 'shared_memory':
+        def breaker_factory(key):
+            # One segment per upstream endpoint, named the same in every worker
+            digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+            return SharedCircuitBreaker(
+                f'{shared_path}-breaker-{digest}', **breaker_settings
+            )
     
-    app.rate_limiter = RateLimiter(
+    # One breaker per upstream host and endpoint
+    app.circuit_breakers = CircuitBreakerRegistry(
+        breaker_factory,
+        idle_timeout=app.config['CB_IDLE_TIMEOUT_SECONDS'],
+        max_breakers=app.config['CB_MAX_BREAKERS'],
+        **breaker_settings
+    )
+    app.metrics.watch_breakers(app.circuit_breakers)
+    
+    app.rate_limiter = create_rate_limiter(
+        app.config['RATE_LIMIT_ALGORITHM'],
         window_size=int(os.getenv('RATE_LIMIT_WINDOW_SECONDS', 60)),
-        max_requests=int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 10))
+        max_requests=int(os.getenv('RATE_LIMIT_MAX_REQUESTS', 10)),
+        burst=app.config['RATE_LIMIT_BURST'],
+        max_clients=app.config['RATE_LIMIT_MAX_CLIENTS'],
+        shards=app.config['RATE_LIMIT_SHARDS'],
+        backend=backend,
+        shared_path=f'{shared_path}-ratelimit'
     )
     
+    # Shared by every request so retries can't multiply load on a struggling upstream
+    app.retry_budget = None
+    if app.config['RETRY_BUDGET_ENABLED']:
+        app.retry_budget = RetryBudget(
+            ratio=app.config['RETRY_BUDGET_PERCENT'] / 100,
+            min_retries_per_second=app.config['RETRY_BUDGET_MIN_PER_SECOND']
+        )
+    
     app.retry_strategy = RetryStrategy(
         max_attempts=int(os.getenv('RETRY_MAX_ATTEMPTS', 3)),
         initial_delay_ms=int(os.getenv('RETRY_INITIAL_DELAY_MS', 100)),
-        backoff_multiplier=float(os.getenv('RETRY_BACKOFF_MULTIPLIER', 2.0))
+        backoff_multiplier=float(os.getenv('RETRY_BACKOFF_MULTIPLIER', 2.0)),
+        max_delay_ms=int(os.getenv('RETRY_MAX_DELAY_MS', 5000)),
+        budget=app.retry_budget,
+        min_attempt_ms=app.config['RETRY_MIN_ATTEMPT_MS']
+    )
+    
+    # Per-endpoint upstream timeouts from measured latency; the app factory
+    # hands it to the client registry
+    app.adaptive_timeout = None
+    if app.config['ADAPTIVE_TIMEOUT_ENABLED']:
+        app.adaptive_timeout = AdaptiveTimeout(
+            percentile=app.config['ADAPTIVE_TIMEOUT_PERCENTILE'],
+            multiplier=app.config['ADAPTIVE_TIMEOUT_MULTIPLIER'],
+            floor=app.config['ADAPTIVE_TIMEOUT_MIN_MS'] / 1000,
+            ceiling=app.config['REQUEST_TIMEOUT'],
+            min_samples=app.config['ADAPTIVE_TIMEOUT_MIN_SAMPLES'],
+            window_seconds=app.config['ADAPTIVE_TIMEOUT_WINDOW_SECONDS']
+        )
+        app.metrics.watch_timeouts(app.adaptive_timeout)
+    
+    # Fails upstream calls fast once the upstream's measured capacity is in use
+    app.concurrency_limiter = None
+    if app.config['CONCURRENCY_LIMIT_ENABLED']:
+        algorithm = app.config['CONCURRENCY_LIMIT_ALGORITHM']
+        settings = {'backoff_ratio': app.config['CONCURRENCY_LIMIT_BACKOFF']}
+        if algorithm == 'gradient':
+            settings['tolerance'] = app.config['CONCURRENCY_LIMIT_TOLERANCE']
+        elif app.config['CONCURRENCY_LIMIT_LATENCY_MS']:
+            settings['latency_threshold'] = app.config['CONCURRENCY_LIMIT_LATENCY_MS'] / 1000
+        app.concurrency_limiter = create_concurrency_limiter(
+            algorithm,
+            initial_limit=app.config['CONCURRENCY_LIMIT_INITIAL'],
+            min_limit=app.config['CONCURRENCY_LIMIT_MIN'],
+            max_limit=app.config['CONCURRENCY_LIMIT_MAX'],
+            **settings
+        )
+        app.metrics.watch_concurrency(app.concurrency_limiter)
+    
+    # Hedges are second upstream calls, so they also need a concurrency slot
+    app.hedger = None
+    if app.config['HEDGING_ENABLED']:
+        app.hedger = Hedger(
+            percentile=app.config['HEDGE_PERCENTILE'],
+            budget_ratio=app.config['HEDGE_BUDGET_PERCENT'] / 100,
+            min_delay_ms=app.config['HEDGE_MIN_DELAY_MS'],
+            max_workers=app.config['HEDGE_MAX_WORKERS'],
+            limiter=app.concurrency_limiter
+        )
+    
+    # Bounds queueing in front of upstream calls, shedding low priorities first
+    app.bulkhead = None
+    if app.config['BULKHEAD_ENABLED']:
+        app.bulkhead = Bulkhead(
+            max_concurrent=app.config['BULKHEAD_MAX_CONCURRENT'],
+            max_queue=app.config['BULKHEAD_MAX_QUEUE'],
+            max_queue_time=app.config['BULKHEAD_MAX_QUEUE_MS'] / 1000,
+            default_priority=app.config['BULKHEAD_DEFAULT_PRIORITY'],
+            api_key_priorities=parse_api_key_priorities(app.config['BULKHEAD_API_KEYS']),
+            retry_after=app.config['BULKHEAD_RETRY_AFTER_SECONDS']
+        )
+        app.metrics.watch_bulkhead(app.bulkhead)
+    
+    app.response_cache = None
+    if app.config['RESPONSE_CACHE_ENABLED']:
+        app.response_cache = ResponseCache(
+            max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+            default_ttl=app.config['RESPONSE_CACHE_TTL_SECONDS']
+        )
+    
+    app.single_flight = SingleFlight() if app.config['SINGLE_FLIGHT_ENABLED'] else None
+    
+    # Bulk upstream calls; the client registry is set up by the app factory,
+    # so it's looked up per call
+    app.micro_batcher = None
+    if app.config['MICRO_BATCH_ENABLED']:
+        def send_batch(payload, deadline):
+            client = app.client_registry.get(app.config['EXTERNAL_SERVICE_URL'])
+            return client.post(app.config['MICRO_BATCH_ENDPOINT'], payload, deadline)
+        
+        app.micro_batcher = MicroBatcher(
+            send_batch,
+            max_items=app.config['MICRO_BATCH_MAX_ITEMS'],
+            max_wait_ms=app.config['MICRO_BATCH_MAX_WAIT_MS']
+        )
+    
+    # Fan-out for /api/proxy/batch
+    app.batch_executor = BatchExecutor(
+        max_workers=app.config['PROXY_BATCH_WORKERS'],
+        concurrency=app.config['PROXY_BATCH_CONCURRENCY']
+    )
+
+
+def create_app():
+    """Create and configure the Flask application."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.json_codec = get_codec(app.config['JSON_CODEC'])
+    app.json = CodecJSONProvider(app)
+    
+    init_resilience(app)
+    
+    # Shared connection pools for upstream services
+    app.client_registry = ClientRegistry(
+        timeout=app.config['REQUEST_TIMEOUT'],
+        pool_size=app.config['HTTP_POOL_SIZE'],
+        pool_block=app.config['HTTP_POOL_BLOCK'],
+        keep_alive=app.config['HTTP_KEEP_ALIVE'],
+        idle_timeout=app.config['HTTP_IDLE_TIMEOUT_SECONDS'],
+        timeouts=app.adaptive_timeout
     )
+    app.client_registry.start_reaper(app.config['HTTP_REAP_INTERVAL_SECONDS'])
+    atexit.register(app.client_registry.close)
+    atexit.register(app.batch_executor.close)
+    if app.hedger is not None:
+        atexit.register(app.hedger.close)
+    if app.tracer is not None:
+        atexit.register(app.tracer.close)
     
-    # Register blueprints
+    # Register blueprints; tracing first so its trace covers the other hooks
+    app.register_blueprint(tracing_bp)
     app.register_blueprint(proxy_bp)
+    app.register_blueprint(metrics_bp)
     
     logger.info('Proxy service initialized successfully')
     return app
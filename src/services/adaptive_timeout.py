@@ -0,0 +1,212 @@
+"""Upstream timeouts adapted to each endpoint's measured latency percentiles."""
+
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySketch:
+    """Streaming latency histogram with log-spaced buckets.
+
+    Bucket i holds values in (min_value * gamma^(i-1), min_value * gamma^i],
+    with gamma chosen so any quantile is reported within relative_accuracy
+    of a value actually recorded. Memory is fixed: about 400 counts for the
+    defaults, covering 0.1 ms to 10 minutes at 2%.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, min_value: float = 1e-4,
+                 max_value: float = 600.0):
+        """
+        Initialize the Latency Sketch.
+
+        Args:
+            relative_accuracy: Relative error bound of reported quantiles (0-1)
+            min_value: Smallest distinguished value in seconds; less is counted here
+            max_value: Largest distinguished value in seconds; more is counted here
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.min_value = min_value
+        self._log_gamma = math.log(self.gamma)
+        self.counts = [0] * (self._index(max_value) + 1)
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        if value <= self.min_value:
+            return 0
+        return int(math.ceil(math.log(value / self.min_value) / self._log_gamma))
+
+    def value(self, index: int) -> float:
+        """Representative value of a bucket, within relative_accuracy of its contents."""
+        if index == 0:
+            return self.min_value
+        return 2 * self.min_value * self.gamma ** index / (1 + self.gamma)
+
+    def add(self, value: float) -> None:
+        """Record one value in seconds."""
+        self.counts[min(self._index(value), len(self.counts) - 1)] += 1
+        self.count += 1
+
+    def clear(self) -> None:
+        """Forget every recorded value."""
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+
+    def quantile(self, q: float, *others: 'LatencySketch') -> Optional[float]:
+        """Value at quantile q (0-1) of this sketch merged with others, or None if empty."""
+        total = self.count + sum(other.count for other in others)
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count + sum(other.counts[index] for other in others)
+            if seen > rank:
+                return self.value(index)
+        return self.value(len(self.counts) - 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Count and non-empty buckets, keyed by upper bound in ms."""
+        return {
+            'count': self.count,
+            'relative_accuracy': self.relative_accuracy,
+            'buckets': {
+                round(self.min_value * self.gamma ** index * 1000, 3): count
+                for index, count in enumerate(self.counts) if count
+            }
+        }
+
+
+class _EndpointLatency:
+    """Latency of one endpoint over the current and previous window."""
+
+    def __init__(self, relative_accuracy: float):
+        self.current = LatencySketch(relative_accuracy)
+        self.previous = LatencySketch(relative_accuracy)
+        self.window_start = time.monotonic()
+        self.timeout: Optional[float] = None
+        self.since_recompute = 0
+        self.timeouts = 0
+
+
+class AdaptiveTimeout:
+    """Per-endpoint call timeouts of multiplier times a latency percentile.
+
+    Latency is kept in two LatencySketches per endpoint, the current
+    window and the one before, so the percentile follows the upstream
+    within one to two windows. Calls that time out are recorded at the
+    timeout they hit: if the upstream slows down past it, the percentile
+    rises and the timeout grows, up to ceiling, instead of cutting off
+    every call. Until min_samples are seen, the ceiling is used.
+    """
+
+    def __init__(self, percentile: float = 99, multiplier: float = 2.0,
+                 floor: float = 0.05, ceiling: float = 10.0, min_samples: int = 100,
+                 window_seconds: float = 60.0, recompute_every: int = 50,
+                 relative_accuracy: float = 0.02):
+        """
+        Initialize the Adaptive Timeout.
+
+        Args:
+            percentile: Latency percentile (0-100) the timeout is based on
+            multiplier: Timeout as a multiple of the percentile
+            floor: Shortest timeout in seconds
+            ceiling: Longest timeout in seconds, also used until min_samples
+            min_samples: Samples of an endpoint needed before adapting
+            window_seconds: Length of each of the two latency windows
+            recompute_every: Samples between recomputations of the timeout
+            relative_accuracy: Relative error of the latency sketches
+        """
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.window_seconds = window_seconds
+        self.recompute_every = recompute_every
+        self.relative_accuracy = relative_accuracy
+        self._endpoints: Dict[str, _EndpointLatency] = {}
+        self._lock = threading.Lock()
+
+    def timeout_for(self, endpoint: str) -> float:
+        """Timeout in seconds for the next call to endpoint."""
+        latency = self._endpoints.get(endpoint)
+        if latency is None or latency.timeout is None:
+            return self.ceiling
+        return latency.timeout
+
+    def record(self, endpoint: str, seconds: float, timed_out: bool = False) -> None:
+        """Add one call's latency (the timeout it hit, if timed_out)."""
+        with self._lock:
+            latency = self._endpoints.get(endpoint)
+            if latency is None:
+                latency = self._endpoints[endpoint] = _EndpointLatency(self.relative_accuracy)
+            now = time.monotonic()
+            if now - latency.window_start >= self.window_seconds:
+                # An idle endpoint's old windows say nothing about it now
+                latency.previous, latency.current = latency.current, latency.previous
+                if now - latency.window_start >= 2 * self.window_seconds:
+                    latency.previous.clear()
+                latency.current.clear()
+                latency.window_start = now
+                latency.since_recompute = self.recompute_every
+            latency.current.add(seconds)
+            latency.timeouts += timed_out
+            latency.since_recompute += 1
+            if latency.since_recompute >= self.recompute_every or latency.timeout is None:
+                self._recompute(latency)
+
+    def _recompute(self, latency: _EndpointLatency) -> None:
+        if latency.current.count + latency.previous.count < self.min_samples:
+            latency.timeout = None
+            return
+        value = latency.current.quantile(self.percentile / 100, latency.previous)
+        latency.timeout = min(max(value * self.multiplier, self.floor), self.ceiling)
+        latency.since_recompute = 0
+
+    @contextmanager
+    def observe(self, endpoint: str, timeout: float) -> Iterator[None]:
+        """Record the latency of the call made in the block.
+
+        A call failing after about its timeout is recorded as timed out;
+        other failures (e.g. refused connections) say nothing about latency.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            elapsed = time.monotonic() - start
+            if elapsed >= 0.99 * timeout:
+                self.record(endpoint, elapsed, timed_out=True)
+            raise
+        self.record(endpoint, time.monotonic() - start)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per endpoint: current timeout, latency percentiles and the sketch."""
+        with self._lock:
+            stats = {}
+            for endpoint, latency in self._endpoints.items():
+                sketches: List[LatencySketch] = [latency.current, latency.previous]
+                percentiles = {
+                    f'p{label}_ms': _ms(sketches[0].quantile(q, sketches[1]))
+                    for label, q in (('50', 0.5), ('90', 0.9), ('99', 0.99), ('99.9', 0.999))
+                }
+                stats[endpoint] = {
+                    'timeout_ms': _ms(latency.timeout if latency.timeout is not None
+                                      else self.ceiling),
+                    'adapted': latency.timeout is not None,
+                    'samples': latency.current.count + latency.previous.count,
+                    'timeouts': latency.timeouts,
+                    **percentiles,
+                    'sketch': latency.current.to_dict()
+                }
+            return stats
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
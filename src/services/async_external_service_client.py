@@ -0,0 +1,256 @@
+"""Non-blocking external service HTTP client for the async proxy."""
+
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import Any, AsyncIterable, Dict, Mapping, Optional, Tuple
+
+from .adaptive_timeout import AdaptiveTimeout
+from .deadline import DEADLINE_HEADER, Deadline
+from .json_codec import RawJson, check_json_bytes
+from .tracing import propagation_headers, span
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncExternalServiceClient:
+    """Async client for calling external services over a pooled connection."""
+
+    def __init__(self, base_url: str, timeout: int = 10, pool_size: int = 100,
+                 keep_alive: bool = True, idle_timeout: Optional[float] = 60.0,
+                 timeouts: Optional[AdaptiveTimeout] = None):
+        """
+        Initialize Async External Service Client.
+
+        Args:
+            base_url: Base URL of external service
+            timeout: Request timeout in seconds
+            pool_size: Maximum concurrent connections to the upstream
+            keep_alive: Reuse connections between requests
+            idle_timeout: Seconds an idle keep-alive connection is kept
+            timeouts: Adaptive per-endpoint timeouts, used instead of timeout
+        """
+        if httpx is None:
+            raise ImportError('The async proxy requires httpx: pip install httpx')
+
+        self.base_url = base_url
+        self.timeout = timeout
+        self.timeouts = timeouts
+        self.requests = 0
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size if keep_alive else 0,
+            keepalive_expiry=idle_timeout
+        )
+        self.client = httpx.AsyncClient(timeout=timeout, limits=self.limits)
+
+    def _call_options(self, deadline: Optional[Deadline],
+                      url: Optional[str] = None) -> Tuple[float, Optional[Dict[str, str]]]:
+        """Per-call timeout and headers, bounded by the request's deadline.
+
+        With url, the timeout adapts to the latency of that endpoint if
+        adaptive timeouts are enabled. Headers also carry the trace of the
+        request, if it is traced.
+        """
+        timeout = self.timeout
+        if url is not None and self.timeouts is not None:
+            timeout = self.timeouts.timeout_for(url)
+        headers = propagation_headers()
+        if deadline is None:
+            return timeout, headers or None
+        headers[DEADLINE_HEADER] = deadline.header_value()
+        return deadline.cap(timeout), headers
+
+    def _observe(self, url: str, timeout: float) -> Any:
+        """Context recording the call's latency for adaptive timeouts, if enabled."""
+        if self.timeouts is None:
+            return nullcontext()
+        return self.timeouts.observe(url, timeout)
+
+    async def post(self, endpoint: str = '',
+                   data: Optional[Dict[str, Any]] = None,
+                   deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Make POST request to external service, within deadline if given."""
+        return (await self.post_with_headers(endpoint, data, deadline))[0]
+
+    async def post_with_headers(self, endpoint: str = '',
+                                data: Optional[Dict[str, Any]] = None,
+                                deadline: Optional[Deadline] = None
+                                ) -> Tuple[Dict[str, Any], Mapping[str, str]]:
+        """Make POST request to external service; returns body and response headers."""
+        url = f"{self.base_url}/{endpoint}".rstrip('/')
+        self.requests += 1
+        timeout, headers = self._call_options(deadline, url)
+
+        try:
+            logger.debug(f'Calling external service: {url}')
+            with span('upstream_io'), self._observe(url, timeout):
+                response = await self.client.post(url, json=data, headers=headers,
+                                                  timeout=timeout)
+            response.raise_for_status()
+            return response.json(), response.headers
+        except httpx.TimeoutException:
+            logger.error(f'Request to {url} timed out')
+            raise
+        except httpx.TransportError:
+            logger.error(f'Connection error to {url}')
+            raise
+        except httpx.HTTPStatusError as e:
+            logger.error(f'HTTP error from {url}: {e.response.status_code}')
+            raise
+        except Exception as e:
+            logger.error(f'Unexpected error calling {url}: {str(e)}')
+            raise
+
+    async def post_raw(self, endpoint: str = '',
+                       data: Optional[Dict[str, Any]] = None,
+                       deadline: Optional[Deadline] = None,
+                       strict: bool = False) -> RawJson:
+        """Make POST request to external service; returns the JSON body undecoded.
+
+        Raises ValueError if the body isn't JSON, like post() does.
+        """
+        url = f"{self.base_url}/{endpoint}".rstrip('/')
+        self.requests += 1
+        timeout, headers = self._call_options(deadline, url)
+
+        try:
+            logger.debug(f'Calling external service: {url}')
+            with span('upstream_io'), self._observe(url, timeout):
+                response = await self.client.post(url, json=data, headers=headers,
+                                                  timeout=timeout)
+            response.raise_for_status()
+            return RawJson(check_json_bytes(
+                response.content, response.headers.get('Content-Type'), strict
+            ))
+        except httpx.TimeoutException:
+            logger.error(f'Request to {url} timed out')
+            raise
+        except httpx.TransportError:
+            logger.error(f'Connection error to {url}')
+            raise
+        except httpx.HTTPStatusError as e:
+            logger.error(f'HTTP error from {url}: {e.response.status_code}')
+            raise
+        except Exception as e:
+            logger.error(f'Unexpected error calling {url}: {str(e)}')
+            raise
+
+    async def post_stream(self, endpoint: str = '',
+                          chunks: Optional[AsyncIterable[bytes]] = None,
+                          deadline: Optional[Deadline] = None,
+                          content_type: str = 'application/json') -> 'httpx.Response':
+        """Send chunks as a chunked POST body; returns the response unread.
+
+        The caller reads the response with aiter_bytes() and must aclose()
+        it. Error statuses are returned, not raised, so they can be passed
+        through.
+        """
+        url = f"{self.base_url}/{endpoint}".rstrip('/')
+        self.requests += 1
+        timeout, headers = self._call_options(deadline)
+        headers = dict(headers or {}, **{'Content-Type': content_type})
+
+        try:
+            logger.debug(f'Streaming to external service: {url}')
+            request = self.client.build_request('POST', url, content=chunks,
+                                                headers=headers, timeout=timeout)
+            with span('upstream_io'):
+                return await self.client.send(request, stream=True)
+        except httpx.TimeoutException:
+            logger.error(f'Request to {url} timed out')
+            raise
+        except httpx.TransportError:
+            logger.error(f'Connection error to {url}')
+            raise
+        except Exception as e:
+            logger.error(f'Unexpected error calling {url}: {str(e)}')
+            raise
+
+    async def get(self, endpoint: str = '',
+                  deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Make GET request to external service, within deadline if given."""
+        url = f"{self.base_url}/{endpoint}".rstrip('/')
+        self.requests += 1
+        timeout, headers = self._call_options(deadline)
+
+        try:
+            response = await self.client.get(url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f'Error calling {url}: {str(e)}')
+            raise
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Get request count and connection pool limits.
+
+        httpx doesn't report connection reuse, so unlike the sync client
+        there are no hit or new-connection counts.
+        """
+        return {
+            'requests': self.requests,
+            'max_connections': self.limits.max_connections,
+            'max_keepalive_connections': self.limits.max_keepalive_connections,
+            'keepalive_expiry': self.limits.keepalive_expiry
+        }
+
+    async def close(self) -> None:
+        """Close the underlying connection pool."""
+        await self.client.aclose()
+
+
+class AsyncClientRegistry:
+    """Holds one AsyncExternalServiceClient per upstream base URL."""
+
+    def __init__(self, timeout: int = 10, pool_size: int = 100,
+                 keep_alive: bool = True, idle_timeout: float = 60.0,
+                 timeouts: Optional[AdaptiveTimeout] = None):
+        """
+        Initialize the Async Client Registry.
+
+        Args:
+            timeout: Request timeout in seconds for created clients
+            pool_size: Maximum concurrent connections per upstream
+            keep_alive: Reuse connections between requests
+            idle_timeout: Seconds an idle keep-alive connection is kept
+            timeouts: Adaptive per-endpoint timeouts shared by created clients
+        """
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self.timeouts = timeouts
+        self._clients: Dict[str, AsyncExternalServiceClient] = {}
+
+    def get(self, base_url: str) -> AsyncExternalServiceClient:
+        """Get the shared client for an upstream, creating it on first use."""
+        client = self._clients.get(base_url)
+        if client is None:
+            client = AsyncExternalServiceClient(
+                base_url,
+                timeout=self.timeout,
+                pool_size=self.pool_size,
+                keep_alive=self.keep_alive,
+                idle_timeout=self.idle_timeout,
+                timeouts=self.timeouts
+            )
+            self._clients[base_url] = client
+            logger.info(f'Created async pooled client for {base_url}')
+        return client
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get pool statistics for every upstream."""
+        return {url: client.get_pool_stats() for url, client in self._clients.items()}
+
+    async def close(self) -> None:
+        """Close every pooled client."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        await asyncio.gather(*(client.close() for client in clients))
+        logger.info('Async client registry closed')
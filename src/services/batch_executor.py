@@ -0,0 +1,81 @@
+"""Bounded concurrent fan-out of batch items."""
+
+import asyncio
+import logging
+import contextvars
+import threading
+from concurrent import futures
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class BatchExecutor:
+    """Runs a function over batch items concurrently, results in item order.
+
+    A worker pool shared by all batches bounds the threads used overall;
+    each batch additionally keeps at most `concurrency` items in flight so
+    one large batch can't occupy every worker. Each result is the item's
+    return value or the exception it raised.
+    """
+
+    def __init__(self, max_workers: int = 32, concurrency: int = 8):
+        """
+        Initialize the Batch Executor.
+
+        Args:
+            max_workers: Threads shared by all batches (threaded path)
+            concurrency: Items of one batch in flight at a time
+        """
+        self.max_workers = max_workers
+        self.concurrency = concurrency
+        self._executor: Optional[futures.ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='batch'
+                    )
+        return self._executor
+
+    def map(self, func: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+        """Call func on every item; returns results or exceptions in order."""
+        pool = self._pool()
+        results: List[Any] = [None] * len(items)
+        pending = {}
+        next_index = 0
+
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < self.concurrency:
+                # Items run in the caller's context so they join its trace
+                context = contextvars.copy_context()
+                pending[pool.submit(context.run, func, items[next_index])] = next_index
+                next_index += 1
+
+            done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                results[index] = error if error is not None else future.result()
+        return results
+
+    async def map_async(self, func: Callable[[Any], Awaitable[Any]],
+                        items: Sequence[Any]) -> List[Any]:
+        """Await func on every item; returns results or exceptions in order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(item: Any) -> Any:
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(*(run(item) for item in items),
+                                    return_exceptions=True)
+
+    def close(self) -> None:
+        """Stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
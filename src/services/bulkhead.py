@@ -0,0 +1,262 @@
+"""Bulkhead: a fixed budget of concurrent requests with a bounded priority queue."""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence
+
+from .deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+# Priority class a caller asks for; a priority mapped from its API key wins
+PRIORITY_HEADER = 'X-Priority'
+API_KEY_HEADER = 'X-API-Key'
+
+# Highest priority first
+PRIORITY_CLASSES = ('high', 'normal', 'low')
+
+# Why a request was turned away
+REJECT_REASONS = ('queue_full', 'shed', 'queue_timeout', 'deadline')
+
+
+class BulkheadRejected(Exception):
+    """Raised when a request is not admitted; retry_after is in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f'Request rejected by bulkhead ({reason})')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_api_key_priorities(value: str) -> Dict[str, str]:
+    """Parse "key:class,key:class" into a dict of API key to priority class."""
+    priorities = {}
+    for entry in value.split(','):
+        if not entry.strip():
+            continue
+        key, sep, priority = entry.rpartition(':')
+        if not sep or not key.strip():
+            raise ValueError(f'Expected "api_key:priority", got {entry.strip()!r}')
+        priorities[key.strip()] = priority.strip()
+    return priorities
+
+
+class _Waiter:
+    """A queued request: granted a slot by release(), or turned away."""
+
+    __slots__ = ('rank', 'deadline', 'queued_at', 'event', 'future', 'admitted', 'reason')
+
+    def __init__(self, rank: int, deadline: Optional[Deadline]):
+        self.rank = rank
+        self.deadline = deadline
+        self.queued_at = time.monotonic()
+        self.event: Optional[threading.Event] = None
+        self.future: Optional['asyncio.Future[None]'] = None
+        self.admitted = False
+        self.reason: Optional[str] = None
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.future is not None and not self.future.done():
+            self.future.set_result(None)
+
+
+class Bulkhead:
+    """Admits at most max_concurrent requests; the rest wait in a bounded queue.
+
+    A freed slot goes to the oldest waiter of the highest priority class.
+    When the queue is full, a newcomer displaces the newest waiter of a
+    lower class, or is turned away if there is none. Waiters give up after
+    max_queue_time or when their deadline leaves no time, so queueing
+    delay stays bounded and turned-away callers hear so at once.
+    """
+
+    def __init__(self, max_concurrent: int = 50, max_queue: int = 100,
+                 max_queue_time: float = 1.0,
+                 priorities: Sequence[str] = PRIORITY_CLASSES,
+                 default_priority: str = 'normal',
+                 api_key_priorities: Optional[Mapping[str, str]] = None,
+                 retry_after: int = 1):
+        """
+        Initialize the Bulkhead.
+
+        Args:
+            max_concurrent: Requests admitted at once
+            max_queue: Requests allowed to wait for a slot
+            max_queue_time: Longest a request waits for a slot, in seconds
+            priorities: Priority class names, highest first
+            default_priority: Class of requests that don't name a known one
+            api_key_priorities: Priority class of each API key
+            retry_after: Seconds rejected callers are told to wait
+        """
+        if default_priority not in priorities:
+            raise ValueError(f'Unknown default priority {default_priority!r}')
+        for key, priority in (api_key_priorities or {}).items():
+            if priority not in priorities:
+                raise ValueError(f'Unknown priority {priority!r} for an API key')
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self.priorities = tuple(priorities)
+        self.default_priority = default_priority
+        self.api_key_priorities = dict(api_key_priorities or {})
+        self.retry_after = retry_after
+        self.active = 0
+        self._queues: List[Deque[_Waiter]] = [deque() for _ in self.priorities]
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self.admitted = [0] * len(self.priorities)
+        self.rejected = {reason: [0] * len(self.priorities) for reason in REJECT_REASONS}
+        self.max_wait = 0.0
+
+    def classify(self, headers: Mapping[str, str]) -> int:
+        """Priority rank (0 is highest) of a request from its headers.
+
+        X-Priority can't be trusted, so it may only lower a request below
+        the default class; raising it takes an API key mapped to a class.
+        """
+        priority = self.api_key_priorities.get(headers.get(API_KEY_HEADER) or '')
+        if priority is not None:
+            return self.priorities.index(priority)
+        default = self.priorities.index(self.default_priority)
+        requested = (headers.get(PRIORITY_HEADER) or '').strip().lower()
+        if requested not in self.priorities:
+            return default
+        return max(default, self.priorities.index(requested))
+
+    def _reject(self, reason: str, rank: int) -> BulkheadRejected:
+        self.rejected[reason][rank] += 1
+        return BulkheadRejected(reason, self.retry_after)
+
+    def _admit_or_queue(self, rank: int, deadline: Optional[Deadline]) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or a place in the queue; called locked."""
+        if self.active < self.max_concurrent and not self._waiting:
+            self.active += 1
+            self.admitted[rank] += 1
+            return None
+        if self.max_queue_time <= 0 or (deadline is not None and deadline.expired()):
+            raise self._reject('queue_full', rank)
+
+        if self._waiting >= self.max_queue:
+            # Make room by shedding the newest waiter of the lowest class below ours
+            for lower in range(len(self._queues) - 1, rank, -1):
+                if self._queues[lower]:
+                    victim = self._queues[lower].pop()
+                    self._waiting -= 1
+                    victim.reason = 'shed'
+                    self.rejected['shed'][lower] += 1
+                    victim.wake()
+                    break
+            else:
+                raise self._reject('queue_full', rank)
+
+        waiter = _Waiter(rank, deadline)
+        self._queues[rank].append(waiter)
+        self._waiting += 1
+        return waiter
+
+    def _wait_time(self, deadline: Optional[Deadline]) -> float:
+        if deadline is None:
+            return self.max_queue_time
+        return min(self.max_queue_time, deadline.remaining())
+
+    def _settle(self, waiter: _Waiter) -> None:
+        """After waiting: return if admitted, else dequeue and raise; called locked."""
+        if waiter.admitted:
+            self.max_wait = max(self.max_wait, time.monotonic() - waiter.queued_at)
+            return
+        if waiter.reason is None:
+            # Still queued when its wait ran out
+            self._queues[waiter.rank].remove(waiter)
+            self._waiting -= 1
+            expired = waiter.deadline is not None and waiter.deadline.expired()
+            waiter.reason = 'deadline' if expired else 'queue_timeout'
+            self.rejected[waiter.reason][waiter.rank] += 1
+        raise BulkheadRejected(waiter.reason, self.retry_after)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Give up a wait that was interrupted (e.g. the caller disconnected)."""
+        with self._lock:
+            if waiter.reason is not None:
+                return
+            if not waiter.admitted:
+                self._queues[waiter.rank].remove(waiter)
+                self._waiting -= 1
+                waiter.reason = 'queue_timeout'
+                return
+        self.release()
+
+    def enter(self, rank: int, deadline: Optional[Deadline] = None) -> None:
+        """Wait for a slot; raises BulkheadRejected if none is given in time.
+
+        Every successful enter() must be paired with a release().
+        """
+        with self._lock:
+            waiter = self._admit_or_queue(rank, deadline)
+            if waiter is None:
+                return
+            waiter.event = threading.Event()
+        try:
+            waiter.event.wait(self._wait_time(deadline))
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        with self._lock:
+            self._settle(waiter)
+
+    async def enter_async(self, rank: int, deadline: Optional[Deadline] = None) -> None:
+        """Await a slot; like enter() but for callers on one event loop."""
+        with self._lock:
+            waiter = self._admit_or_queue(rank, deadline)
+            if waiter is None:
+                return
+            waiter.future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait({waiter.future}, timeout=self._wait_time(deadline))
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        with self._lock:
+            self._settle(waiter)
+
+    def release(self) -> None:
+        """Free a slot, handing it to the next waiter whose deadline allows."""
+        with self._lock:
+            for rank, queue in enumerate(self._queues):
+                while queue:
+                    waiter = queue.popleft()
+                    self._waiting -= 1
+                    if waiter.deadline is not None and waiter.deadline.expired():
+                        waiter.reason = 'deadline'
+                        self.rejected['deadline'][rank] += 1
+                        waiter.wake()
+                        continue
+                    # The slot passes straight to the waiter; active is unchanged
+                    waiter.admitted = True
+                    self.admitted[rank] += 1
+                    waiter.wake()
+                    return
+            self.active -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get slot and queue usage and per-priority admission and rejection counts."""
+        with self._lock:
+            return {
+                'active': self.active,
+                'max_concurrent': self.max_concurrent,
+                'queued': self._waiting,
+                'max_queue': self.max_queue,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+                'priorities': {
+                    name: {
+                        'admitted': self.admitted[rank],
+                        'queued': len(self._queues[rank]),
+                        **{reason: counts[rank] for reason, counts in self.rejected.items()}
+                    }
+                    for rank, name in enumerate(self.priorities)
+                }
+            }
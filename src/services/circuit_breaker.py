@@ -2,8 +2,12 @@
 
 import time
 import logging
+import threading
+from contextlib import contextmanager
 from enum import Enum
-from typing import Callable, Any
+from typing import Awaitable, Callable, Any, Dict, Iterator, Optional
+
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -15,86 +19,279 @@ class CircuitState(Enum):
     HALF_OPEN = "HALF_OPEN"
 
 
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker rejects a call."""
+
+
 class CircuitBreaker:
-    """Circuit Breaker implementation to handle failures in external services."""
-    
+    """Circuit Breaker implementation to handle failures in external services.
+
+    While CLOSED, call outcomes are counted in a rolling window of time
+    buckets and the breaker opens when the failure rate or slow-call rate
+    crosses its threshold. After reset_timeout it admits at most
+    half_open_max_calls trial calls at a time and closes after
+    success_threshold successful trials.
+
+    Callers take a permit with acquire() and report the outcome with
+    record_success()/record_failure(). Permits carry the state generation
+    they were issued in, so outcomes of calls admitted before a transition
+    can't disturb the new state. All state changes happen under one lock.
+    """
+
     def __init__(self, failure_threshold: int = 5, reset_timeout: int = 30,
-                 success_threshold: int = 2):
+                 success_threshold: int = 2, failure_rate_threshold: float = 0.5,
+                 minimum_calls: int = 1, slow_call_duration: Optional[float] = None,
+                 slow_call_rate_threshold: float = 1.0, window_seconds: float = 60,
+                 window_buckets: int = 10, half_open_max_calls: int = 1):
         """
         Initialize the Circuit Breaker.
-        
+
         Args:
-            failure_threshold: Number of failures before opening circuit
+            failure_threshold: Minimum failures in the window before opening
             reset_timeout: Seconds before transitioning from OPEN to HALF_OPEN
             success_threshold: Number of successes in HALF_OPEN before closing
+            failure_rate_threshold: Failure ratio (0-1) in the window that opens the circuit
+            minimum_calls: Calls needed in the window before rates are evaluated
+            slow_call_duration: Seconds after which a call counts as slow (None disables)
+            slow_call_rate_threshold: Slow call ratio (0-1) in the window that opens the circuit
+            window_seconds: Length of the rolling window
+            window_buckets: Number of time buckets the window is split into
+            half_open_max_calls: Concurrent trial calls admitted in HALF_OPEN
         """
         self.failure_threshold = failure_threshold
         self.reset_timeout = reset_timeout
         self.success_threshold = success_threshold
-        
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.window_buckets = window_buckets
+        self.bucket_width = window_seconds / window_buckets
+        self.half_open_max_calls = half_open_max_calls
+
         self.state = CircuitState.CLOSED
-        self.failure_count = 0
+        self.state_since = time.time()
+        self.generation = 0
         self.success_count = 0
+        self.half_open_in_flight = 0
+        self.half_open_since = 0.0
+        # Permits this process issued whose outcome hasn't been reported yet
+        self.in_flight = 0
         self.last_failure_time = None
         self.last_open_time = None
-    
+
+        # Rolling window: per bucket its epoch and call/failure/slow counts
+        self.bucket_epochs = [-1] * window_buckets
+        self.bucket_calls = [0] * window_buckets
+        self.bucket_failures = [0] * window_buckets
+        self.bucket_slow_calls = [0] * window_buckets
+
+        # Called as on_transition(previous, state, seconds in previous) under the lock
+        self.on_transition: Optional[Callable[[CircuitState, CircuitState, float], None]] = None
+
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _guard(self) -> Iterator[None]:
+        """Hold the lock protecting all breaker state."""
+        with self._lock:
+            yield
+
+    def acquire(self) -> Optional[int]:
+        """Ask to make a call; returns a permit, or None if the call is rejected."""
+        now = time.time()
+        with span('breaker'), self._guard():
+            self._maybe_half_open(now)
+
+            if self.state == CircuitState.CLOSED:
+                self.in_flight += 1
+                return self.generation
+            if self.state == CircuitState.OPEN:
+                return None
+
+            if self.half_open_in_flight >= self.half_open_max_calls:
+                if now - self.half_open_since < self.reset_timeout:
+                    return None
+                # Trials never reported back (e.g. their worker died)
+                self.half_open_in_flight = 0
+                self.half_open_since = now
+            self.half_open_in_flight += 1
+            self.in_flight += 1
+            return self.generation
+
+    def record_success(self, permit: Optional[int], duration: float = 0.0) -> None:
+        """Report that a call admitted with permit succeeded."""
+        self._record(permit, False, duration)
+
+    def record_failure(self, permit: Optional[int], duration: float = 0.0) -> None:
+        """Report that a call admitted with permit failed."""
+        self._record(permit, True, duration)
+
     def call(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
         """Execute function with circuit breaker protection."""
-        if self.state == CircuitState.OPEN:
-            if self._should_attempt_reset():
-                self.state = CircuitState.HALF_OPEN
-                self.success_count = 0
-                logger.info('Circuit breaker transitioning to HALF_OPEN')
-            else:
-                raise Exception('Circuit breaker is OPEN')
-        
+        permit = self._before_call()
+        start = time.monotonic()
+
         try:
             result = func(*args, **kwargs)
-            self._on_success()
-            return result
-        except Exception as e:
-            self._on_failure()
+        except Exception:
+            self.record_failure(permit, time.monotonic() - start)
+            raise
+        self.record_success(permit, time.monotonic() - start)
+        return result
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]],
+                         *args: Any, **kwargs: Any) -> Any:
+        """Await coroutine function with circuit breaker protection."""
+        permit = self._before_call()
+        start = time.monotonic()
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self.record_failure(permit, time.monotonic() - start)
             raise
-    
-    def _should_attempt_reset(self) -> bool:
+        self.record_success(permit, time.monotonic() - start)
+        return result
+
+    def _before_call(self) -> int:
+        """Acquire a permit or raise CircuitOpenError."""
+        permit = self.acquire()
+        if permit is None:
+            raise CircuitOpenError('Circuit breaker is OPEN')
+        return permit
+
+    def _record(self, permit: Optional[int], failed: bool, duration: float) -> None:
+        now = time.time()
+        with self._guard():
+            if failed:
+                self.last_failure_time = now
+            if permit is not None:
+                self.in_flight = max(0, self.in_flight - 1)
+            if permit is None or permit != self.generation:
+                # Admitted before the last transition; its outcome is stale
+                return
+
+            if self.state == CircuitState.HALF_OPEN:
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+                if failed:
+                    self._transition(CircuitState.OPEN, now)
+                    logger.warning('Circuit breaker transitioning to OPEN from HALF_OPEN')
+                else:
+                    self.success_count += 1
+                    if self.success_count >= self.success_threshold:
+                        self._transition(CircuitState.CLOSED, now)
+                        logger.info('Circuit breaker transitioning to CLOSED')
+                return
+
+            if self.state == CircuitState.CLOSED:
+                slow = (self.slow_call_duration is not None
+                        and duration >= self.slow_call_duration)
+                self._add_to_window(now, failed, slow)
+                if self._should_trip(now):
+                    calls, failures, slow_calls = self._window_totals(now)
+                    self._transition(CircuitState.OPEN, now)
+                    logger.warning(
+                        f'Circuit breaker OPEN after {failures} failures and '
+                        f'{slow_calls} slow calls in {calls} calls'
+                    )
+
+    def _maybe_half_open(self, now: float) -> None:
+        """Move from OPEN to HALF_OPEN once reset_timeout has elapsed."""
+        if self.state == CircuitState.OPEN and self._should_attempt_reset(now):
+            self._transition(CircuitState.HALF_OPEN, now)
+            logger.info('Circuit breaker transitioning to HALF_OPEN')
+
+    def _should_attempt_reset(self, now: Optional[float] = None) -> bool:
         """Check if we should attempt reset from OPEN state."""
         if self.last_open_time is None:
             return False
-        elapsed = time.time() - self.last_open_time
+        elapsed = (time.time() if now is None else now) - self.last_open_time
         return elapsed >= self.reset_timeout
-    
-    def _on_success(self) -> None:
-        """Handle successful call."""
-        self.failure_count = 0
-        
-        if self.state == CircuitState.HALF_OPEN:
-            self.success_count += 1
-            if self.success_count >= self.success_threshold:
-                self.state = CircuitState.CLOSED
-                self.success_count = 0
-                logger.info('Circuit breaker transitioning to CLOSED')
-    
-    def _on_failure(self) -> None:
-        """Handle failed call."""
-        self.failure_count += 1
-        self.last_failure_time = time.time()
-        
-        if self.state == CircuitState.HALF_OPEN:
-            self.state = CircuitState.OPEN
-            self.last_open_time = time.time()
-            logger.warning('Circuit breaker transitioning to OPEN from HALF_OPEN')
-        elif self.failure_count >= self.failure_threshold:
-            self.state = CircuitState.OPEN
-            self.last_open_time = time.time()
-            logger.warning(f'Circuit breaker OPEN after {self.failure_count} failures')
-    
+
+    def _transition(self, state: CircuitState, now: float) -> None:
+        """Enter state; outstanding permits become stale."""
+        previous, elapsed = self.state, max(0.0, now - self.state_since)
+        self.state = state
+        self.state_since = now
+        self.generation += 1
+        self.success_count = 0
+        self.half_open_in_flight = 0
+
+        if state == CircuitState.OPEN:
+            self.last_open_time = now
+        elif state == CircuitState.HALF_OPEN:
+            self.half_open_since = now
+        else:
+            self._clear_window()
+
+        if self.on_transition is not None:
+            self.on_transition(previous, state, elapsed)
+
+    def _add_to_window(self, now: float, failed: bool, slow: bool) -> None:
+        epoch = int(now // self.bucket_width)
+        index = epoch % self.window_buckets
+        if self.bucket_epochs[index] != epoch:
+            self.bucket_epochs[index] = epoch
+            self.bucket_calls[index] = 0
+            self.bucket_failures[index] = 0
+            self.bucket_slow_calls[index] = 0
+
+        self.bucket_calls[index] += 1
+        self.bucket_failures[index] += failed
+        self.bucket_slow_calls[index] += slow
+
+    def _window_totals(self, now: float):
+        """Sum (calls, failures, slow calls) over buckets still in the window."""
+        oldest_epoch = int(now // self.bucket_width) - self.window_buckets + 1
+        calls = failures = slow_calls = 0
+        for index, epoch in enumerate(self.bucket_epochs):
+            if epoch >= oldest_epoch:
+                calls += self.bucket_calls[index]
+                failures += self.bucket_failures[index]
+                slow_calls += self.bucket_slow_calls[index]
+        return calls, failures, slow_calls
+
+    def _clear_window(self) -> None:
+        for index in range(self.window_buckets):
+            self.bucket_epochs[index] = -1
+            self.bucket_calls[index] = 0
+            self.bucket_failures[index] = 0
+            self.bucket_slow_calls[index] = 0
+
+    def _should_trip(self, now: float) -> bool:
+        calls, failures, slow_calls = self._window_totals(now)
+        if calls < self.minimum_calls:
+            return False
+        if (failures >= self.failure_threshold
+                and failures / calls >= self.failure_rate_threshold):
+            return True
+        return (self.slow_call_duration is not None and slow_calls > 0
+                and slow_calls / calls >= self.slow_call_rate_threshold)
+
     def get_state(self) -> str:
         """Get current circuit state."""
-        return self.state.value
-    
+        with self._guard():
+            self._maybe_half_open(time.time())
+            return self.state.value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current state and rolling window counts."""
+        now = time.time()
+        with span('breaker'), self._guard():
+            self._maybe_half_open(now)
+            calls, failures, slow_calls = self._window_totals(now)
+            return {
+                'state': self.state.value,
+                'calls': calls,
+                'failures': failures,
+                'slow_calls': slow_calls,
+                'failure_rate': failures / calls if calls else 0.0,
+                'half_open_in_flight': self.half_open_in_flight
+            }
+
     def reset(self) -> None:
         """Manually reset circuit breaker."""
-        self.state = CircuitState.CLOSED
-        self.failure_count = 0
-        self.success_count = 0
+        with self._guard():
+            self._transition(CircuitState.CLOSED, time.time())
         logger.info('Circuit breaker manually reset to CLOSED')
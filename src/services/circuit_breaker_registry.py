@@ -0,0 +1,182 @@
+"""Registry of circuit breakers keyed by upstream host and endpoint."""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+from .circuit_breaker import CircuitBreaker, CircuitState
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerRegistry:
+    """Lazily creates one CircuitBreaker per upstream host and endpoint.
+
+    A failing endpoint only opens its own breaker, so healthy endpoints and
+    upstreams keep serving traffic. Breakers that sit CLOSED and unused for
+    idle_timeout seconds are dropped (a new one starts clean on next use);
+    OPEN and HALF_OPEN breakers are kept until they recover, and breakers
+    with calls in flight until those calls report back.
+    """
+
+    def __init__(self, breaker_factory: Optional[Callable[[str], CircuitBreaker]] = None,
+                 idle_timeout: float = 600, max_breakers: int = 1000,
+                 **breaker_settings: Any):
+        """
+        Initialize the Circuit Breaker Registry.
+
+        Args:
+            breaker_factory: Builds the breaker for a key (default: CircuitBreaker)
+            idle_timeout: Seconds a CLOSED breaker may go unused before eviction
+            max_breakers: Cap on tracked breakers; idle CLOSED ones go first
+            **breaker_settings: CircuitBreaker arguments for the default factory
+        """
+        self.breaker_factory = breaker_factory or (
+            lambda key: CircuitBreaker(**breaker_settings)
+        )
+        self.idle_timeout = idle_timeout
+        self.max_breakers = max_breakers
+
+        # key -> breaker, least recently used first; last use kept separately
+        self._breakers: 'OrderedDict[str, CircuitBreaker]' = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + idle_timeout
+        self.evictions = 0
+
+        # Called as on_transition(previous, state) when any breaker changes state
+        self.on_transition: Optional[Callable[[CircuitState, CircuitState], None]] = None
+        # Seconds spent in each state by past states and evicted breakers
+        self._state_seconds = {state: 0.0 for state in CircuitState}
+        self._reported_seconds = {state: 0.0 for state in CircuitState}
+        self._time_lock = threading.Lock()
+
+    @staticmethod
+    def key_for(host: str, endpoint: str = '') -> str:
+        """Build the registry key for an upstream host and endpoint path."""
+        return f"{host}/{endpoint.lstrip('/')}"
+
+    def get(self, host: str, endpoint: str = '') -> CircuitBreaker:
+        """Get the breaker for an upstream host and endpoint, creating it on first use."""
+        key = self.key_for(host, endpoint)
+        now = time.monotonic()
+
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self.breaker_factory(key)
+                breaker.on_transition = self._transitioned
+                self._breakers[key] = breaker
+                logger.debug(f'Created circuit breaker for {key}')
+            else:
+                self._breakers.move_to_end(key)
+            self._last_used[key] = now
+
+            if now >= self._next_sweep or len(self._breakers) > self.max_breakers:
+                self._evict(now)
+        return breaker
+
+    def for_url(self, url: str) -> CircuitBreaker:
+        """Get the breaker for the host and path of a full URL."""
+        parts = urlsplit(url)
+        return self.get(parts.netloc, parts.path)
+
+    def for_endpoint(self, base_url: str, endpoint: str = '') -> CircuitBreaker:
+        """Get the breaker for an endpoint of an upstream, by the URL clients call."""
+        return self.for_url(f"{base_url}/{endpoint}".rstrip('/'))
+
+    def _evict(self, now: float) -> None:
+        """Drop idle CLOSED breakers, then the least recently used over the cap."""
+        self._next_sweep = now + self.idle_timeout / 2
+        over_cap = len(self._breakers) - self.max_breakers
+
+        for key in list(self._breakers):
+            breaker = self._breakers[key]
+            idle = now - self._last_used[key] >= self.idle_timeout
+            if not (idle or over_cap > 0):
+                continue
+            if breaker.state != CircuitState.CLOSED or breaker.in_flight:
+                # Outstanding permits still have outcomes to record
+                continue
+
+            del self._breakers[key]
+            del self._last_used[key]
+            over_cap -= 1
+            self.evictions += 1
+            self._add_state_time(breaker.state, time.time() - breaker.state_since)
+            close = getattr(breaker, 'close', None)
+            if close is not None:
+                close()
+
+    def _add_state_time(self, state: CircuitState, seconds: float) -> None:
+        with self._time_lock:
+            self._state_seconds[state] += max(0.0, seconds)
+
+    def _transitioned(self, previous: CircuitState, state: CircuitState,
+                      elapsed: float) -> None:
+        self._add_state_time(previous, elapsed)
+        if self.on_transition is not None:
+            self.on_transition(previous, state)
+
+    def get_state_seconds(self) -> Dict[str, float]:
+        """Seconds spent in each state, summed over all breakers past and present.
+
+        Never decreases between calls, so it can be exported as a counter.
+        """
+        now = time.time()
+        with self._lock:
+            breakers = list(self._breakers.values())
+
+        with self._time_lock:
+            totals = dict(self._state_seconds)
+            for breaker in breakers:
+                totals[breaker.state] += max(0.0, now - breaker.state_since)
+            for state, seconds in totals.items():
+                # A transition racing this read can briefly move time between states
+                self._reported_seconds[state] = max(self._reported_seconds[state], seconds)
+            return {state.value: seconds for state, seconds in self._reported_seconds.items()}
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Summarize breaker states: counts plus the keys that are not CLOSED."""
+        with self._lock:
+            breakers = list(self._breakers.items())
+
+        summary: Dict[str, Any] = {
+            'total': len(breakers),
+            'closed': 0,
+            'open': [],
+            'half_open': [],
+            'evictions': self.evictions
+        }
+        for key, breaker in breakers:
+            state = breaker.get_state()
+            if state == CircuitState.CLOSED.value:
+                summary['closed'] += 1
+            elif state == CircuitState.OPEN.value:
+                summary['open'].append(key)
+            else:
+                summary['half_open'].append(key)
+        return summary
+
+    def __len__(self) -> int:
+        return len(self._breakers)
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Whether an error from an upstream call should count against its breaker.
+
+    Client errors (4xx other than 429) say nothing bad about the upstream's
+    health, so they are recorded as successes.
+    """
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is None:
+        return True
+    return is_failure_status(status)
+
+
+def is_failure_status(status: int) -> bool:
+    """Whether an upstream response status counts against its breaker."""
+    return status >= 500 or status == 429
@@ -0,0 +1,122 @@
+"""Registry of pooled upstream clients shared across requests."""
+
+import time
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+from .adaptive_timeout import AdaptiveTimeout
+from .external_service_client import ExternalServiceClient
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """Holds one pooled ExternalServiceClient per upstream base URL."""
+
+    def __init__(self, timeout: int = 10, pool_size: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True,
+                 idle_timeout: float = 60.0,
+                 timeouts: Optional[AdaptiveTimeout] = None):
+        """
+        Initialize the Client Registry.
+
+        Args:
+            timeout: Request timeout in seconds for created clients
+            pool_size: Maximum connections kept open per upstream
+            pool_block: Wait for a free connection when the pool is exhausted
+            keep_alive: Reuse connections between requests
+            idle_timeout: Seconds before idle connections are reaped
+            timeouts: Adaptive per-endpoint timeouts shared by created clients
+        """
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.idle_timeout = idle_timeout
+        self.timeouts = timeouts
+
+        self._clients: Dict[str, ExternalServiceClient] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+        self._closed = False
+
+    def get(self, base_url: str) -> ExternalServiceClient:
+        """Get the shared client for an upstream, creating it on first use."""
+        client = self._clients.get(base_url)
+        if client is not None:
+            return client
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Client registry is closed')
+            client = self._clients.get(base_url)
+            if client is None:
+                client = ExternalServiceClient(
+                    base_url,
+                    timeout=self.timeout,
+                    pool_size=self.pool_size,
+                    pool_block=self.pool_block,
+                    keep_alive=self.keep_alive,
+                    idle_timeout=self.idle_timeout,
+                    timeouts=self.timeouts
+                )
+                self._clients[base_url] = client
+                logger.info(f'Created pooled client for {base_url}')
+        return client
+
+    def reap_idle(self) -> int:
+        """Drop connections of upstreams unused for longer than idle_timeout."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                client for client in self._clients.values()
+                if now - client.last_used > self.idle_timeout
+            ]
+
+        for client in idle:
+            client.close_idle_connections()
+
+        if idle:
+            logger.debug(f'Reaped idle connections for {len(idle)} upstreams')
+        return len(idle)
+
+    def start_reaper(self, interval: float = 30.0) -> None:
+        """Start a daemon thread that periodically reaps idle connections."""
+        if self._reaper is not None:
+            return
+
+        def _run() -> None:
+            while not self._stop_event.wait(interval):
+                try:
+                    self.reap_idle()
+                except Exception as e:
+                    logger.error(f'Error reaping idle connections: {str(e)}')
+
+        self._reaper = threading.Thread(
+            target=_run, name='client-registry-reaper', daemon=True
+        )
+        self._reaper.start()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get pool statistics for every upstream."""
+        with self._lock:
+            clients = dict(self._clients)
+        return {url: client.get_pool_stats() for url, client in clients.items()}
+
+    def close(self) -> None:
+        """Stop the reaper and close every pooled client."""
+        self._stop_event.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+            self._reaper = None
+
+        with self._lock:
+            self._closed = True
+            clients = list(self._clients.values())
+            self._clients.clear()
+
+        for client in clients:
+            client.close()
+        logger.info('Client registry closed')
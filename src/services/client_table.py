@@ -0,0 +1,173 @@
+"""Bounded per-client state table with LRU eviction and incremental expiry."""
+
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ClientTable:
+    """Fixed-capacity map of client id to limiter state.
+
+    Entries are kept in write order and every entry shares the same TTL
+    measured from its last write, so the oldest entry is always the next to
+    expire. The recency list therefore doubles as the expiry queue: expiry
+    pops a few entries off its head on each write instead of scanning the
+    whole table, and the hard cap evicts from the same end.
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl: Optional[float] = None,
+                 expire_batch: int = 2):
+        """
+        Initialize the Client Table.
+
+        Args:
+            max_entries: Hard cap on tracked clients; least recent are evicted
+            ttl: Seconds after its last write that an entry is discarded
+            expire_batch: Expired entries removed per write
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.expire_batch = expire_batch
+
+        # client_id -> [last write time, state]
+        self._entries: 'OrderedDict[str, list]' = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+        # Guards read-modify-write of this table's entries; held by callers
+        self.lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Optional[Any]:
+        """Get a client's state without changing its position."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and now - entry[0] >= self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, key: str, state: Any, now: float) -> None:
+        """Store a client's state and mark it most recently written."""
+        self.expire(now, limit=self.expire_batch)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] = now
+            entry[1] = state
+            self._entries.move_to_end(key)
+            return
+
+        self._entries[key] = [now, state]
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def expire(self, now: float, max_age: Optional[float] = None,
+               limit: Optional[int] = None) -> int:
+        """Remove entries not written for max_age seconds (default: ttl)."""
+        if max_age is None:
+            max_age = self.ttl
+        elif self.ttl is not None:
+            max_age = min(max_age, self.ttl)
+        if max_age is None:
+            return 0
+
+        removed = 0
+        entries = self._entries
+        while entries and (limit is None or removed < limit):
+            key = next(iter(entries))
+            if now - entries[key][0] < max_age:
+                break
+            del entries[key]
+            removed += 1
+
+        self.expirations += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get table size and eviction counters."""
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+class ShardedClientTable:
+    """ClientTable split into independently locked shards.
+
+    A client always maps to the same shard, so limiter checks for different
+    clients contend only when they hash to the same shard. Callers take
+    `shard(key).lock` around their read-modify-write of that key.
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl: Optional[float] = None,
+                 shards: int = 16, expire_batch: int = 2):
+        """
+        Initialize the Sharded Client Table.
+
+        Args:
+            max_entries: Hard cap on tracked clients across all shards
+            ttl: Seconds after its last write that an entry is discarded
+            shards: Number of independently locked shards
+            expire_batch: Expired entries removed per write
+        """
+        shards = max(1, min(shards, max_entries))
+        per_shard, extra = divmod(max_entries, shards)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shards: List[ClientTable] = [
+            ClientTable(max_entries=per_shard + (i < extra), ttl=ttl,
+                        expire_batch=expire_batch)
+            for i in range(shards)
+        ]
+
+    def shard(self, key: str) -> ClientTable:
+        """Get the shard that owns key."""
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key: str, now: float) -> Optional[Any]:
+        """Get a client's state under its shard lock."""
+        shard = self.shard(key)
+        with shard.lock:
+            return shard.get(key, now)
+
+    def put(self, key: str, state: Any, now: float) -> None:
+        """Store a client's state under its shard lock."""
+        shard = self.shard(key)
+        with shard.lock:
+            shard.put(key, state, now)
+
+    def expire(self, now: float, max_age: Optional[float] = None) -> int:
+        """Remove stale entries one shard at a time."""
+        removed = 0
+        for shard in self.shards:
+            with shard.lock:
+                removed += shard.expire(now, max_age=max_age)
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get size and eviction counters summed over all shards."""
+        stats = {'size': 0, 'evictions': 0, 'expirations': 0}
+        for shard in self.shards:
+            shard_stats = shard.get_stats()
+            for name in stats:
+                stats[name] += shard_stats[name]
+        stats['max_entries'] = self.max_entries
+        stats['shards'] = len(self.shards)
+        return stats
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.shard(key)
@@ -0,0 +1,194 @@
+"""Adaptive limit on concurrent upstream calls, tuned from latency and errors."""
+
+import math
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when an upstream call would exceed the concurrency limit."""
+
+
+class AIMDLimit:
+    """Additive increase, multiplicative decrease.
+
+    Each successful call while the limit is at least half used raises it
+    by 1/limit, about one per limit's worth of calls. Each failed call, or
+    call slower than latency_threshold, multiplies it by backoff_ratio.
+    """
+
+    name = 'aimd'
+
+    def __init__(self, backoff_ratio: float = 0.9, latency_threshold: Optional[float] = None):
+        """
+        Initialize the AIMD Limit.
+
+        Args:
+            backoff_ratio: Factor the limit is multiplied by on a failure (0-1)
+            latency_threshold: Seconds beyond which a success counts as a failure
+        """
+        self.backoff_ratio = backoff_ratio
+        self.latency_threshold = latency_threshold
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        """Next limit after a call that took rtt seconds with in_flight calls running."""
+        if dropped or (self.latency_threshold is not None and rtt > self.latency_threshold):
+            return limit * self.backoff_ratio
+        if in_flight * 2 >= limit:
+            return limit + 1 / limit
+        return limit
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get algorithm state for the limiter's stats (AIMD keeps none)."""
+        return {}
+
+
+class GradientLimit:
+    """Vegas-style limit following the ratio of long-term to current latency.
+
+    While latency stays near its long-term average the limit grows by
+    about sqrt(limit) per update, the queue the upstream is allowed to
+    build. When latency rises above tolerance times the average, the
+    upstream is queueing, and the limit shrinks in proportion (by at most
+    half per update). Failures shrink it by backoff_ratio.
+    """
+
+    name = 'gradient'
+
+    def __init__(self, tolerance: float = 1.5, smoothing: float = 0.2,
+                 long_window: int = 600, backoff_ratio: float = 0.9):
+        """
+        Initialize the Gradient Limit.
+
+        Args:
+            tolerance: Latency increase over the long-term average that is tolerated
+            smoothing: Weight (0-1) of each update's target in the new limit
+            long_window: Number of calls the long-term latency average spans
+            backoff_ratio: Factor the limit is multiplied by on a failure (0-1)
+        """
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self._alpha = 2 / (long_window + 1)
+        self.long_rtt: Optional[float] = None
+
+    def update(self, limit: float, rtt: float, in_flight: int, dropped: bool) -> float:
+        """Next limit after a call that took rtt seconds with in_flight calls running."""
+        if dropped:
+            return limit * self.backoff_ratio
+        if self.long_rtt is None:
+            self.long_rtt = rtt
+        else:
+            self.long_rtt += self._alpha * (rtt - self.long_rtt)
+            # After latency drops for good, catch up instead of drifting down
+            if self.long_rtt > 2 * rtt:
+                self.long_rtt *= 0.95
+
+        # Calls too few to load the upstream say nothing about its capacity
+        if in_flight * 2 < limit:
+            return limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / max(rtt, 1e-9)))
+        target = limit * gradient + math.sqrt(limit)
+        return limit * (1 - self.smoothing) + target * self.smoothing
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the long-term latency average for the limiter's stats."""
+        return {'long_rtt_ms': round(self.long_rtt * 1000, 3) if self.long_rtt else None}
+
+
+CONCURRENCY_ALGORITHMS = {
+    'aimd': AIMDLimit,
+    'gradient': GradientLimit,
+}
+
+
+class AdaptiveConcurrencyLimiter:
+    """Caps in-flight upstream calls at a limit the algorithm adjusts per call.
+
+    Calls over the limit are rejected at once rather than queued, so when
+    the upstream saturates, callers get a fast error instead of waiting
+    behind calls that are already slow.
+    """
+
+    def __init__(self, algorithm: Any, initial_limit: int = 20,
+                 min_limit: int = 1, max_limit: int = 200):
+        """
+        Initialize the Adaptive Concurrency Limiter.
+
+        Args:
+            algorithm: AIMDLimit or GradientLimit deciding the next limit
+            initial_limit: Calls allowed in flight before any feedback
+            min_limit: Floor of the limit
+            max_limit: Ceiling of the limit
+        """
+        self.algorithm = algorithm
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Take a slot for a call; returns False if the limit is reached."""
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            self.accepted += 1
+            return True
+
+    def release(self, rtt: Optional[float] = None, dropped: bool = False) -> None:
+        """Return a slot, reporting how the call went.
+
+        rtt is the call's latency in seconds and dropped whether it failed
+        in a way that suggests overload. Calls that tell nothing about the
+        upstream (e.g. cut short by the caller) pass neither.
+        """
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if rtt is None and not dropped:
+                return
+            self.dropped += dropped
+            limit = self.algorithm.update(self.limit, rtt or 0.0, in_flight, dropped)
+            self.limit = min(max(limit, self.min_limit), self.max_limit)
+
+    def get_limit(self) -> int:
+        """Calls currently allowed in flight."""
+        return int(self.limit)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the current limit, in-flight calls and call counters."""
+        with self._lock:
+            return {
+                'algorithm': self.algorithm.name,
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'dropped': self.dropped,
+                **self.algorithm.get_stats()
+            }
+
+
+def create_concurrency_limiter(algorithm: str = 'gradient', initial_limit: int = 20,
+                               min_limit: int = 1, max_limit: int = 200,
+                               **settings: Any) -> AdaptiveConcurrencyLimiter:
+    """Create a limiter with the algorithm selected by name and its settings."""
+    try:
+        algorithm_class = CONCURRENCY_ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(
+            f'Unknown concurrency limit algorithm {algorithm!r}; '
+            f'expected one of {sorted(CONCURRENCY_ALGORITHMS)}'
+        )
+    return AdaptiveConcurrencyLimiter(algorithm_class(**settings), initial_limit,
+                                      min_limit, max_limit)
@@ -0,0 +1,65 @@
+"""Per-request deadlines shared by every attempt made on a request's behalf."""
+
+import time
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds the caller is still willing to wait; accepted from clients and
+# forwarded upstream so every hop gives up at the same moment
+DEADLINE_HEADER = 'X-Request-Timeout'
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline leaves no time for another call."""
+
+
+class Deadline:
+    """Point in time after which nobody is waiting for a request's result."""
+
+    def __init__(self, timeout: float):
+        """
+        Start a deadline.
+
+        Args:
+            timeout: Seconds from now until the deadline
+        """
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default: float) -> 'Deadline':
+        """Build a deadline from a DEADLINE_HEADER value, never beyond default.
+
+        Missing, malformed or non-positive values fall back to default.
+        """
+        timeout = default
+        if value:
+            try:
+                requested = float(value)
+            except ValueError:
+                logger.debug(f'Ignoring malformed {DEADLINE_HEADER}: {value!r}')
+            else:
+                if requested > 0:
+                    timeout = min(requested, default)
+        return cls(timeout)
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (0 once it has passed)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Check if the deadline has passed."""
+        return self.remaining() <= 0
+
+    def cap(self, timeout: float) -> float:
+        """Shorten a call timeout to the time left; raises once none is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'Deadline of {self.timeout}s exceeded')
+        return min(timeout, remaining)
+
+    def header_value(self) -> str:
+        """Remaining time formatted for DEADLINE_HEADER."""
+        return f'{self.remaining():.3f}'
@@ -1,40 +1,217 @@
 """External service HTTP client."""
 
+import time
+import threading
 import requests
 import logging
-from typing import Any, Dict, Optional
+from contextlib import nullcontext
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from .adaptive_timeout import AdaptiveTimeout
+from .deadline import DEADLINE_HEADER, Deadline
+from .json_codec import RawJson, check_json_bytes
+from .tracing import propagation_headers, span
 
 logger = logging.getLogger(__name__)
 
 
+class PoolStats:
+    """Thread-safe connection pool counters for one upstream."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.new_connections = 0
+        self.waits = 0
+        self.reaped = 0
+
+    def record(self, **deltas: int) -> None:
+        """Add the given deltas to the named counters."""
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get a consistent copy of the counters."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': self.hits,
+                'new_connections': self.new_connections,
+                'waits': self.waits,
+                'reaped': self.reaped
+            }
+
+
+class _CountingPoolMixin:
+    """Connection pool that records reuse statistics and drops idle sockets."""
+
+    stats: PoolStats = None
+    idle_timeout: Optional[float] = None
+
+    def _get_conn(self, timeout=None):
+        waited = int(self.block and self.pool is not None and self.pool.empty())
+        conn = super()._get_conn(timeout=timeout)
+
+        reaped = 0
+        last_used = getattr(conn, '_proxy_last_used', None)
+        if (conn.sock is not None and self.idle_timeout is not None
+                and last_used is not None
+                and time.monotonic() - last_used > self.idle_timeout):
+            # The server has likely dropped this keep-alive socket already
+            conn.close()
+            reaped = 1
+
+        reused = int(conn.sock is not None)
+        self.stats.record(requests=1, hits=reused, new_connections=1 - reused,
+                          waits=waited, reaped=reaped)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._proxy_last_used = time.monotonic()
+        return super()._put_conn(conn)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report PoolStats."""
+
+    def __init__(self, stats: PoolStats, idle_timeout: Optional[float] = None,
+                 **kwargs: Any):
+        self.stats = stats
+        self.idle_timeout = idle_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {'stats': self.stats, 'idle_timeout': self.idle_timeout}
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('CountingHTTPConnectionPool',
+                         (_CountingPoolMixin, HTTPConnectionPool), attrs),
+            'https': type('CountingHTTPSConnectionPool',
+                          (_CountingPoolMixin, HTTPSConnectionPool), attrs),
+        }
+
+
 class ExternalServiceClient:
     """Client for calling external services."""
-    
-    def __init__(self, base_url: str, timeout: int = 10):
+
+    def __init__(self, base_url: str, timeout: int = 10, pool_size: int = 10,
+                 pool_block: bool = False, keep_alive: bool = True,
+                 idle_timeout: Optional[float] = None,
+                 timeouts: Optional[AdaptiveTimeout] = None):
         """
         Initialize External Service Client.
-        
+
         Args:
             base_url: Base URL of external service
             timeout: Request timeout in seconds
+            pool_size: Maximum connections kept open to the upstream
+            pool_block: Wait for a free connection instead of opening extras
+            keep_alive: Reuse connections between requests
+            idle_timeout: Seconds after which an idle connection is discarded
+            timeouts: Adaptive per-endpoint timeouts, used instead of timeout
         """
         self.base_url = base_url
         self.timeout = timeout
+        self.timeouts = timeouts
+        self.pool_stats = PoolStats()
+        self.last_used = time.monotonic()
+
+        adapter = PooledHTTPAdapter(
+            self.pool_stats,
+            idle_timeout=idle_timeout,
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            pool_block=pool_block
+        )
         self.session = requests.Session()
-    
-    def post(self, endpoint: str = '', data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Make POST request to external service."""
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def _call_options(self, deadline: Optional[Deadline],
+                      url: Optional[str] = None) -> Tuple[float, Optional[Dict[str, str]]]:
+        """Per-call timeout and headers, bounded by the request's deadline.
+
+        With url, the timeout adapts to the latency of that endpoint if
+        adaptive timeouts are enabled. Headers also carry the trace of the
+        request, if it is traced.
+        """
+        timeout = self.timeout
+        if url is not None and self.timeouts is not None:
+            timeout = self.timeouts.timeout_for(url)
+        headers = propagation_headers()
+        if deadline is None:
+            return timeout, headers or None
+        headers[DEADLINE_HEADER] = deadline.header_value()
+        return deadline.cap(timeout), headers
+
+    def _observe(self, url: str, timeout: float) -> Any:
+        """Context recording the call's latency for adaptive timeouts, if enabled."""
+        if self.timeouts is None:
+            return nullcontext()
+        return self.timeouts.observe(url, timeout)
+
+    def post(self, endpoint: str = '', data: Optional[Dict[str, Any]] = None,
+             deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Make POST request to external service, within deadline if given."""
+        return self.post_with_headers(endpoint, data, deadline)[0]
+
+    def post_with_headers(self, endpoint: str = '', data: Optional[Dict[str, Any]] = None,
+                          deadline: Optional[Deadline] = None) -> Tuple[Dict[str, Any], Mapping[str, str]]:
+        """Make POST request to external service; returns body and response headers."""
         url = f"{self.base_url}/{endpoint}".rstrip('/')
-        
+        self.last_used = time.monotonic()
+        timeout, headers = self._call_options(deadline, url)
+
         try:
             logger.debug(f'Calling external service: {url}')
-            response = self.session.post(
-                url,
-                json=data,
-                timeout=self.timeout
-            )
+            with span('upstream_io'), self._observe(url, timeout):
+                response = self.session.post(
+                    url,
+                    json=data,
+                    headers=headers,
+                    timeout=timeout
+                )
             response.raise_for_status()
-            return response.json()
+            return response.json(), response.headers
+        except requests.exceptions.Timeout:
+            logger.error(f'Request to {url} timed out')
+            raise
+        except requests.exceptions.ConnectionError:
+            logger.error(f'Connection error to {url}')
+            raise
+        except requests.exceptions.HTTPError as e:
+            logger.error(f'HTTP error from {url}: {e.response.status_code}')
+            raise
+        except Exception as e:
+            logger.error(f'Unexpected error calling {url}: {str(e)}')
+            raise
+
+    def post_raw(self, endpoint: str = '', data: Optional[Dict[str, Any]] = None,
+                 deadline: Optional[Deadline] = None, strict: bool = False) -> RawJson:
+        """Make POST request to external service; returns the JSON body undecoded.
+
+        Raises ValueError if the body isn't JSON, like post() does; see
+        check_json_bytes() for how thoroughly that is checked.
+        """
+        url = f"{self.base_url}/{endpoint}".rstrip('/')
+        self.last_used = time.monotonic()
+        timeout, headers = self._call_options(deadline, url)
+
+        try:
+            logger.debug(f'Calling external service: {url}')
+            with span('upstream_io'), self._observe(url, timeout):
+                response = self.session.post(url, json=data, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            return RawJson(check_json_bytes(
+                response.content, response.headers.get('Content-Type'), strict
+            ))
         except requests.exceptions.Timeout:
             logger.error(f'Request to {url} timed out')
             raise
@@ -47,19 +224,59 @@ class ExternalServiceClient:
         except Exception as e:
             logger.error(f'Unexpected error calling {url}: {str(e)}')
             raise
-    
-    def get(self, endpoint: str = '') -> Dict[str, Any]:
-        """Make GET request to external service."""
+
+    def post_stream(self, endpoint: str = '', chunks: Optional[Iterable[bytes]] = None,
+                    deadline: Optional[Deadline] = None,
+                    content_type: str = 'application/json') -> requests.Response:
+        """Send chunks as a chunked POST body; returns the response unread.
+
+        Neither body is held in memory: the caller reads the response with
+        iter_content() and must close it. Error statuses are returned, not
+        raised, so they can be passed through.
+        """
+        url = f"{self.base_url}/{endpoint}".rstrip('/')
+        self.last_used = time.monotonic()
+        timeout, headers = self._call_options(deadline)
+        headers = dict(headers or {}, **{'Content-Type': content_type})
+
+        try:
+            logger.debug(f'Streaming to external service: {url}')
+            with span('upstream_io'):
+                return self.session.post(url, data=chunks, headers=headers,
+                                         timeout=timeout, stream=True)
+        except requests.exceptions.Timeout:
+            logger.error(f'Request to {url} timed out')
+            raise
+        except requests.exceptions.ConnectionError:
+            logger.error(f'Connection error to {url}')
+            raise
+        except Exception as e:
+            logger.error(f'Unexpected error calling {url}: {str(e)}')
+            raise
+
+    def get(self, endpoint: str = '', deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Make GET request to external service, within deadline if given."""
         url = f"{self.base_url}/{endpoint}".rstrip('/')
-        
+        self.last_used = time.monotonic()
+        timeout, headers = self._call_options(deadline)
+
         try:
-            response = self.session.get(url, timeout=self.timeout)
+            response = self.session.get(url, headers=headers, timeout=timeout)
             response.raise_for_status()
             return response.json()
         except Exception as e:
             logger.error(f'Error calling {url}: {str(e)}')
             raise
-    
+
+    def get_pool_stats(self) -> Dict[str, int]:
+        """Get connection pool statistics."""
+        return self.pool_stats.snapshot()
+
+    def close_idle_connections(self) -> None:
+        """Drop pooled connections; new ones are opened on next use."""
+        for adapter in self.session.adapters.values():
+            adapter.poolmanager.clear()
+
     def close(self) -> None:
         """Close session."""
         self.session.close()
@@ -0,0 +1,290 @@
+"""Hedged requests: race a second attempt against a slow first one."""
+
+import time
+import math
+import asyncio
+import logging
+import functools
+import contextvars
+import threading
+from collections import deque
+from concurrent import futures
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .circuit_breaker_registry import is_upstream_failure
+
+logger = logging.getLogger(__name__)
+
+# Marks a POST as safe to send twice; requests without it are never hedged
+IDEMPOTENT_HEADER = 'Idempotency-Key'
+
+# Hedges that can be banked, so a quiet spell can't fund a burst of them
+_MAX_HEDGE_TOKENS = 10.0
+
+
+class LatencyTracker:
+    """Rolling percentile of recent call latencies.
+
+    Keeps the last window_size samples and re-sorts them every
+    recompute_every samples, so reading the percentile is O(1).
+    """
+
+    def __init__(self, percentile: float = 95, window_size: int = 1000,
+                 min_samples: int = 20, recompute_every: int = 50):
+        """
+        Initialize the Latency Tracker.
+
+        Args:
+            percentile: Percentile (0-100) to track
+            window_size: Number of most recent samples considered
+            min_samples: Samples needed before a percentile is reported
+            recompute_every: Samples between recomputations of the percentile
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.recompute_every = recompute_every
+
+        self.samples: deque = deque(maxlen=window_size)
+        self.value: Optional[float] = None
+        self._since_recompute = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add one latency sample."""
+        with self._lock:
+            self.samples.append(seconds)
+            self._since_recompute += 1
+            if (len(self.samples) >= self.min_samples
+                    and (self.value is None or self._since_recompute >= self.recompute_every)):
+                ordered = sorted(self.samples)
+                index = math.ceil(self.percentile / 100 * len(ordered)) - 1
+                self.value = ordered[max(0, index)]
+                self._since_recompute = 0
+
+    def get(self) -> Optional[float]:
+        """Current percentile in seconds, or None until min_samples are seen."""
+        return self.value
+
+
+class Hedger:
+    """Sends a hedge request when the first attempt outlives the tracked percentile.
+
+    Whichever call succeeds first wins; the other is cancelled if it hasn't
+    started and otherwise ignored. Hedges are limited to budget_ratio of
+    requests so a slow upstream sees at most that much extra load.
+
+    Each hedge takes its own slot from the concurrency limiter, since it is
+    a second call in flight upstream. The circuit breaker still judges the
+    request as one call, by the winner's outcome and the total time taken.
+    """
+
+    def __init__(self, percentile: float = 95, budget_ratio: float = 0.05,
+                 min_delay_ms: int = 10, max_workers: int = 32,
+                 tracker: Optional[LatencyTracker] = None,
+                 limiter: Optional[Any] = None):
+        """
+        Initialize the Hedger.
+
+        Args:
+            percentile: Latency percentile after which the hedge is sent
+            budget_ratio: Hedges allowed per request (0.05 = 5%)
+            min_delay_ms: Never hedge sooner than this
+            max_workers: Threads running hedgeable calls for execute()
+            tracker: Latency tracker (default: one for percentile)
+            limiter: Concurrency limiter hedges take a slot from (optional)
+        """
+        self.budget_ratio = budget_ratio
+        self.min_delay = min_delay_ms / 1000
+        self.max_workers = max_workers
+        self.tracker = tracker or LatencyTracker(percentile)
+        self.limiter = limiter
+
+        self.tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_denied = 0
+        self.hedge_wins = 0
+        self.hedge_losses = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[futures.ThreadPoolExecutor] = None
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while latency is unknown."""
+        value = self.tracker.get()
+        if value is None:
+            return None
+        return max(self.min_delay, value)
+
+    def _begin(self) -> Optional[float]:
+        """Count a request, fund the hedge budget and get the hedge delay."""
+        with self._lock:
+            self.requests += 1
+            self.tokens = min(_MAX_HEDGE_TOKENS, self.tokens + self.budget_ratio)
+        return self.hedge_delay()
+
+    def _has_budget(self) -> bool:
+        with self._lock:
+            return self.tokens >= 1
+
+    def _try_hedge(self, worker: bool = False) -> bool:
+        """Spend a hedge token and take a limiter slot (and a worker if asked)."""
+        with self._lock:
+            if (self.tokens < 1 or (worker and self._active >= self.max_workers)
+                    or (self.limiter is not None and not self.limiter.try_acquire())):
+                self.hedges_denied += 1
+                return False
+            self.tokens -= 1
+            self.hedges += 1
+            if worker:
+                self._active += 1
+            return True
+
+    def _hedge_done(self, started: float, future: Any) -> None:
+        """Return the hedge's limiter slot, reporting how the call went."""
+        if self.limiter is None:
+            return
+        if future.cancelled():
+            self.limiter.release()
+            return
+        error = future.exception()
+        self.limiter.release(time.monotonic() - started,
+                             dropped=error is not None and is_upstream_failure(error))
+
+    def _record_winner(self, hedge_won: bool) -> None:
+        with self._lock:
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.hedge_losses += 1
+
+    def _timed(self, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+        start = time.monotonic()
+        result = func(*args, **kwargs)
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    async def _timed_async(self, func: Callable[..., Awaitable[Any]],
+                           args: tuple, kwargs: Dict[str, Any]) -> Any:
+        start = time.monotonic()
+        result = await func(*args, **kwargs)
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    def _pool(self) -> futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = futures.ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix='hedge'
+                    )
+        return self._executor
+
+    def _worker_done(self, future: futures.Future) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def _submit(self, func: Callable, args: tuple, kwargs: Dict[str, Any],
+                claimed: bool = False) -> Optional[futures.Future]:
+        """Run a call on the pool, or return None if every worker is busy.
+
+        claimed means the caller already counted the worker as active.
+        """
+        if not claimed:
+            with self._lock:
+                if self._active >= self.max_workers:
+                    return None
+                self._active += 1
+        # Calls run in the caller's context so they join its trace
+        future = self._pool().submit(contextvars.copy_context().run,
+                                     self._timed, func, args, kwargs)
+        future.add_done_callback(self._worker_done)
+        return future
+
+    def execute(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Call func, hedging with a second call if the first is slow.
+
+        A blocking call can't be abandoned when its hedge wins, so only a
+        call that may be hedged runs on a worker thread; the rest, and any
+        call made while every worker is busy, run on the caller's thread.
+        """
+        delay = self._begin()
+        primary = None
+        if delay is not None and self._has_budget():
+            primary = self._submit(func, args, kwargs)
+        if primary is None:
+            return self._timed(func, args, kwargs)
+
+        try:
+            return primary.result(timeout=delay)
+        except futures.TimeoutError:
+            pass
+        if not self._try_hedge(worker=True):
+            return primary.result()
+
+        logger.debug(f'Hedging call after {delay * 1000:.0f}ms')
+        hedge = self._submit(func, args, kwargs, claimed=True)
+        hedge.add_done_callback(functools.partial(self._hedge_done, time.monotonic()))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._record_winner(future is hedge)
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def execute_async(self, func: Callable[..., Awaitable[Any]],
+                            *args: Any, **kwargs: Any) -> Any:
+        """Await func, hedging with a second call if the first is slow."""
+        delay = self._begin()
+        primary = asyncio.ensure_future(self._timed_async(func, args, kwargs))
+        pending = {primary}
+        try:
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+            if delay is None or primary.done() or not self._try_hedge():
+                return await primary
+
+            logger.debug(f'Hedging call after {delay * 1000:.0f}ms')
+            hedge = asyncio.ensure_future(self._timed_async(func, args, kwargs))
+            hedge.add_done_callback(functools.partial(self._hedge_done, time.monotonic()))
+            pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self._record_winner(task is hedge)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # The loser, or everything if we were cancelled ourselves
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hedge counters and the current hedge delay."""
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedges_denied': self.hedges_denied,
+                'hedge_wins': self.hedge_wins,
+                'hedge_losses': self.hedge_losses,
+                'hedge_delay_ms': round(delay * 1000, 1) if delay is not None else None
+            }
+
+    def close(self) -> None:
+        """Stop the worker threads used by execute()."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,182 @@
+"""JSON codecs and splicing of raw upstream JSON into response envelopes."""
+
+import re
+import json
+import functools
+import logging
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# First bytes a JSON text can start with, after leading whitespace
+_JSON_START = frozenset(b'{["-0123456789tfn')
+_CLOSING = {ord('{'): ord('}'), ord('['): ord(']')}
+# A whole string (escapes included), a lone quote (an unterminated string)
+# or a bracket; the string alternative is unrolled so it scans in linear time
+_STRUCTURE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|["{}\[\]]')
+# Non-ASCII text only occurs inside JSON strings, so it can be escaped in place
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def _escape_non_ascii(match: re.Match) -> str:
+    """\\u escape for one character, as a surrogate pair beyond the BMP."""
+    code = ord(match.group())
+    if code < 0x10000:
+        return '\\u{:04x}'.format(code)
+    code -= 0x10000
+    return '\\u{:04x}\\u{:04x}'.format(0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+
+class JsonCodec:
+    """Encodes to and decodes from UTF-8 JSON bytes with the standard library."""
+
+    name = 'json'
+
+    def dumps(self, obj: Any, sort_keys: bool = False, ensure_ascii: bool = False) -> bytes:
+        """Encode obj as compact JSON, optionally with sorted keys and \\u escapes."""
+        return json.dumps(obj, separators=(',', ':'), ensure_ascii=ensure_ascii,
+                          sort_keys=sort_keys, default=str).encode()
+
+    def loads(self, data: Any) -> Any:
+        """Decode JSON text or bytes; raises ValueError if it's malformed."""
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    """JsonCodec backed by orjson, several times faster than the standard library."""
+
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('The orjson codec requires orjson: pip install orjson')
+
+    def dumps(self, obj: Any, sort_keys: bool = False, ensure_ascii: bool = False) -> bytes:
+        body = orjson.dumps(obj, default=str, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+        if ensure_ascii and not body.isascii():
+            body = _NON_ASCII.sub(_escape_non_ascii, body.decode()).encode()
+        return body
+
+    def loads(self, data: Any) -> Any:
+        return orjson.loads(data)
+
+
+def get_codec(name: str = 'auto') -> JsonCodec:
+    """Get a codec by name: 'json', 'orjson', or 'auto' for the fastest installed."""
+    if name == 'auto':
+        return OrjsonCodec() if orjson is not None else JsonCodec()
+    codecs = {'json': JsonCodec, 'orjson': OrjsonCodec}
+    if name not in codecs:
+        raise ValueError(f'Unknown JSON codec: {name}')
+    return codecs[name]()
+
+
+class RawJson:
+    """An upstream JSON body kept as bytes, to be spliced into a response unparsed."""
+
+    __slots__ = ('body',)
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+
+def _check_balanced(body: bytes) -> None:
+    """Check body is one bracketed JSON value whose strings are all closed.
+
+    Brackets are matched outside strings and the outermost one must close
+    on the last byte, so nothing can follow the value.
+    """
+    stack = []
+    for match in _STRUCTURE.finditer(body):
+        token = match.group()
+        if token[0] == ord('"'):
+            if len(token) == 1:
+                raise ValueError('Upstream response is not JSON')
+            continue
+        if token[0] in _CLOSING:
+            stack.append(_CLOSING[token[0]])
+        elif not stack or stack.pop() != token[0]:
+            raise ValueError('Upstream response is not JSON')
+        elif not stack:
+            if match.end() != len(body):
+                raise ValueError('Upstream response is not JSON')
+            return
+    raise ValueError('Upstream response is not JSON')
+
+
+def check_json_bytes(body: bytes, content_type: Optional[str] = None,
+                     strict: bool = False, codec: Optional[JsonCodec] = None) -> bytes:
+    """Check that body is JSON without decoding it, if the content type vouches for it.
+
+    A JSON content type gets a cheap scan that its brackets balance and its
+    strings close, so a spliced body can't end early or add keys to the
+    envelope; other content types, scalar bodies and strict mode get a
+    full parse. Returns body with surrounding whitespace removed; raises
+    ValueError when it isn't JSON.
+    """
+    body = body.strip()
+    if not body or body[0] not in _JSON_START:
+        raise ValueError('Upstream response is not JSON')
+
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    declared = mimetype == 'application/json' or mimetype.endswith('+json')
+    if strict or not declared or body[0] not in _CLOSING:
+        (codec or _default_codec).loads(body)
+    else:
+        _check_balanced(body)
+    return body
+
+
+def splice_json(envelope: Dict[str, Any], codec: Optional[JsonCodec] = None,
+                sort_keys: bool = False, ensure_ascii: bool = False) -> bytes:
+    """Encode a JSON object, inserting its RawJson values' bytes as they are.
+
+    sort_keys and ensure_ascii apply to the envelope; raw values are
+    inserted unchanged.
+    """
+    codec = codec or _default_codec
+    items = sorted(envelope.items()) if sort_keys else envelope.items()
+    dumps = functools.partial(codec.dumps, sort_keys=sort_keys, ensure_ascii=ensure_ascii)
+    return b'{' + b','.join(
+        dumps(key) + b':' + (value.body if isinstance(value, RawJson) else dumps(value))
+        for key, value in items
+    ) + b'}'
+
+
+class CodecJSONProviderMixin:
+    """Makes a Flask or Quart JSON provider encode with the app's json_codec.
+
+    Mix in before the framework's DefaultJSONProvider. The provider's
+    sort_keys and ensure_ascii settings are kept; calls with explicit
+    json.dumps arguments and debug-mode pretty printing still go through
+    the standard library.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._app.json_codec.dumps(
+            obj, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii
+        ).decode()
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return self._app.json_codec.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self._app.json_codec.dumps(
+                obj, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii
+            ) + b'\n',
+            mimetype=self.mimetype
+        )
+
+
+_default_codec = get_codec()
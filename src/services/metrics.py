@@ -0,0 +1,467 @@
+"""Prometheus-style metrics with per-thread sharded cells, aggregated when scraped."""
+
+import math
+import time
+import bisect
+import logging
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ATTEMPT_BUCKETS = (1, 2, 3, 4, 5, 10)
+STATUS_CLASSES = ('2xx', '3xx', '4xx', '5xx', 'error')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (labels, value) pairs of one metric family, as produced by collectors
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+class _ThreadToken:
+    """Owned by one thread's local storage; collected when the thread exits."""
+
+    __slots__ = ('__weakref__',)
+
+
+class _Shards:
+    """Per-thread cells of `size` numbers, summed when read.
+
+    Each thread only ever writes its own cell, so updates take no lock.
+    Cells of exited threads are folded into a retired total so thread-per-
+    request servers don't grow the cell list without bound.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._cells: Dict[int, List[float]] = {}
+        self._retired = [0.0] * size
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def cell(self) -> List[float]:
+        """The calling thread's cell."""
+        try:
+            return self._local.cell
+        except AttributeError:
+            pass
+        cell = [0.0] * self.size
+        token = _ThreadToken()
+        with self._lock:
+            cell_id = self._next_id
+            self._next_id += 1
+            self._cells[cell_id] = cell
+        weakref.finalize(token, self._retire, cell_id)
+        self._local.cell = cell
+        self._local.token = token
+        return cell
+
+    def _retire(self, cell_id: int) -> None:
+        with self._lock:
+            cell = self._cells.pop(cell_id)
+            for index, value in enumerate(cell):
+                self._retired[index] += value
+
+    def totals(self) -> List[float]:
+        """Sum of every cell, live and retired."""
+        with self._lock:
+            totals = list(self._retired)
+            cells = list(self._cells.values())
+        for cell in cells:
+            for index, value in enumerate(cell):
+                totals[index] += value
+        return totals
+
+
+class CounterChild:
+    """One labelled series of a Counter."""
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.cell()[0] += amount
+
+    def get(self) -> float:
+        return self._shards.totals()[0]
+
+
+class GaugeChild(CounterChild):
+    """One labelled series of a Gauge; may go up and down."""
+
+    def dec(self, amount: float = 1) -> None:
+        self._shards.cell()[0] -= amount
+
+
+class HistogramChild:
+    """One labelled series of a Histogram with fixed bucket bounds."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # Per cell: count per bucket, the +Inf bucket, then the sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        cell = self._shards.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def get(self) -> Tuple[List[float], float, float]:
+        """Cumulative bucket counts, the sum and the count of observations."""
+        totals = self._shards.totals()
+        cumulative, running = [], 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class _Family:
+    """A named metric and its series, one per combination of label values."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, *values: str) -> Any:
+        """Get the series for these label values, creating it on first use.
+
+        Resolve series once up front where the values are known, so the hot
+        path only touches its cell.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}')
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values),
+                                                  self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[Dict[str, str], Any]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.labelnames, values)), child) for values, child in children]
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, labels, child.get()) for labels, child in self._series()]
+
+
+class Counter(_Family):
+    """Monotonically increasing count."""
+
+    kind = 'counter'
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Family):
+    """Value that can go up and down."""
+
+    kind = 'gauge'
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+
+class Histogram(_Family):
+    """Distribution of observations over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for labels, child in self._series():
+            cumulative, total, count = child.get()
+            for bound, value in zip(bounds, cumulative):
+                samples.append((f'{self.name}_bucket', dict(labels, le=bound), value))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, count))
+        return samples
+
+
+class _Collected(_Family):
+    """Family whose samples are computed by a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str,
+                 collect: Callable[[], Samples]):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, labels, value) for labels, value in self.collect()]
+
+
+class MetricsRegistry:
+    """Named metric families rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, family: _Family) -> Any:
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f'Metric {family.name} is already registered')
+            self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float],
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def collector(self, name: str, documentation: str, kind: str,
+                  collect: Callable[[], Samples]) -> None:
+        """Register a family whose samples collect() computes at scrape time."""
+        self._register(_Collected(name, documentation, kind, collect))
+
+    def render(self) -> str:
+        """All families in the Prometheus text exposition format."""
+        with self._lock:
+            families = list(self._families.values())
+
+        lines = []
+        for family in families:
+            try:
+                samples = family.samples()
+            except Exception as e:
+                logger.error(f'Failed to collect metric {family.name}: {str(e)}')
+                continue
+            lines.append(f'# HELP {family.name} {_escape_help(family.documentation)}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for name, labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"'
+                          for name, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isfinite(value) and value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def status_class(status: Optional[int]) -> str:
+    """Status class label of an HTTP status, or 'error' for calls without one."""
+    if status is None or not 100 <= status < 600:
+        return 'error'
+    return f'{status // 100}xx'
+
+
+class ProxyMetrics:
+    """The proxy's metrics: rate limiting, breakers, upstream calls and requests.
+
+    Series with known label values are resolved here once, so recording
+    on the request path is a dict lookup at most plus a cell update.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """
+        Initialize the Proxy Metrics.
+
+        Args:
+            registry: Registry to register the metrics in (default: a new one)
+        """
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+
+        decisions = r.counter('proxy_rate_limit_decisions_total',
+                              'Rate limiter decisions, in requests charged', ['decision'])
+        self._allowed = decisions.labels('allowed')
+        self._denied = decisions.labels('denied')
+
+        self.breaker_transitions = r.counter(
+            'proxy_circuit_breaker_transitions_total',
+            'Circuit breaker state transitions, by state entered', ['state']
+        )
+        self.upstream_attempts = r.histogram(
+            'proxy_upstream_attempts', 'Upstream attempts per proxied call, retries included',
+            ATTEMPT_BUCKETS
+        )
+        upstream_latency = r.histogram(
+            'proxy_upstream_latency_seconds', 'Latency of each upstream attempt',
+            LATENCY_BUCKETS, ['status_class']
+        )
+        self._upstream_latency = {cls: upstream_latency.labels(cls) for cls in STATUS_CLASSES}
+        self.request_latency = r.histogram(
+            'proxy_request_duration_seconds', 'Total time to handle a proxy request',
+            LATENCY_BUCKETS, ['route', 'status_class']
+        )
+        self.in_flight = r.gauge('proxy_requests_in_flight', 'Requests being handled')
+
+    def record_rate_limit(self, allowed: bool, cost: int = 1) -> None:
+        """Count a rate limiter decision."""
+        (self._allowed if allowed else self._denied).inc(cost)
+
+    def record_upstream(self, seconds: float, status: Optional[int]) -> None:
+        """Observe one upstream attempt; status None for calls that got no response."""
+        self._upstream_latency[status_class(status)].observe(seconds)
+
+    def record_request(self, route: str, status: Optional[int], seconds: float) -> None:
+        """Observe a handled proxy request."""
+        self.request_latency.labels(route, status_class(status)).observe(seconds)
+
+    def watch_breakers(self, breakers: Any) -> None:
+        """Export transitions and time in each state of a CircuitBreakerRegistry."""
+        transitions = {state: self.breaker_transitions.labels(state)
+                       for state in ('CLOSED', 'OPEN', 'HALF_OPEN')}
+        breakers.on_transition = lambda previous, state: transitions[state.value].inc()
+        self.registry.collector(
+            'proxy_circuit_breaker_state_seconds_total',
+            'Seconds circuit breakers have spent in each state, summed over breakers',
+            'counter',
+            lambda: [({'state': state}, seconds)
+                     for state, seconds in breakers.get_state_seconds().items()]
+        )
+
+    def watch_concurrency(self, limiter: Any) -> None:
+        """Export the limit, in-flight calls and rejections of a concurrency limiter."""
+        r = self.registry
+        r.collector('proxy_upstream_concurrency_limit',
+                    'Upstream calls currently allowed in flight', 'gauge',
+                    lambda: [({}, limiter.get_limit())])
+        r.collector('proxy_upstream_concurrency_in_flight',
+                    'Upstream calls in flight under the concurrency limit', 'gauge',
+                    lambda: [({}, limiter.in_flight)])
+        r.collector('proxy_upstream_concurrency_rejected_total',
+                    'Upstream calls rejected by the concurrency limit', 'counter',
+                    lambda: [({}, limiter.rejected)])
+
+    def watch_bulkhead(self, bulkhead: Any) -> None:
+        """Export the active, queued and rejected requests of a bulkhead."""
+        r = self.registry
+        r.collector('proxy_bulkhead_active',
+                    'Requests holding a bulkhead slot', 'gauge',
+                    lambda: [({}, bulkhead.active)])
+        r.collector('proxy_bulkhead_queued',
+                    'Requests waiting for a bulkhead slot', 'gauge',
+                    lambda: [({'priority': name}, stats['queued'])
+                             for name, stats in bulkhead.get_stats()['priorities'].items()])
+        r.collector('proxy_bulkhead_rejected_total',
+                    'Requests turned away by the bulkhead', 'counter',
+                    lambda: [({'priority': name, 'reason': reason}, counts[rank])
+                             for reason, counts in bulkhead.rejected.items()
+                             for rank, name in enumerate(bulkhead.priorities)])
+
+    def watch_timeouts(self, timeouts: Any) -> None:
+        """Export the current adaptive timeout of each upstream endpoint."""
+        self.registry.collector(
+            'proxy_upstream_timeout_seconds',
+            'Timeout applied to the next call to each upstream endpoint', 'gauge',
+            lambda: [({'endpoint': endpoint}, stats['timeout_ms'] / 1000)
+                     for endpoint, stats in timeouts.get_stats().items()])
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return self.registry.render()
+
+
+def _error_status(error: BaseException) -> Optional[int]:
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+class UpstreamCall:
+    """Wraps an upstream call function to time each attempt and count attempts.
+
+    Call finish() once the call and its retries are over. last_seconds
+    holds the latency of the latest attempt.
+    """
+
+    def __init__(self, metrics: ProxyMetrics, func: Callable):
+        self.metrics = metrics
+        self.func = func
+        self.attempts = 0
+        self.last_seconds: Optional[float] = None
+
+    def _record(self, start: float, status: Optional[int]) -> None:
+        self.last_seconds = time.perf_counter() - start
+        self.metrics.record_upstream(self.last_seconds, status)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        self.attempts += 1
+        start = time.perf_counter()
+        try:
+            result = self.func(*args, **kwargs)
+        except Exception as e:
+            self._record(start, _error_status(e))
+            raise
+        self._record(start, 200)
+        return result
+
+    def finish(self) -> None:
+        if self.attempts:
+            self.metrics.upstream_attempts.observe(self.attempts)
+
+
+class AsyncUpstreamCall(UpstreamCall):
+    """UpstreamCall for coroutine functions."""
+
+    async def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        self.attempts += 1
+        start = time.perf_counter()
+        try:
+            result = await self.func(*args, **kwargs)
+        except Exception as e:
+            self._record(start, _error_status(e))
+            raise
+        self._record(start, 200)
+        return result
@@ -0,0 +1,216 @@
+"""Micro-batching: concurrent upstream calls sent together as one bulk request."""
+
+import asyncio
+import time
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Union
+
+from .deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItemResponse:
+    """Status and headers of one item of a bulk response, shaped like an HTTP response."""
+
+    def __init__(self, status_code: int, headers: Optional[Mapping[str, str]] = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class BatchItemError(Exception):
+    """The upstream failed one item of a bulk request.
+
+    Carries the item's status in `response` like an HTTP error does, so the
+    breaker and retry logic treat it the same as a failed single call.
+    """
+
+    def __init__(self, message: str, status_code: int,
+                 headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.response = BatchItemResponse(status_code, headers)
+
+
+def split_batch_response(body: Any, count: int) -> List[Any]:
+    """Map a bulk response onto its items: each item's body, or a BatchItemError.
+
+    The upstream answers {"results": [{"status_code": ..., "body": ...}, ...]}
+    with one result per item, in request order.
+    """
+    results = body.get('results') if isinstance(body, dict) else None
+    if not isinstance(results, list):
+        results = []
+
+    outcomes: List[Any] = []
+    for index in range(count):
+        if index >= len(results) or not isinstance(results[index], dict):
+            outcomes.append(BatchItemError('Item missing from upstream batch response', 502))
+            continue
+        status_code = results[index].get('status_code', 200)
+        item_body = results[index].get('body')
+        if status_code >= 400:
+            message = item_body.get('message') if isinstance(item_body, dict) else None
+            outcomes.append(BatchItemError(
+                message or f'Upstream batch item failed with status {status_code}',
+                status_code, results[index].get('headers')
+            ))
+        else:
+            outcomes.append(item_body)
+    return outcomes
+
+
+class _Batch:
+    """Items collected for one bulk request and, once sent, their outcomes."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.deadlines: List[Optional[Deadline]] = []
+        self.outcomes: Optional[List[Any]] = None
+        self.done = threading.Event()
+        self.full: Optional[asyncio.Event] = None
+        self.future: Optional['asyncio.Future[None]'] = None
+
+    def add(self, item: Any, deadline: Optional[Deadline]) -> int:
+        self.items.append(item)
+        self.deadlines.append(deadline)
+        return len(self.items) - 1
+
+    def deadline(self) -> Optional[Deadline]:
+        """The tightest deadline of the items; the bulk call must fit in it."""
+        deadlines = [d for d in self.deadlines if d is not None]
+        return min(deadlines, key=lambda d: d.remaining(), default=None)
+
+    def outcome(self, index: int) -> Any:
+        outcome = self.outcomes[index]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class MicroBatcher:
+    """Collects concurrent calls for up to max_wait_ms or max_items, then sends them as one.
+
+    The first caller of a batch (the leader) waits for it to fill or time
+    out and then makes the bulk call on its own thread, so no background
+    threads are needed; the other callers wait for their item's outcome.
+    A failure of the whole bulk call fails every item of the batch.
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any], Optional[Deadline]],
+                                      Union[Any, Awaitable[Any]]],
+                 max_items: int = 32, max_wait_ms: float = 5):
+        """
+        Initialize the Micro Batcher.
+
+        Args:
+            send: Makes the bulk call for {"items": [...]} within a deadline;
+                a coroutine function when used through submit_async()
+            max_items: Items that make a batch full and sent at once
+            max_wait_ms: Longest the first item of a batch waits for others
+        """
+        self.send = send
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: Optional[_Batch] = None
+        self._async_pending: Optional[_Batch] = None
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _record(self, batch: _Batch) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch.items)
+
+    def submit(self, data: Any = None, deadline: Optional[Deadline] = None) -> Any:
+        """Send data upstream as part of a batch; returns its item's response body."""
+        with self._cond:
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            index = batch.add(data, deadline)
+            if len(batch.items) >= self.max_items:
+                self._pending = None
+                self._cond.notify_all()
+
+            if leader:
+                flush_at = time.monotonic() + self.max_wait
+                while self._pending is batch:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        self._pending = None
+                        break
+                    self._cond.wait(remaining)
+
+        if leader:
+            self._record(batch)
+            try:
+                batch.outcomes = split_batch_response(
+                    self.send({'items': batch.items}, batch.deadline()), len(batch.items)
+                )
+            except Exception as e:
+                batch.outcomes = [e] * len(batch.items)
+            finally:
+                if batch.outcomes is None:
+                    batch.outcomes = [RuntimeError('Batched upstream call was interrupted')] * len(batch.items)
+                batch.done.set()
+        elif not batch.done.wait(deadline.remaining() if deadline else None):
+            raise TimeoutError('Timed out waiting for batched upstream call')
+        return batch.outcome(index)
+
+    async def submit_async(self, data: Any = None,
+                           deadline: Optional[Deadline] = None) -> Any:
+        """Await data's item of a batch; only valid for callers on one event loop."""
+        batch = self._async_pending
+        leader = batch is None
+        if leader:
+            batch = self._async_pending = _Batch()
+            batch.full = asyncio.Event()
+            batch.future = asyncio.get_running_loop().create_future()
+        index = batch.add(data, deadline)
+        if len(batch.items) >= self.max_items:
+            self._async_pending = None
+            batch.full.set()
+
+        if not leader:
+            # Shielded so a waiter giving up doesn't cancel the leader's call
+            await asyncio.wait_for(asyncio.shield(batch.future),
+                                   deadline.remaining() if deadline else None)
+            return batch.outcome(index)
+
+        try:
+            try:
+                await asyncio.wait_for(batch.full.wait(), self.max_wait)
+            except asyncio.TimeoutError:
+                pass
+            if self._async_pending is batch:
+                self._async_pending = None
+
+            self._record(batch)
+            try:
+                body = await self.send({'items': batch.items}, batch.deadline())
+                batch.outcomes = split_batch_response(body, len(batch.items))
+            except Exception as e:
+                batch.outcomes = [e] * len(batch.items)
+            batch.future.set_result(None)
+            return batch.outcome(index)
+        finally:
+            if self._async_pending is batch:
+                self._async_pending = None
+            if not batch.future.done():
+                # The leader was cancelled; its waiters fail instead of hanging
+                batch.future.set_exception(RuntimeError('Batched upstream call was cancelled'))
+                batch.future.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get bulk call and item counts and the average batch size."""
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'average_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+            }
@@ -1,80 +1,328 @@
-"""Rate Limiter implementation using Sliding Window Counter."""
+"""Rate Limiter implementations: exact sliding log, sliding window counter and GCRA."""
 
+import bisect
+import functools
+import math
 import time
 import logging
-from collections import defaultdict
-from typing import Dict, List
+from typing import Any, Callable, Dict, List, Optional
+
+from .client_table import ClientTable, ShardedClientTable
 
 logger = logging.getLogger(__name__)
 
 
 class RateLimiter:
-    """Rate limiter using Sliding Window Counter algorithm."""
+    """Rate limiter using an exact sliding log of request timestamps."""
     
-    def __init__(self, window_size: int = 60, max_requests: int = 10):
+    def __init__(self, window_size: int = 60, max_requests: int = 10,
+                 max_clients: int = 100000, shards: int = 16,
+                 table_factory: Callable[..., Any] = ShardedClientTable):
         """
         Initialize the Rate Limiter.
         
         Args:
             window_size: Time window in seconds
             max_requests: Maximum requests allowed per window
+            max_clients: Maximum clients tracked before LRU eviction
+            shards: Independently locked partitions of the client table
+            table_factory: Builds the client table (local or shared memory)
         """
         self.window_size = window_size
         self.max_requests = max_requests
-        self.requests: Dict[str, List[float]] = defaultdict(list)
+        # A log is irrelevant once its newest timestamp leaves the window
+        self.requests = table_factory(max_entries=max_clients,
+                                      ttl=window_size, shards=shards)
     
-    def is_allowed(self, client_id: str) -> bool:
-        """Check if a request from client is allowed."""
-        now = time.time()
-        window_start = now - self.window_size
+    def _active_requests(self, table: ClientTable, client_id: str,
+                         now: float) -> List[float]:
+        """Get the client's timestamps that are still inside the window."""
+        timestamps = table.get(client_id, now)
+        if not timestamps:
+            return []
         
-        # Remove old requests outside the window
-        self.requests[client_id] = [
-            req_time for req_time in self.requests[client_id]
-            if req_time > window_start
-        ]
+        # Timestamps are appended in order, so expired ones form a prefix
+        first_active = bisect.bisect_right(timestamps, now - self.window_size)
+        return timestamps[first_active:] if first_active else timestamps
+    
+    def is_allowed(self, client_id: str, cost: int = 1) -> bool:
+        """Check if a request from client is allowed, counting it as cost requests."""
+        now = time.time()
+        table = self.requests.shard(client_id)
         
-        # Check if request is allowed
-        if len(self.requests[client_id]) < self.max_requests:
-            self.requests[client_id].append(now)
-            return True
+        with table.lock:
+            # Remove old requests outside the window
+            active_requests = self._active_requests(table, client_id, now)
+            
+            # Check if request is allowed
+            if len(active_requests) + cost <= self.max_requests:
+                active_requests.extend([now] * cost)
+                table.put(client_id, active_requests, now)
+                return True
         
         return False
     
     def get_remaining_requests(self, client_id: str) -> int:
         """Get remaining requests for a client in current window."""
+        table = self.requests.shard(client_id)
+        with table.lock:
+            active_count = len(self._active_requests(table, client_id, time.time()))
+        return max(0, self.max_requests - active_count)
+    
+    def get_reset_time(self, client_id: str) -> int:
+        """Get time in seconds until limit resets."""
         now = time.time()
-        window_start = now - self.window_size
+        table = self.requests.shard(client_id)
+        with table.lock:
+            active_requests = self._active_requests(table, client_id, now)
+            if not active_requests:
+                return 0
+            oldest_request = active_requests[0]
         
-        active_requests = [
-            req_time for req_time in self.requests[client_id]
-            if req_time > window_start
-        ]
+        reset_time = int(oldest_request + self.window_size - now)
         
-        return max(0, self.max_requests - len(active_requests))
+        return max(0, reset_time)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get client table size and eviction counters."""
+        return self.requests.get_stats()
+    
+    def cleanup_old_entries(self, max_age: int = 3600) -> None:
+        """Clean up entries older than max_age seconds (at most the window)."""
+        removed = self.requests.expire(time.time(), max_age=max_age)
+        
+        if removed:
+            logger.info(f'Cleaned up {removed} old rate limit entries')
+
+
+class SlidingWindowCounterRateLimiter:
+    """Rate limiter approximating a sliding window with two fixed-window counters.
+    
+    Each client costs three integers (window index, current and previous
+    window counts) and every check is O(1). The previous window's count is
+    weighted by how much of it still overlaps the sliding window, which
+    assumes its requests were evenly spread.
+    """
+    
+    def __init__(self, window_size: int = 60, max_requests: int = 10,
+                 max_clients: int = 100000, shards: int = 16,
+                 table_factory: Callable[..., Any] = ShardedClientTable):
+        """
+        Initialize the Rate Limiter.
+        
+        Args:
+            window_size: Time window in seconds
+            max_requests: Maximum requests allowed per window
+            max_clients: Maximum clients tracked before LRU eviction
+            shards: Independently locked partitions of the client table
+            table_factory: Builds the client table (local or shared memory)
+        """
+        self.window_size = window_size
+        self.max_requests = max_requests
+        # client_id -> [window index, current count, previous count]; a count
+        # stops mattering once it has been the previous window's
+        self.counters = table_factory(max_entries=max_clients,
+                                      ttl=2 * window_size, shards=shards)
+    
+    def _estimate(self, table: ClientTable, client_id: str, now: float,
+                  create: bool = False):
+        """Roll the client's counters forward to now and return (counters, estimate)."""
+        window = int(now // self.window_size)
+        counters = table.get(client_id, now)
+        if counters is None:
+            if not create:
+                return None, 0.0
+            counters = [window, 0, 0]
+        
+        if counters[0] != window:
+            # Previous count only survives if the last window was adjacent
+            counters[2] = counters[1] if counters[0] == window - 1 else 0
+            counters[1] = 0
+            counters[0] = window
+        
+        elapsed = now - window * self.window_size
+        weight = 1.0 - elapsed / self.window_size
+        return counters, counters[2] * weight + counters[1]
+    
+    def is_allowed(self, client_id: str, cost: int = 1) -> bool:
+        """Check if a request from client is allowed, counting it as cost requests."""
+        now = time.time()
+        table = self.counters.shard(client_id)
+        
+        with table.lock:
+            counters, estimate = self._estimate(table, client_id, now, create=True)
+            
+            if estimate + cost - 1 < self.max_requests:
+                counters[1] += cost
+                table.put(client_id, counters, now)
+                return True
+        
+        return False
+    
+    def get_remaining_requests(self, client_id: str) -> int:
+        """Get remaining requests for a client in current window."""
+        table = self.counters.shard(client_id)
+        with table.lock:
+            _, estimate = self._estimate(table, client_id, time.time())
+        return max(0, int(self.max_requests - estimate))
     
     def get_reset_time(self, client_id: str) -> int:
-        """Get time in seconds until limit resets."""
-        if not self.requests[client_id]:
-            return 0
+        """Get time in seconds until the next request would be allowed."""
+        now = time.time()
+        table = self.counters.shard(client_id)
+        with table.lock:
+            counters, estimate = self._estimate(table, client_id, now)
+            if counters is None or estimate < self.max_requests:
+                return 0
+            window, current, previous = counters
         
-        oldest_request = min(self.requests[client_id])
-        reset_time = int(oldest_request + self.window_size - time.time())
+        window_start = window * self.window_size
+        if current < self.max_requests:
+            # Allowed once the previous window's weight decays enough
+            offset = self.window_size * (1 - (self.max_requests - current) / previous)
+            reset_at = window_start + offset
+        else:
+            # Current count becomes the previous one in the next window
+            offset = self.window_size * (1 - self.max_requests / current)
+            reset_at = window_start + self.window_size + offset
         
-        return max(0, reset_time)
+        # The estimate only drops below the quota strictly after reset_at
+        return max(0, math.floor(reset_at - now) + 1)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get client table size and eviction counters."""
+        return self.counters.get_stats()
     
     def cleanup_old_entries(self, max_age: int = 3600) -> None:
-        """Clean up entries older than max_age seconds."""
+        """Clean up entries older than max_age seconds (at most two windows)."""
+        removed = self.counters.expire(time.time(), max_age=max_age)
+        
+        if removed:
+            logger.info(f'Cleaned up {removed} old rate limit entries')
+
+
+class GCRARateLimiter:
+    """Rate limiter using the Generic Cell Rate Algorithm (virtual scheduling).
+    
+    Requests are paced at a sustained rate of max_requests per window_size
+    with up to `burst` requests admitted back to back. Each client costs a
+    single float, its theoretical arrival time (TAT).
+    """
+    
+    def __init__(self, window_size: int = 60, max_requests: int = 10,
+                 burst: Optional[int] = None, max_clients: int = 100000,
+                 shards: int = 16,
+                 table_factory: Callable[..., Any] = ShardedClientTable):
+        """
+        Initialize the Rate Limiter.
+        
+        Args:
+            window_size: Time window in seconds
+            max_requests: Sustained requests allowed per window
+            burst: Requests that may arrive back to back (defaults to max_requests)
+            max_clients: Maximum clients tracked before LRU eviction
+            shards: Independently locked partitions of the client table
+            table_factory: Builds the client table (local or shared memory)
+        """
+        self.window_size = window_size
+        self.max_requests = max_requests
+        self.burst = burst or max_requests
+        # Emission interval between paced requests and allowed burst tolerance
+        self.interval = window_size / max_requests
+        self.tolerance = (self.burst - 1) * self.interval
+        # A TAT is never more than a full burst ahead of its last admission
+        self.tats = table_factory(max_entries=max_clients,
+                                  ttl=self.tolerance + self.interval,
+                                  shards=shards)
+    
+    def is_allowed(self, client_id: str, cost: int = 1) -> bool:
+        """Check if a request from client is allowed, counting it as cost requests."""
         now = time.time()
-        cutoff_time = now - max_age
+        table = self.tats.shard(client_id)
+        
+        with table.lock:
+            tat = table.get(client_id, now)
+            tat = now if tat is None else max(tat, now)
+            
+            # n requests fit if the last of them would conform
+            if tat - now + (cost - 1) * self.interval <= self.tolerance:
+                table.put(client_id, tat + cost * self.interval, now)
+                return True
         
-        clients_to_remove = []
-        for client_id, requests in self.requests.items():
-            if not any(req_time > cutoff_time for req_time in requests):
-                clients_to_remove.append(client_id)
+        return False
+    
+    def get_retry_after(self, client_id: str) -> float:
+        """Get exact seconds until the next request from client is allowed."""
+        now = time.time()
+        tat = self.tats.get(client_id, now)
+        if tat is None:
+            return 0.0
+        return max(0.0, tat - self.tolerance - now)
+    
+    def get_remaining_requests(self, client_id: str) -> int:
+        """Get requests the client may still send back to back right now."""
+        now = time.time()
+        tat = self.tats.get(client_id, now)
+        if tat is None:
+            return self.burst
         
-        for client_id in clients_to_remove:
-            del self.requests[client_id]
+        backlog = max(0.0, tat - now)
+        return max(0, int((self.tolerance - backlog) // self.interval) + 1)
+    
+    def get_reset_time(self, client_id: str) -> int:
+        """Get time in seconds until the next request would be allowed."""
+        return math.ceil(self.get_retry_after(client_id))
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get client table size and eviction counters."""
+        return self.tats.get_stats()
+    
+    def cleanup_old_entries(self, max_age: int = 3600) -> None:
+        """Clean up clients that are fully replenished or idle for max_age seconds."""
+        removed = self.tats.expire(time.time(), max_age=max_age)
         
-        if clients_to_remove:
-            logger.info(f'Cleaned up {len(clients_to_remove)} old rate limit entries')
+        if removed:
+            logger.info(f'Cleaned up {removed} old rate limit entries')
+
+
+RATE_LIMIT_ALGORITHMS = {
+    'sliding_log': RateLimiter,
+    'sliding_window': SlidingWindowCounterRateLimiter,
+    'gcra': GCRARateLimiter,
+}
+
+
+def create_rate_limiter(algorithm: str = 'sliding_log', window_size: int = 60,
+                        max_requests: int = 10, burst: Optional[int] = None,
+                        max_clients: int = 100000, shards: int = 16,
+                        backend: str = 'local', shared_path: Optional[str] = None):
+    """Create the rate limiter engine selected by name.
+    
+    With backend='shared_memory' client state lives in the file at
+    shared_path, so every worker process on the host shares one quota.
+    Only the fixed-size engines ('sliding_window', 'gcra') support it.
+    """
+    try:
+        limiter_class = RATE_LIMIT_ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(
+            f'Unknown rate limit algorithm {algorithm!r}; '
+            f'expected one of {sorted(RATE_LIMIT_ALGORITHMS)}'
+        )
+    
+    kwargs = {'max_clients': max_clients, 'shards': shards}
+    if backend == 'shared_memory':
+        if limiter_class is RateLimiter:
+            raise ValueError(
+                "The 'sliding_log' algorithm keeps unbounded per-client state and "
+                "can't use the shared_memory backend; use 'sliding_window' or 'gcra'"
+            )
+        from .shared_state import SharedClientTable
+        kwargs['table_factory'] = functools.partial(SharedClientTable, shared_path)
+    elif backend != 'local':
+        raise ValueError(f'Unknown state backend {backend!r}')
+    
+    if limiter_class is GCRARateLimiter:
+        return GCRARateLimiter(window_size, max_requests, burst=burst, **kwargs)
+    return limiter_class(window_size=window_size, max_requests=max_requests,
+                         **kwargs)
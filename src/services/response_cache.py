@@ -0,0 +1,150 @@
+"""In-process cache of upstream responses for repeated identical lookups."""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Request header opting a call in to the cache ("true"); the response
+# carries it back with HIT or MISS
+CACHE_HEADER = 'X-Proxy-Cache'
+
+
+def canonical_key(method: str, url: str, body: Any = None) -> str:
+    """Hash of a call that is equal for equal JSON bodies regardless of key order."""
+    canonical = json.dumps([method.upper(), url, body], sort_keys=True,
+                           separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def wants_cache(header_value: Optional[str]) -> bool:
+    """Check whether a CACHE_HEADER request value opts in to the cache."""
+    return (header_value or '').strip().lower() in ('1', 'true', 'yes', 'use')
+
+
+def ttl_from_headers(headers: Optional[Mapping[str, str]], default: float) -> float:
+    """Cache lifetime allowed by an upstream response's Cache-Control.
+
+    Returns 0 for responses that must not be cached, the s-maxage or
+    max-age directive if present, and otherwise default.
+    """
+    value = (headers or {}).get('Cache-Control')
+    if not value:
+        return default
+
+    directives: Dict[str, Optional[str]] = {}
+    for part in value.split(','):
+        name, _, argument = part.strip().partition('=')
+        directives[name.lower()] = argument.strip('"') or None
+
+    if {'no-store', 'no-cache', 'private'} & directives.keys():
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if directives.get(name) is not None:
+            try:
+                return max(0.0, float(directives[name]))
+            except ValueError:
+                return 0
+    return default
+
+
+class ResponseCache:
+    """LRU cache of response bodies bounded by their total serialized size.
+
+    Entries expire after their own TTL; expired entries are dropped when
+    looked up, and least recently used ones when the byte limit is reached.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 30):
+        """
+        Initialize the Response Cache.
+
+        Args:
+            max_bytes: Limit on the summed JSON size of cached bodies
+            default_ttl: Seconds an entry lives when the upstream sets none
+        """
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # key -> (expires at, size, body), least recently used first
+        self._entries: 'OrderedDict[str, Tuple[float, int, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached body, or None if it is missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, body = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self.bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: Any,
+            headers: Optional[Mapping[str, str]] = None) -> bool:
+        """Cache a body for the TTL its response headers allow.
+
+        Returns False if the response may not be cached or is too large.
+        """
+        ttl = ttl_from_headers(headers, self.default_ttl)
+        if ttl <= 0 or body is None:
+            return False
+        size = len(json.dumps(body, separators=(',', ':'), default=str))
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (time.monotonic() + ttl, size, body)
+            self.bytes += size
+
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit, miss and eviction counts and memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
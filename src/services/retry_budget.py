@@ -0,0 +1,80 @@
+"""Retry budget shared by all calls to keep retries a fraction of real traffic."""
+
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# Slack for float rounding, so e.g. ten deposits of 0.1 buy one retry
+_EPSILON = 1e-9
+
+
+class RetryBudget:
+    """Token bucket that caps retries at a ratio of successful first attempts.
+
+    Every first attempt that succeeds deposits `ratio` tokens and every
+    retry withdraws one, so when the upstream degrades and first attempts
+    stop succeeding, retries dry up instead of multiplying the load. A
+    separate reserve refilled at min_retries_per_second keeps a trickle of
+    retries available for low-traffic periods.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_retries_per_second: float = 10,
+                 max_tokens: float = 100):
+        """
+        Initialize the Retry Budget.
+
+        Args:
+            ratio: Retries allowed per successful first attempt (0.1 = 10%)
+            min_retries_per_second: Retries always allowed regardless of traffic
+            max_tokens: Cap on retries banked from successful first attempts
+        """
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+
+        self.tokens = 0.0
+        self.reserve = float(min_retries_per_second)
+        self.last_refill = time.monotonic()
+        self.retries_allowed = 0
+        self.retries_denied = 0
+        self._lock = threading.Lock()
+
+    def record_success(self) -> None:
+        """Deposit tokens for a first attempt that succeeded."""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """Withdraw one retry; returns False if the budget is exhausted."""
+        now = time.monotonic()
+        with self._lock:
+            # The reserve holds at most one second's worth of floor retries
+            self.reserve = min(
+                float(self.min_retries_per_second),
+                self.reserve + (now - self.last_refill) * self.min_retries_per_second
+            )
+            self.last_refill = now
+
+            if self.reserve >= 1 - _EPSILON:
+                self.reserve -= 1
+            elif self.tokens >= 1 - _EPSILON:
+                self.tokens -= 1
+            else:
+                self.retries_denied += 1
+                return False
+            self.retries_allowed += 1
+            return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retry counts and the current balance."""
+        with self._lock:
+            return {
+                'retries_allowed': self.retries_allowed,
+                'retries_denied': self.retries_denied,
+                'balance': round(self.tokens + self.reserve, 2),
+                'ratio': self.ratio,
+                'min_retries_per_second': self.min_retries_per_second
+            }
@@ -1,9 +1,15 @@
 """Retry Strategy with Exponential Backoff."""
 
 import time
+import asyncio
 import logging
 import random
-from typing import Callable, Any, Type, Tuple
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Any, Optional, Type, Tuple
+
+from .deadline import Deadline
+from .retry_budget import RetryBudget
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +19,8 @@ class RetryStrategy:
     
     def __init__(self, max_attempts: int = 3, initial_delay_ms: int = 100,
                  backoff_multiplier: float = 2.0, max_delay_ms: int = 5000,
-                 jitter: bool = True):
+                 jitter: bool = True, budget: Optional[RetryBudget] = None,
+                 min_attempt_ms: int = 50):
         """
         Initialize Retry Strategy.
         
@@ -23,17 +30,28 @@ class RetryStrategy:
             backoff_multiplier: Exponential backoff multiplier
             max_delay_ms: Maximum delay cap in milliseconds
             jitter: Add random jitter to delays
+            budget: Shared retry budget; retries it denies are not attempted
+            min_attempt_ms: Time an attempt needs; retries with less left before
+                the deadline are skipped
         """
         self.max_attempts = max_attempts
         self.initial_delay_ms = initial_delay_ms
         self.backoff_multiplier = backoff_multiplier
         self.max_delay_ms = max_delay_ms
         self.jitter = jitter
+        self.budget = budget
+        self.min_attempt_ms = min_attempt_ms
     
     def execute(self, func: Callable, *args: Any,
                 retryable_exceptions: Tuple[Type[Exception], ...] = (Exception,),
-                **kwargs: Any) -> Any:
-        """Execute function with retry logic."""
+                deadline: Optional[Deadline] = None, **kwargs: Any) -> Any:
+        """Execute function with retry logic.
+        
+        With a deadline, func is called with deadline=deadline so each attempt
+        can bound its own timeout, and no retry is made that can't finish in time.
+        """
+        if deadline is not None:
+            kwargs['deadline'] = deadline
         attempt = 0
         last_exception = None
         
@@ -42,18 +60,23 @@ class RetryStrategy:
                 result = func(*args, **kwargs)
                 if attempt > 0:
                     logger.info(f'Succeeded on retry attempt {attempt}')
+                elif self.budget is not None:
+                    self.budget.record_success()
                 return result
             except retryable_exceptions as e:
                 last_exception = e
                 attempt += 1
                 
                 if attempt < self.max_attempts:
-                    delay = self._calculate_delay(attempt)
+                    delay = self._next_delay(attempt, e, deadline)
+                    if delay is None:
+                        break
                     logger.warning(
                         f'Attempt {attempt} failed: {str(e)}. '
                         f'Retrying in {delay}ms...'
                     )
-                    time.sleep(delay / 1000.0)
+                    with span('backoff'):
+                        time.sleep(delay / 1000.0)
                 else:
                     logger.error(
                         f'All {self.max_attempts} attempts failed. '
@@ -63,6 +86,78 @@ class RetryStrategy:
         if last_exception:
             raise last_exception
     
+    async def execute_async(self, func: Callable[..., Awaitable[Any]], *args: Any,
+                            retryable_exceptions: Tuple[Type[Exception], ...] = (Exception,),
+                            deadline: Optional[Deadline] = None, **kwargs: Any) -> Any:
+        """Await coroutine function with retry logic, without blocking the event loop."""
+        if deadline is not None:
+            kwargs['deadline'] = deadline
+        attempt = 0
+        last_exception = None
+        
+        while attempt < self.max_attempts:
+            try:
+                result = await func(*args, **kwargs)
+                if attempt > 0:
+                    logger.info(f'Succeeded on retry attempt {attempt}')
+                elif self.budget is not None:
+                    self.budget.record_success()
+                return result
+            except retryable_exceptions as e:
+                last_exception = e
+                attempt += 1
+                
+                if attempt < self.max_attempts:
+                    delay = self._next_delay(attempt, e, deadline)
+                    if delay is None:
+                        break
+                    logger.warning(
+                        f'Attempt {attempt} failed: {str(e)}. '
+                        f'Retrying in {delay}ms...'
+                    )
+                    with span('backoff'):
+                        await asyncio.sleep(delay / 1000.0)
+                else:
+                    logger.error(
+                        f'All {self.max_attempts} attempts failed. '
+                        f'Last error: {str(e)}'
+                    )
+        
+        if last_exception:
+            raise last_exception
+    
+    def _next_delay(self, attempt: int, error: Exception,
+                    deadline: Optional[Deadline]) -> Optional[int]:
+        """Delay in ms before the next attempt, or None if it shouldn't be made."""
+        retry_after_ms = _retry_after_ms(error)
+        if retry_after_ms is None:
+            delay = self._calculate_delay(attempt)
+        elif retry_after_ms > self.max_delay_ms:
+            logger.warning(
+                f'Attempt {attempt} failed: {str(error)}. Upstream asked to '
+                f'retry after {retry_after_ms}ms, longer than we wait; not retrying'
+            )
+            return None
+        else:
+            # The upstream knows better than our backoff when it can take more
+            delay = retry_after_ms
+        
+        if (deadline is not None
+                and deadline.remaining() * 1000 < delay + self.min_attempt_ms):
+            logger.warning(
+                f'Attempt {attempt} failed: {str(error)}. '
+                f'Not enough time left before the deadline, not retrying'
+            )
+            return None
+        
+        if self.budget is not None and not self.budget.try_acquire():
+            logger.warning(
+                f'Attempt {attempt} failed: {str(error)}. '
+                f'Retry budget exhausted, not retrying'
+            )
+            return None
+        return delay
+    
     def _calculate_delay(self, attempt: int) -> int:
         """Calculate delay for given attempt with exponential backoff."""
         delay_ms = int(
@@ -87,3 +182,24 @@ class RetryStrategy:
             'delay_ms': self._calculate_delay(attempt),
             'can_retry': attempt < self.max_attempts
         }
+
+
+def _retry_after_ms(error: Exception) -> Optional[int]:
+    """Upstream Retry-After of a 429/503 error response in ms, if it sent one."""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) not in (429, 503):
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    
+    try:
+        seconds = float(value)
+    except ValueError:
+        # HTTP-date form
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        seconds = retry_at.timestamp() - time.time()
+    return max(0, int(seconds * 1000))
@@ -0,0 +1,350 @@
+"""Host-wide resilience state shared by worker processes through shared memory.
+
+State lives in a memory-mapped file (by default under /dev/shm) so every
+worker on the host enforces one rate limit quota and sees one circuit
+breaker state, and the state outlives individual worker restarts. Updates
+are serialized with POSIX byte-range locks (fcntl), which the kernel
+releases if a worker dies while holding one, plus a thread lock because
+record locks are shared by all threads of a process.
+"""
+
+import os
+import math
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .circuit_breaker import CircuitBreaker, CircuitState
+
+logger = logging.getLogger(__name__)
+
+# magic, layout version, record count, record size
+_HEADER = struct.Struct('<8sIIQ')
+_HEADER_SIZE = 64
+_MAGIC = b'SPXSTATE'
+_VERSION = 1
+
+
+class SharedSegment:
+    """Memory-mapped file of fixed-size records with byte-range locking."""
+
+    def __init__(self, path: str, record_count: int, record_size: int):
+        """
+        Open or create a shared segment.
+
+        Args:
+            path: Backing file; use a tmpfs path such as /dev/shm/<name>
+            record_count: Number of fixed-size records
+            record_size: Size of each record in bytes
+        """
+        self.path = path
+        self.record_count = record_count
+        self.record_size = record_size
+        self.size = _HEADER_SIZE + record_count * record_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(0, _HEADER_SIZE):
+            if not self._header_matches():
+                # New file, or one written with another layout: start empty
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self.size)
+                os.pwrite(self._fd, _HEADER.pack(
+                    _MAGIC, _VERSION, record_count, record_size
+                ), 0)
+                logger.info(f'Initialized shared state segment {path}')
+        self.buffer = mmap.mmap(self._fd, self.size)
+
+    def _header_matches(self) -> bool:
+        if os.fstat(self._fd).st_size != self.size:
+            return False
+        header = os.pread(self._fd, _HEADER.size, 0)
+        return header == _HEADER.pack(
+            _MAGIC, _VERSION, self.record_count, self.record_size
+        )
+
+    @contextmanager
+    def _locked(self, start: int, length: int) -> Iterator[None]:
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def lock_records(self, first: int, count: int = 1) -> None:
+        """Lock records [first, first + count) against other processes."""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, count * self.record_size,
+                    _HEADER_SIZE + first * self.record_size)
+
+    def unlock_records(self, first: int, count: int = 1) -> None:
+        """Release a lock taken with lock_records."""
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, count * self.record_size,
+                    _HEADER_SIZE + first * self.record_size)
+
+    def offset(self, index: int) -> int:
+        """Byte offset of a record in the mapped buffer."""
+        return _HEADER_SIZE + index * self.record_size
+
+    def close(self) -> None:
+        """Unmap the segment; the backing file and its state are kept."""
+        self.buffer.close()
+        os.close(self._fd)
+
+
+# fingerprint, last write time, arity (-1: scalar), three values
+_SLOT = struct.Struct('<Qdqddd')
+_BUCKET_SIZE = 8
+_THREAD_STRIPES = 64
+
+
+class _BucketLock:
+    """Takes a bucket's thread stripe lock, then its cross-process record lock."""
+
+    def __init__(self, table: 'SharedClientTable', bucket: int):
+        self.segment = table.segment
+        self.first_slot = bucket * _BUCKET_SIZE
+        self.thread_lock = table._thread_locks[bucket % _THREAD_STRIPES]
+
+    def __enter__(self) -> None:
+        self.thread_lock.acquire()
+        try:
+            self.segment.lock_records(self.first_slot, _BUCKET_SIZE)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+
+    def __exit__(self, *exc_info: Any) -> None:
+        try:
+            self.segment.unlock_records(self.first_slot, _BUCKET_SIZE)
+        finally:
+            self.thread_lock.release()
+
+
+class _SharedBucket:
+    """A bucket of slots addressed by one key; quacks like a ClientTable shard."""
+
+    def __init__(self, table: 'SharedClientTable', bucket: int):
+        self.table = table
+        self.first_slot = bucket * _BUCKET_SIZE
+        self.lock = _BucketLock(table, bucket)
+
+    def _find(self, fingerprint: int):
+        """Return (matching slot, replaceable slot) offsets within the bucket."""
+        buffer = self.table.segment.buffer
+        match = None
+        oldest, oldest_stamp = None, math.inf
+        for slot in range(self.first_slot, self.first_slot + _BUCKET_SIZE):
+            offset = self.table.segment.offset(slot)
+            slot_fp, stamp = struct.unpack_from('<Qd', buffer, offset)
+            if slot_fp == fingerprint:
+                match = offset
+                break
+            if slot_fp == 0:
+                stamp = -math.inf
+            if stamp < oldest_stamp:
+                oldest, oldest_stamp = offset, stamp
+        return match, oldest, oldest_stamp
+
+    def get(self, key: str, now: float) -> Optional[Any]:
+        fingerprint = _fingerprint(key)
+        offset, _, _ = self._find(fingerprint)
+        if offset is None:
+            return None
+
+        _, stamp, arity, *values = _SLOT.unpack_from(self.table.segment.buffer, offset)
+        if self.table.ttl is not None and now - stamp >= self.table.ttl:
+            return None
+        if arity < 0:
+            return values[0]
+        return [int(value) for value in values[:arity]]
+
+    def put(self, key: str, state: Any, now: float) -> None:
+        fingerprint = _fingerprint(key)
+        offset, replace, replace_stamp = self._find(fingerprint)
+        if offset is None:
+            offset = replace
+            if replace_stamp != -math.inf and not (
+                    self.table.ttl is not None and now - replace_stamp >= self.table.ttl):
+                self.table.evictions += 1
+
+        if isinstance(state, (list, tuple)):
+            values = list(state) + [0.0] * (3 - len(state))
+            arity = len(state)
+        else:
+            values = [state, 0.0, 0.0]
+            arity = -1
+        _SLOT.pack_into(self.table.segment.buffer, offset,
+                        fingerprint, now, arity, *values)
+
+
+class SharedClientTable:
+    """Client table in a shared segment, interchangeable with ShardedClientTable.
+
+    Keys hash to a bucket of eight slots. A key missing from its bucket
+    takes an empty or expired slot, or else evicts the bucket's least
+    recently written slot, so memory is fixed at creation. States may be a
+    float or a list of up to three integers.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000,
+                 ttl: Optional[float] = None, shards: int = 16):
+        """
+        Initialize the Shared Client Table.
+
+        Args:
+            path: Backing file shared by all workers on the host
+            max_entries: Slot count (rounded up to whole buckets)
+            ttl: Seconds after its last write that an entry is discarded
+            shards: Unused; buckets are locked individually
+        """
+        self.buckets = max(1, -(-max_entries // _BUCKET_SIZE))
+        self.max_entries = self.buckets * _BUCKET_SIZE
+        self.ttl = ttl
+        self.evictions = 0
+        self.segment = SharedSegment(path, self.max_entries, _SLOT.size)
+        self._thread_locks = [threading.Lock() for _ in range(_THREAD_STRIPES)]
+
+    def shard(self, key: str) -> _SharedBucket:
+        """Get the bucket that owns key."""
+        return _SharedBucket(self, _fingerprint(key) % self.buckets)
+
+    def get(self, key: str, now: float) -> Optional[Any]:
+        """Get a client's state under its bucket lock."""
+        bucket = self.shard(key)
+        with bucket.lock:
+            return bucket.get(key, now)
+
+    def put(self, key: str, state: Any, now: float) -> None:
+        """Store a client's state under its bucket lock."""
+        bucket = self.shard(key)
+        with bucket.lock:
+            bucket.put(key, state, now)
+
+    def _live_slots(self, now: float, max_age: Optional[float]) -> Iterator[int]:
+        buffer = self.segment.buffer
+        for slot in range(self.max_entries):
+            offset = self.segment.offset(slot)
+            fingerprint, stamp = struct.unpack_from('<Qd', buffer, offset)
+            if fingerprint and (max_age is None or now - stamp < max_age):
+                yield offset
+
+    def expire(self, now: float, max_age: Optional[float] = None) -> int:
+        """Clear slots not written for max_age seconds (default: ttl)."""
+        if max_age is None:
+            max_age = self.ttl
+        elif self.ttl is not None:
+            max_age = min(max_age, self.ttl)
+        if max_age is None:
+            return 0
+
+        removed = 0
+        buffer = self.segment.buffer
+        for bucket in range(self.buckets):
+            with _BucketLock(self, bucket):
+                for slot in range(bucket * _BUCKET_SIZE, (bucket + 1) * _BUCKET_SIZE):
+                    offset = self.segment.offset(slot)
+                    fingerprint, stamp = struct.unpack_from('<Qd', buffer, offset)
+                    if fingerprint and now - stamp >= max_age:
+                        struct.pack_into('<Q', buffer, offset, 0)
+                        removed += 1
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get live slot count (a full scan) and this worker's evictions."""
+        return {
+            'size': sum(1 for _ in self._live_slots(time.time(), self.ttl)),
+            'max_entries': self.max_entries,
+            'evictions': self.evictions,
+            'backend': 'shared_memory',
+            'path': self.segment.path
+        }
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._live_slots(time.time(), self.ttl))
+
+    def close(self) -> None:
+        """Unmap the table; state persists for other and future workers."""
+        self.segment.close()
+
+
+def _fingerprint(key: str) -> int:
+    """Stable, non-zero 64-bit hash of a key, identical in every process."""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+# state, generation, half-open successes and in-flight trials, half-open
+# since, last failure time, last open time
+_BREAKER_FIELDS = struct.Struct('<qqqqddd')
+_STATES: List[CircuitState] = list(CircuitState)
+
+
+class SharedCircuitBreaker(CircuitBreaker):
+    """Circuit breaker whose state is shared by all workers on the host.
+
+    The breaker's fields and rolling window live in the shared segment.
+    Every state read or transition loads them under a cross-process lock,
+    applies the usual logic and writes them back, so one worker tripping
+    the breaker opens it for all and HALF_OPEN trials are limited host-wide.
+    """
+
+    def __init__(self, path: str, **kwargs: Any):
+        """
+        Initialize the Shared Circuit Breaker.
+
+        Args:
+            path: Backing file shared by all workers on the host
+            **kwargs: CircuitBreaker settings; every worker must use the same
+        """
+        super().__init__(**kwargs)
+        self._layout = struct.Struct(
+            _BREAKER_FIELDS.format + f'{4 * self.window_buckets}q'
+        )
+        self.segment = SharedSegment(path, 1, self._layout.size)
+
+    @contextmanager
+    def _guard(self) -> Iterator[None]:
+        with self._lock:
+            self.segment.lock_records(0)
+            try:
+                self._load()
+                yield
+                self._store()
+            finally:
+                self.segment.unlock_records(0)
+
+    def _load(self) -> None:
+        values = self._layout.unpack_from(self.segment.buffer, self.segment.offset(0))
+        (state, self.generation, self.success_count, self.half_open_in_flight,
+         self.half_open_since, last_failure, last_open) = values[:7]
+        self.state = _STATES[state]
+        # A fresh segment is zero-filled; 0.0 stands for "never"
+        self.last_failure_time = last_failure or None
+        self.last_open_time = last_open or None
+
+        n = self.window_buckets
+        window = values[7:]
+        # Zero-filled epochs predate any live window and are ignored
+        self.bucket_epochs = list(window[:n])
+        self.bucket_calls = list(window[n:2 * n])
+        self.bucket_failures = list(window[2 * n:3 * n])
+        self.bucket_slow_calls = list(window[3 * n:])
+
+    def _store(self) -> None:
+        self._layout.pack_into(
+            self.segment.buffer, self.segment.offset(0),
+            _STATES.index(self.state), self.generation, self.success_count,
+            self.half_open_in_flight, self.half_open_since,
+            self.last_failure_time or 0.0, self.last_open_time or 0.0,
+            *self.bucket_epochs, *self.bucket_calls,
+            *self.bucket_failures, *self.bucket_slow_calls
+        )
+
+    def close(self) -> None:
+        """Unmap the breaker; state persists for other and future workers."""
+        self.segment.close()
@@ -0,0 +1,114 @@
+"""Single-flight: identical concurrent calls share one upstream call."""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-flight call and the outcome its waiters share."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers wait for it.
+
+    The first caller for a key (the leader) makes the call; callers arriving
+    while it is in flight get the leader's result or exception. The key is
+    released as soon as the call finishes, whether it succeeded or not, so
+    nothing is cached: the next caller starts a fresh call.
+    """
+
+    def __init__(self):
+        """Initialize an empty Single Flight group."""
+        self._flights: Dict[str, _Flight] = {}
+        self._async_flights: Dict[str, 'asyncio.Future[Any]'] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, func: Callable, *args: Any,
+           wait_timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Call func, or wait for the identical call already in flight.
+
+        Args:
+            key: Canonical key of the call
+            func: Function making the call
+            wait_timeout: Longest a waiter blocks for the leader (TimeoutError)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(wait_timeout):
+                raise TimeoutError('Timed out waiting for coalesced upstream call')
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key: str, func: Callable[..., Awaitable[Any]], *args: Any,
+                       wait_timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """Await func, or wait for the identical call already in flight.
+
+        Only valid for callers on one event loop, like the async proxy.
+        """
+        flight = self._async_flights.get(key)
+        if flight is not None:
+            with self._lock:
+                self.coalesced += 1
+            # Shielded so a waiter giving up doesn't cancel the leader's call
+            return await asyncio.wait_for(asyncio.shield(flight), wait_timeout)
+
+        flight = asyncio.get_running_loop().create_future()
+        self._async_flights[key] = flight
+        with self._lock:
+            self.leaders += 1
+        try:
+            result = await func(*args, **kwargs)
+            flight.set_result(result)
+            return result
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            del self._async_flights[key]
+            if not flight.done():
+                # The leader was cancelled; its waiters fail instead of hanging
+                flight.set_exception(RuntimeError('Coalesced upstream call was cancelled'))
+            # Waiters re-raise the error themselves; don't log it as never retrieved
+            flight.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get leader and coalesced counts and the share of calls coalesced."""
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                'in_flight': len(self._flights) + len(self._async_flights),
+                'upstream_calls': self.leaders,
+                'coalesced': self.coalesced,
+                'coalescing_ratio': self.coalesced / total if total else 0.0
+            }
@@ -0,0 +1,224 @@
+"""Per-request stage timing: spans, Server-Timing headers and trace propagation."""
+
+import json
+import time
+import random
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# W3C Trace Context header, received from callers and sent upstream
+TRACEPARENT_HEADER = 'traceparent'
+SERVER_TIMING_HEADER = 'Server-Timing'
+
+# The innermost open span of the current request, if it is traced
+_current: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+
+class Span:
+    """A timed stage of a traced request; use as a context manager."""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'duration',
+                 'attributes', '_token')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start = 0.0
+        self.duration = 0.0
+        self.attributes = attributes
+
+    def __enter__(self) -> 'Span':
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.duration = time.perf_counter() - self.start
+        _current.reset(self._token)
+        self.trace.spans.append(self)
+
+    def set(self, key: str, value: Any) -> None:
+        """Attach an attribute to the span."""
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    """Stands in for a span when the request isn't traced."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """Time a stage of the current request; a shared no-op when it isn't traced."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.trace, name, parent.span_id, attributes or None)
+
+
+def propagation_headers() -> Dict[str, str]:
+    """Headers carrying the current trace to an upstream; empty when not traced."""
+    parent = _current.get()
+    if parent is None:
+        return {}
+    trace = parent.trace
+    return {TRACEPARENT_HEADER: f'00-{trace.trace_id}-{parent.span_id}-{trace.flags}'}
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Sequence[str]]:
+    """(trace id, parent span id, flags) of a traceparent header, or None if invalid."""
+    parts = (value or '').strip().lower().split('-')
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == 'ff':
+        return None
+    version, trace_id, parent_id, flags = parts[:4]
+    if (len(trace_id) != 32 or len(parent_id) != 16 or len(flags) != 2
+            or trace_id == '0' * 32 or parent_id == '0' * 16):
+        return None
+    try:
+        int(version + trace_id + parent_id + flags, 16)
+    except ValueError:
+        return None
+    if version == '00' and len(parts) != 4:
+        return None
+    return trace_id, parent_id, flags
+
+
+class Trace:
+    """The spans recorded for one request, under a root span for the request itself."""
+
+    def __init__(self, name: str, traceparent: Optional[str] = None):
+        parsed = parse_traceparent(traceparent)
+        if parsed is not None:
+            self.trace_id, remote_parent, self.flags = parsed
+        else:
+            self.trace_id, remote_parent, self.flags = _new_id(128), None, '01'
+        self.timestamp = time.time()
+        self.spans: List[Span] = []
+        self.root = Span(self, name, remote_parent)
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total time per stage name, then the total."""
+        totals: Dict[str, float] = {}
+        for recorded in self.spans:
+            if recorded is not self.root:
+                totals[recorded.name] = totals.get(recorded.name, 0.0) + recorded.duration
+        duration = self.root.duration or time.perf_counter() - self.root.start
+        totals['total'] = duration
+        return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in totals.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The trace as a JSON-serializable dict, span times relative to its start."""
+        spans = []
+        for recorded in self.spans:
+            entry = {
+                'name': recorded.name,
+                'span_id': recorded.span_id,
+                'parent_id': recorded.parent_id,
+                'offset_ms': round((recorded.start - self.root.start) * 1000, 3),
+                'duration_ms': round(recorded.duration * 1000, 3)
+            }
+            if recorded.attributes:
+                entry['attributes'] = recorded.attributes
+            spans.append(entry)
+        return {'trace_id': self.trace_id, 'timestamp': self.timestamp, 'spans': spans}
+
+
+class SpanExporter:
+    """Receives every finished trace; subclass to send spans to a file or collector.
+
+    export() runs on the request's thread after the response is produced,
+    so exporters that do I/O should be quick or hand off to a queue.
+    """
+
+    def export(self, trace: Trace) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the exporter."""
+
+
+class JsonLinesExporter(SpanExporter):
+    """Appends each trace as one JSON line to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Starts and finishes request traces and hands them to the exporters."""
+
+    def __init__(self, exporters: Sequence[SpanExporter] = (), server_timing: bool = True):
+        """
+        Initialize the Tracer.
+
+        Args:
+            exporters: Receive each finished trace
+            server_timing: Whether responses get a Server-Timing header
+        """
+        self.exporters = list(exporters)
+        self.server_timing = server_timing
+
+    def start(self, name: str, traceparent: Optional[str] = None) -> Trace:
+        """Begin tracing the current request, continuing the caller's trace if given."""
+        trace = Trace(name, traceparent)
+        trace.root.__enter__()
+        return trace
+
+    def end(self, trace: Trace) -> None:
+        """Stop the request's root span; later spans aren't recorded."""
+        if trace.root.duration == 0.0:
+            try:
+                trace.root.__exit__(None, None, None)
+            except ValueError:
+                # Ended from a different context than it was started in
+                _current.set(None)
+
+    def finish(self, trace: Trace) -> None:
+        """End the trace if needed and export it."""
+        self.end(trace)
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception as e:
+                logger.error(f'Failed to export trace {trace.trace_id}: {str(e)}')
+
+    def close(self) -> None:
+        """Close every exporter."""
+        for exporter in self.exporters:
+            exporter.close()
@@ -0,0 +1,601 @@
+"""Integration tests for the Flask proxy routes."""
+
+import json
+import pytest
+from src.main import create_app
+from src.services.json_codec import RawJson
+
+
+class FakeClient:
+    """ExternalServiceClient stand-in with scripted outcomes."""
+
+    def __init__(self, outcomes=None):
+        self.outcomes = list(outcomes or [])
+        self.calls = []
+        self.deadlines = []
+        self.response_headers = {}
+
+    def post(self, endpoint='', data=None, deadline=None):
+        self.calls.append(data)
+        self.deadlines.append(deadline)
+        outcome = self.outcomes.pop(0) if self.outcomes else {'ok': True}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def post_with_headers(self, endpoint='', data=None, deadline=None):
+        return self.post(endpoint, data, deadline), self.response_headers
+
+    def post_raw(self, endpoint='', data=None, deadline=None, strict=False):
+        return RawJson(json.dumps(self.post(endpoint, data, deadline)).encode())
+
+    def get_pool_stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.rate_limiter.max_requests = 1000
+    app.retry_strategy.max_attempts = 1
+    yield app
+    app.client_registry.close()
+
+
+def install_client(app, client):
+    url = app.config['EXTERNAL_SERVICE_URL']
+    app.client_registry._clients[url] = client
+    return client
+
+
+def test_proxy_success(app):
+    """Test a successful call returns the upstream response."""
+    install_client(app, FakeClient([{'answer': 42}]))
+
+    response = app.test_client().post('/api/proxy/data', json={'q': 1})
+    assert response.status_code == 200
+    assert response.json['external_response'] == {'answer': 42}
+
+
+def test_breaker_opens_and_half_opens(app):
+    """Test failures open the breaker and HALF_OPEN limits trial calls."""
+    breaker = app.circuit_breakers.for_url(app.config['EXTERNAL_SERVICE_URL'])
+    breaker.failure_threshold = 2
+    breaker.minimum_calls = 2
+    breaker.half_open_max_calls = 1
+    client = install_client(app, FakeClient([ConnectionError('down')] * 2))
+    test_client = app.test_client()
+
+    assert test_client.post('/api/proxy/data', json={}).status_code == 500
+    assert test_client.post('/api/proxy/data', json={}).status_code == 500
+    assert test_client.post('/api/proxy/data', json={}).status_code == 503
+    assert len(client.calls) == 2
+
+    breaker.last_open_time -= breaker.reset_timeout
+    summary = test_client.get('/api/health').json['circuit_breakers']
+    assert summary['half_open'] == ['localhost:5001/external-api/process']
+    assert test_client.post('/api/proxy/data', json={}).status_code == 200
+    assert len(client.calls) == 3
+
+
+def test_client_errors_do_not_open_breaker(app):
+    """Test upstream 4xx responses are not counted as breaker failures."""
+    import requests
+
+    response = requests.Response()
+    response.status_code = 404
+    error = requests.HTTPError('not found', response=response)
+    install_client(app, FakeClient([error] * 20))
+    test_client = app.test_client()
+
+    for _ in range(20):
+        assert test_client.post('/api/proxy/data', json={}).status_code == 500
+    breaker = app.circuit_breakers.for_url(app.config['EXTERNAL_SERVICE_URL'])
+    assert breaker.get_state() == 'CLOSED'
+
+
+def test_deadline_header_bounds_request(app):
+    """Test X-Request-Timeout shortens the deadline handed to the client."""
+    client = install_client(app, FakeClient([{'ok': True}]))
+
+    response = app.test_client().post('/api/proxy/data', json={},
+                                      headers={'X-Request-Timeout': '2.5'})
+    assert response.status_code == 200
+    assert 2 < client.deadlines[0].remaining() <= 2.5
+
+
+def test_expired_deadline_returns_504(app):
+    """Test a request whose deadline ran out answers 504 without retrying."""
+    import time
+
+    class SlowClient(FakeClient):
+        def post(self, endpoint='', data=None, deadline=None):
+            time.sleep(deadline.remaining())
+            return super().post(endpoint, data, deadline)
+
+    app.retry_strategy.max_attempts = 3
+    client = install_client(app, SlowClient([TimeoutError('slow')] * 3))
+
+    response = app.test_client().post('/api/proxy/data', json={},
+                                      headers={'X-Request-Timeout': '0.05'})
+    assert response.status_code == 504
+    assert len(client.calls) == 1
+
+
+def test_only_idempotent_requests_are_hedged(app):
+    """Test the hedger only sees requests carrying an Idempotency-Key."""
+    from src.services.hedging import Hedger
+
+    app.hedger = Hedger(budget_ratio=1.0)
+    install_client(app, FakeClient())
+    test_client = app.test_client()
+
+    assert test_client.post('/api/proxy/data', json={}).status_code == 200
+    assert app.hedger.get_stats()['requests'] == 0
+
+    response = test_client.post('/api/proxy/data', json={},
+                                headers={'Idempotency-Key': 'abc'})
+    assert response.status_code == 200
+    assert app.hedger.get_stats()['requests'] == 1
+    assert test_client.get('/api/health').json['hedging']['requests'] == 1
+    app.hedger.close()
+
+
+def test_opted_in_requests_are_served_from_cache(app):
+    """Test identical opted-in lookups hit the cache and others go upstream."""
+    from src.services.response_cache import ResponseCache
+
+    app.response_cache = ResponseCache()
+    client = install_client(app, FakeClient([{'n': 1}, {'n': 2}, {'n': 3}]))
+    test_client = app.test_client()
+    opt_in = {'X-Proxy-Cache': 'true'}
+
+    first = test_client.post('/api/proxy/data', json={'a': 1, 'b': 2}, headers=opt_in)
+    second = test_client.post('/api/proxy/data', json={'b': 2, 'a': 1}, headers=opt_in)
+    assert first.headers['X-Proxy-Cache'] == 'MISS'
+    assert second.headers['X-Proxy-Cache'] == 'HIT'
+    assert second.json['external_response'] == {'n': 1}
+    assert len(client.calls) == 1
+
+    # Without the header the cache is bypassed
+    third = test_client.post('/api/proxy/data', json={'a': 1, 'b': 2})
+    assert third.json['external_response'] == {'n': 2}
+    assert 'X-Proxy-Cache' not in third.headers
+
+    stats = test_client.get('/api/health').json['response_cache']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_no_store_responses_are_not_cached(app):
+    """Test an upstream Cache-Control: no-store keeps the response out."""
+    from src.services.response_cache import ResponseCache
+
+    app.response_cache = ResponseCache()
+    client = install_client(app, FakeClient())
+    client.response_headers = {'Cache-Control': 'no-store'}
+    test_client = app.test_client()
+
+    for _ in range(2):
+        test_client.post('/api/proxy/data', json={}, headers={'X-Proxy-Cache': 'true'})
+    assert len(client.calls) == 2
+
+
+def test_identical_idempotent_requests_are_coalesced(app):
+    """Test concurrent identical idempotent requests make one upstream call."""
+    import threading
+
+    release = threading.Event()
+
+    class BlockingClient(FakeClient):
+        def post(self, endpoint='', data=None, deadline=None):
+            release.wait(5)
+            return super().post(endpoint, data, deadline)
+
+    client = install_client(app, BlockingClient([{'shared': True}]))
+    statuses = []
+
+    def send():
+        response = app.test_client().post('/api/proxy/data', json={'q': 'same'},
+                                          headers={'Idempotency-Key': 'k'})
+        statuses.append((response.status_code, response.json['external_response']))
+
+    threads = [threading.Thread(target=send) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for _ in range(5000):
+        if app.single_flight.coalesced == 4:
+            break
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(client.calls) == 1
+    assert statuses == [(200, {'shared': True})] * 5
+
+
+def test_batch_returns_per_item_results_in_order(app):
+    """Test a batch fans out and reports each item's outcome in order."""
+    client = install_client(app, FakeClient())
+    client.post = lambda endpoint='', data=None, deadline=None: (
+        _raise(ConnectionError('down')) if data.get('fail') else {'echo': data['n']}
+    )
+
+    items = [{'n': 0}, {'n': 1, 'fail': True}, {'n': 2}]
+    response = app.test_client().post('/api/proxy/batch', json=items)
+
+    assert response.status_code == 200
+    body = response.json
+    assert [r['status_code'] for r in body['results']] == [200, 500, 200]
+    assert body['results'][0]['external_response'] == {'echo': 0}
+    assert body['results'][2]['external_response'] == {'echo': 2}
+    assert (body['succeeded'], body['failed']) == (2, 1)
+
+
+def _raise(error):
+    raise error
+
+
+def test_batch_charges_rate_limit_per_item(app):
+    """Test a batch is admitted or refused as a whole, costing one unit per item."""
+    app.rate_limiter.max_requests = 5
+    install_client(app, FakeClient())
+    test_client = app.test_client()
+
+    assert test_client.post('/api/proxy/batch', json=[{}] * 4).status_code == 200
+    response = test_client.post('/api/proxy/batch', json={'items': [{}] * 2})
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    assert test_client.post('/api/proxy/data', json={}).status_code == 200
+
+
+def test_batch_validation(app):
+    """Test malformed, empty and oversized batches are rejected."""
+    test_client = app.test_client()
+    max_size = app.config['PROXY_BATCH_MAX_SIZE']
+
+    assert test_client.post('/api/proxy/batch', json={'q': 1}).status_code == 400
+    assert test_client.post('/api/proxy/batch', json=[]).status_code == 400
+    assert test_client.post('/api/proxy/batch', json=[{}] * (max_size + 1)).status_code == 413
+
+
+def test_micro_batching_sends_one_bulk_call(monkeypatch):
+    """Test concurrent items share one bulk upstream call with per-item errors."""
+    from src.config import Config
+
+    monkeypatch.setattr(Config, 'MICRO_BATCH_ENABLED', True)
+    monkeypatch.setattr(Config, 'MICRO_BATCH_MAX_ITEMS', 3)
+    monkeypatch.setattr(Config, 'MICRO_BATCH_MAX_WAIT_MS', 5000)
+    app = create_app()
+    app.retry_strategy.max_attempts = 1
+    client = install_client(app, FakeClient())
+    endpoints = []
+
+    def bulk_post(endpoint='', data=None, deadline=None):
+        endpoints.append(endpoint)
+        return {'results': [
+            {'status_code': 503, 'body': {'message': 'busy'}} if item.get('fail')
+            else {'status_code': 200, 'body': {'echo': item['n']}}
+            for item in data['items']
+        ]}
+
+    client.post = bulk_post
+    items = [{'n': 0}, {'n': 1, 'fail': True}, {'n': 2}]
+    response = app.test_client().post('/api/proxy/batch', json=items)
+
+    assert endpoints == ['batch']
+    body = response.json
+    assert [r['status_code'] for r in body['results']] == [200, 500, 200]
+    assert body['results'][2]['external_response'] == {'echo': 2}
+    assert app.test_client().get('/api/health').json['micro_batching']['batches'] == 1
+    # Batched items are charged to the bulk endpoint's breaker
+    assert list(app.circuit_breakers._breakers) == ['localhost:5001/external-api/process/batch']
+    app.client_registry.close()
+
+
+class _PatternStream:
+    """File-like body of `size` bytes generated on demand, never held whole."""
+
+    def __init__(self, size):
+        self.size = size
+        self.position = 0
+
+    def read(self, n=-1):
+        remaining = self.size - self.position
+        n = remaining if n is None or n < 0 else min(n, remaining)
+        self.position += n
+        return b'x' * n
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        self.position = (0, self.position, self.size)[whence] + offset
+
+
+def _streaming_upstream(response_size):
+    """Local upstream that counts a chunked request body and streams a reply."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            total = 0
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                total += len(self.rfile.read(size))
+                self.rfile.readline()
+            received.append(total)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(response_size))
+            self.end_headers()
+            chunk = b'y' * 65536
+            for offset in range(0, response_size, len(chunk)):
+                self.wfile.write(chunk[:response_size - offset])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+
+def test_stream_passes_large_bodies_in_bounded_memory(app):
+    """Test bodies far larger than the chunk budget stream through without buffering."""
+    import tracemalloc
+
+    size = 64 * 1024 * 1024
+    app.config['PROXY_STREAM_CHUNK_BYTES'] = 64 * 1024
+    server, received = _streaming_upstream(size)
+    app.config['EXTERNAL_SERVICE_URL'] = f'http://127.0.0.1:{server.server_port}/process'
+
+    tracemalloc.start()
+    try:
+        response = app.test_client().post(
+            '/api/proxy/stream', input_stream=_PatternStream(size),
+            content_type='application/octet-stream',
+            buffered=False
+        )
+        streamed = sum(len(chunk) for chunk in response.response)
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/octet-stream'
+    assert received == [size]
+    assert streamed == size
+    assert peak < size // 16
+
+
+class _UnreadStream:
+    """Streamed upstream response that records whether it was closed."""
+
+    status_code = 200
+    headers = {'Content-Type': 'application/octet-stream'}
+
+    def __init__(self):
+        self.closed = 0
+
+    def iter_content(self, chunk_size):
+        yield b'data'
+
+    def close(self):
+        self.closed += 1
+
+
+def test_stream_closes_upstream_when_body_is_never_read(app):
+    """Test closing the response releases the upstream even if it was not iterated."""
+    upstream = _UnreadStream()
+    client = install_client(app, FakeClient())
+    client.post_stream = lambda **kwargs: upstream
+
+    with app.test_request_context('/api/proxy/stream', method='POST', data=b'x'):
+        response = app.view_functions['proxy.proxy_stream']()
+    response.close()
+
+    assert response.status_code == 200
+    assert upstream.closed == 1
+
+def _json_upstream(body, content_type='application/json'):
+    """Local upstream answering every POST with a fixed body."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.mark.parametrize('splice', [True, False])
+def test_success_envelope_is_the_same_with_splicing(app, splice):
+    """Test the spliced success response has the same shape as the decoded one."""
+    upstream = {'received_data': {'q': 1}, 'message': 'Data processed'}
+    server = _json_upstream(json.dumps(upstream).encode())
+    app.config['EXTERNAL_SERVICE_URL'] = f'http://127.0.0.1:{server.server_port}/process'
+    app.config['JSON_SPLICE_ENABLED'] = splice
+    try:
+        response = app.test_client().post('/api/proxy/data', json={'q': 1})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.json == {
+        'status': 'success',
+        'external_response': upstream,
+        'proxy_notes': 'Circuit breaker state: CLOSED'
+    }
+
+
+def test_non_json_upstream_body_is_an_error(app):
+    """Test a body that fails the JSON check is handled as a failed call."""
+    server = _json_upstream(b'<html>oops</html>', content_type='text/html')
+    app.config['EXTERNAL_SERVICE_URL'] = f'http://127.0.0.1:{server.server_port}/process'
+    try:
+        response = app.test_client().post('/api/proxy/data', json={})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.status_code == 500
+
+
+def test_metrics_endpoint_reports_proxy_activity(app):
+    """Test /metrics exposes rate limiting, breaker, upstream and request metrics."""
+    app.rate_limiter.max_requests = 3
+    breaker = app.circuit_breakers.for_url(app.config['EXTERNAL_SERVICE_URL'])
+    breaker.failure_threshold = 2
+    breaker.minimum_calls = 2
+    install_client(app, FakeClient([ConnectionError('down')] * 2))
+    test_client = app.test_client()
+
+    statuses = [test_client.post('/api/proxy/data', json={}).status_code for _ in range(4)]
+    assert statuses == [500, 500, 503, 429]
+
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'proxy_rate_limit_decisions_total{decision="allowed"} 3' in text
+    assert 'proxy_rate_limit_decisions_total{decision="denied"} 1' in text
+    assert 'proxy_circuit_breaker_transitions_total{state="OPEN"} 1' in text
+    assert 'proxy_upstream_latency_seconds_count{status_class="error"} 2' in text
+    assert 'proxy_upstream_attempts_count 2' in text
+    assert ('proxy_request_duration_seconds_count'
+            '{route="/api/proxy/data",status_class="5xx"} 3') in text
+    assert ('proxy_request_duration_seconds_count'
+            '{route="/api/proxy/data",status_class="4xx"} 1') in text
+    assert 'proxy_circuit_breaker_state_seconds_total{state="OPEN"}' in text
+
+
+def test_tracing_reports_stages_and_propagates_traceparent(app):
+    """Test traced requests get Server-Timing and send the caller's trace upstream."""
+    from src.services.tracing import SpanExporter, Tracer, propagation_headers
+
+    class TraceparentClient(FakeClient):
+        def post(self, endpoint='', data=None, deadline=None):
+            self.response_headers = propagation_headers()
+            return super().post(endpoint, data, deadline)
+
+    class Collecting(SpanExporter):
+        traces = []
+
+        def export(self, trace):
+            self.traces.append(trace)
+
+    test_client = app.test_client()
+    client = install_client(app, TraceparentClient())
+    assert 'Server-Timing' not in test_client.post('/api/proxy/data', json={}).headers
+    assert client.response_headers == {}
+
+    app.tracer = Tracer(exporters=[Collecting()])
+    caller = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+    response = test_client.post('/api/proxy/data', json={}, headers={'traceparent': caller})
+    assert response.status_code == 200
+
+    stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+    assert stages == ['rate_limit', 'parse', 'breaker', 'upstream', 'encode', 'total']
+    trace, = Collecting.traces
+    assert trace.trace_id == '4bf92f3577b34da6a3ce929d0e0e4736'
+    upstream = next(s for s in trace.spans if s.name == 'upstream')
+    assert client.response_headers['traceparent'].startswith('00-4bf92f3577b34da6a3ce929d0e0e4736-')
+    assert client.response_headers['traceparent'].split('-')[2] == upstream.span_id
+
+
+def test_concurrency_limit_rejects_fast_and_is_exported(app):
+    """Test calls over the adaptive limit get a 503 without reaching the upstream."""
+    from src.services.concurrency_limiter import create_concurrency_limiter
+
+    limiter = create_concurrency_limiter('aimd', initial_limit=1, max_limit=1)
+    app.concurrency_limiter = limiter
+    app.metrics.watch_concurrency(limiter)
+    client = install_client(app, FakeClient([{'answer': 42}]))
+    test_client = app.test_client()
+
+    assert limiter.try_acquire()
+    response = test_client.post('/api/proxy/data', json={})
+    assert response.status_code == 503
+    assert client.calls == []
+
+    limiter.release()
+    assert test_client.post('/api/proxy/data', json={}).status_code == 200
+    assert limiter.in_flight == 0
+
+    text = test_client.get('/metrics').get_data(as_text=True)
+    assert 'proxy_upstream_concurrency_limit 1' in text
+    assert 'proxy_upstream_concurrency_rejected_total 1' in text
+    assert test_client.get('/api/health').json['concurrency_limit']['rejected'] == 1
+
+
+def test_bulkhead_sheds_overload_with_retry_after(app):
+    """Test requests the bulkhead can't admit get a 503 with Retry-After at once."""
+    from src.services.bulkhead import Bulkhead
+
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=0, retry_after=2)
+    app.bulkhead = bulkhead
+    app.metrics.watch_bulkhead(bulkhead)
+    client = install_client(app, FakeClient([{'answer': 42}]))
+    test_client = app.test_client()
+
+    bulkhead.enter(0)
+    response = test_client.post('/api/proxy/data', json={}, headers={'X-Priority': 'low'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert client.calls == []
+
+    bulkhead.release()
+    assert test_client.post('/api/proxy/data', json={}).status_code == 200
+    assert bulkhead.active == 0
+
+    text = test_client.get('/metrics').get_data(as_text=True)
+    assert 'proxy_bulkhead_rejected_total{priority="low",reason="queue_full"} 1' in text
+    health = test_client.get('/api/health').json['bulkhead']
+    assert health['priorities']['low']['queue_full'] == 1
+
+
+def test_bulkhead_slot_not_leaked_when_setup_fails(app):
+    """Test an error before the upstream call doesn't keep a bulkhead slot."""
+    from src.services.bulkhead import Bulkhead
+
+    app.bulkhead = Bulkhead(max_concurrent=1, max_queue=0)
+    install_client(app, FakeClient())
+
+    def broken_lookup(*args, **kwargs):
+        raise RuntimeError('registry unavailable')
+
+    app.circuit_breakers.for_endpoint = broken_lookup
+    assert app.test_client().post('/api/proxy/data', json={}).status_code == 500
+    assert app.bulkhead.active == 0
@@ -0,0 +1,145 @@
+"""Unit tests for latency sketches and adaptive upstream timeouts."""
+
+import json
+import random
+import threading
+import time
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.services.adaptive_timeout import AdaptiveTimeout, LatencySketch
+from src.services.client_registry import ClientRegistry
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        payload = json.dumps({'status': 'ok'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def slow_upstream():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/process', _SlowHandler
+    _SlowHandler.delay = 0.0
+    server.shutdown()
+    server.server_close()
+
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    """Test sketch quantiles match exact ones within the accuracy bound."""
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(-3, 1) for _ in range(20000))
+    sketch = LatencySketch(relative_accuracy=0.02)
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(q * (len(values) - 1))]
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.021)
+    assert len(sketch.counts) < 500
+    assert sum(sketch.to_dict()['buckets'].values()) == 20000
+
+
+def test_sketch_merges_and_clamps_out_of_range_values():
+    """Test quantiles over several sketches and values outside the covered range."""
+    fast, slow = LatencySketch(), LatencySketch()
+    for _ in range(90):
+        fast.add(0.010)
+    for _ in range(10):
+        slow.add(0.500)
+    assert fast.quantile(0.5, slow) == pytest.approx(0.010, rel=0.02)
+    assert fast.quantile(0.95, slow) == pytest.approx(0.500, rel=0.02)
+    assert LatencySketch().quantile(0.5) is None
+
+    extremes = LatencySketch(max_value=10)
+    extremes.add(0)
+    extremes.add(3600)
+    assert extremes.quantile(0) == extremes.min_value
+    assert extremes.quantile(1) == pytest.approx(10, rel=0.02)
+
+
+def test_timeout_follows_the_percentile_within_bounds():
+    """Test the timeout is the ceiling until warmed up, then multiplier x percentile."""
+    timeouts = AdaptiveTimeout(percentile=99, multiplier=3, floor=0.05, ceiling=5,
+                               min_samples=100, recompute_every=10)
+    assert timeouts.timeout_for('u') == 5
+
+    for i in range(200):
+        timeouts.record('u', 0.020 if i % 50 else 0.100)
+    assert timeouts.timeout_for('u') == pytest.approx(0.300, rel=0.03)
+    assert timeouts.timeout_for('other') == 5
+
+    for _ in range(200):
+        timeouts.record('fast', 0.001)
+    assert timeouts.timeout_for('fast') == 0.05
+
+    stats = timeouts.get_stats()['u']
+    assert stats['adapted'] and stats['samples'] == 200
+    assert stats['p50_ms'] == pytest.approx(20, rel=0.02)
+
+
+def test_timed_out_calls_raise_the_timeout():
+    """Test calls hitting the timeout are recorded so a slower upstream isn't cut off forever."""
+    timeouts = AdaptiveTimeout(percentile=90, multiplier=2, floor=0.01, ceiling=10,
+                               min_samples=10, recompute_every=1)
+    for _ in range(20):
+        timeouts.record('u', 0.010)
+    with pytest.raises(TimeoutError):
+        with timeouts.observe('u', timeouts.timeout_for('u')):
+            raise TimeoutError()
+    # Failures well before the timeout say nothing about latency
+    assert timeouts.get_stats()['u']['timeouts'] == 0
+
+    # Each round of timeouts pushes the percentile, and so the timeout, up
+    for _ in range(80):
+        timeouts.record('u', timeouts.timeout_for('u'), timed_out=True)
+    assert timeouts.timeout_for('u') == 10
+    assert timeouts.get_stats()['u']['timeouts'] == 80
+
+
+def test_windows_rotate_out_old_latency():
+    """Test latency from more than two windows ago no longer counts."""
+    timeouts = AdaptiveTimeout(multiplier=1, floor=0.001, min_samples=5,
+                               window_seconds=0.05, recompute_every=1)
+    for _ in range(10):
+        timeouts.record('u', 1.0)
+    time.sleep(0.11)
+    for _ in range(10):
+        timeouts.record('u', 0.010)
+    assert timeouts.timeout_for('u') == pytest.approx(0.010, rel=0.03)
+
+
+def test_client_calls_use_the_adaptive_timeout(slow_upstream):
+    """Test a client times out after the adapted timeout rather than the static one."""
+    url, handler = slow_upstream
+    timeouts = AdaptiveTimeout(multiplier=4, floor=0.05, ceiling=10,
+                               min_samples=20, recompute_every=1)
+    registry = ClientRegistry(timeout=10, timeouts=timeouts)
+    client = registry.get(url)
+    for _ in range(20):
+        assert client.post() == {'status': 'ok'}
+    adapted = timeouts.timeout_for(url)
+    assert 0.05 <= adapted < 1
+
+    handler.delay = adapted + 0.3
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        client.post()
+    assert time.monotonic() - start < adapted + 0.25
+    assert timeouts.get_stats()[url]['timeouts'] == 1
+    registry.close()
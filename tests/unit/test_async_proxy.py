@@ -0,0 +1,142 @@
+"""Unit tests for the async (ASGI) proxy path."""
+
+import asyncio
+import json
+import time
+import pytest
+from src.asgi import create_async_app
+from src.services.json_codec import RawJson
+from src.services.retry_strategy import RetryStrategy
+
+
+class _FakeAsyncClient:
+    """Async upstream stand-in that fails a fixed number of times."""
+
+    def __init__(self, failures=0, latency=0.0):
+        self.failures = failures
+        self.latency = latency
+        self.calls = 0
+
+    async def post(self, endpoint='', data=None, deadline=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.calls <= self.failures:
+            raise ConnectionError('upstream down')
+        return {'received_data': data}
+
+    async def post_raw(self, endpoint='', data=None, deadline=None, strict=False):
+        return RawJson(json.dumps(await self.post(endpoint, data, deadline)).encode())
+
+
+def test_execute_async_retries_without_blocking():
+    """Test backoff sleeps let other coroutines run."""
+    strategy = RetryStrategy(max_attempts=3, initial_delay_ms=50, jitter=False)
+    client = _FakeAsyncClient(failures=2)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def main():
+        return await asyncio.gather(
+            strategy.execute_async(client.post, data={'n': 1}),
+            ticker()
+        )
+
+    result, _ = asyncio.run(main())
+    assert result == {'received_data': {'n': 1}}
+    assert client.calls == 3
+    assert len(ticks) == 5
+
+
+def test_execute_async_raises_after_max_attempts():
+    """Test the last error is raised when every attempt fails."""
+    strategy = RetryStrategy(max_attempts=2, initial_delay_ms=1)
+    client = _FakeAsyncClient(failures=5)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(strategy.execute_async(client.post))
+    assert client.calls == 2
+
+
+def test_async_proxy_route_runs_concurrently():
+    """Test slow upstream calls overlap on one event loop."""
+    app = create_async_app()
+    app.rate_limiter.max_requests = 100
+    url = app.config['EXTERNAL_SERVICE_URL']
+    app.client_registry._clients[url] = _FakeAsyncClient(latency=0.2)
+
+    async def main():
+        test_client = app.test_client()
+        return await asyncio.gather(*(
+            test_client.post('/api/proxy/data', json={'n': i})
+            for i in range(10)
+        ))
+
+    start = time.monotonic()
+    responses = asyncio.run(main())
+    elapsed = time.monotonic() - start
+
+    assert [r.status_code for r in responses] == [200] * 10
+    assert elapsed < 1.0
+
+
+def test_async_health_reports_connection_pools():
+    """Test /api/health lists each upstream's async client with its pool limits."""
+    app = create_async_app()
+    url = app.config['EXTERNAL_SERVICE_URL']
+    app.client_registry.get(url)
+
+    async def main():
+        try:
+            return await app.test_client().get('/api/health')
+        finally:
+            await app.client_registry.close()
+
+    response = asyncio.run(main())
+    pools = asyncio.run(response.get_json())['connection_pools']
+    assert pools == {url: {
+        'requests': 0,
+        'max_connections': app.config['ASYNC_POOL_SIZE'],
+        'max_keepalive_connections': app.config['ASYNC_POOL_SIZE'],
+        'keepalive_expiry': app.config['HTTP_IDLE_TIMEOUT_SECONDS']
+    }}
+
+
+class _UnreadAsyncStream:
+    """Streamed upstream response that records whether it was closed."""
+
+    status_code = 200
+    headers = {'Content-Type': 'application/octet-stream'}
+
+    def __init__(self):
+        self.closed = 0
+
+    async def aiter_bytes(self, chunk_size):
+        yield b'data'
+
+    async def aclose(self):
+        self.closed += 1
+
+
+def test_async_stream_closes_upstream_when_body_is_never_read():
+    """Test the upstream is closed when Quart finishes a response it never iterated."""
+    app = create_async_app()
+    url = app.config['EXTERNAL_SERVICE_URL']
+    upstream = _UnreadAsyncStream()
+    client = app.client_registry._clients[url] = _FakeAsyncClient()
+
+    async def post_stream(**kwargs):
+        return upstream
+    client.post_stream = post_stream
+
+    async def main():
+        async with app.test_request_context('/api/proxy/stream', method='POST'):
+            response = await app.view_functions['async_proxy.proxy_stream']()
+        async with response.response:
+            pass
+
+    asyncio.run(main())
+    assert upstream.closed == 1
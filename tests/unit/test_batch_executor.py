@@ -0,0 +1,71 @@
+"""Unit tests for the batch fan-out executor."""
+
+import asyncio
+import threading
+import time
+from src.services.batch_executor import BatchExecutor
+
+
+def test_map_keeps_order_and_captures_errors():
+    """Test results come back in item order with exceptions in place."""
+    executor = BatchExecutor(max_workers=4, concurrency=4)
+
+    def work(n):
+        time.sleep(0.01 * (5 - n))
+        if n == 2:
+            raise ValueError('bad item')
+        return n * 10
+
+    results = executor.map(work, range(5))
+    executor.close()
+
+    assert results[:2] == [0, 10]
+    assert isinstance(results[2], ValueError)
+    assert results[3:] == [30, 40]
+
+
+def test_map_bounds_concurrency_per_batch():
+    """Test no more than `concurrency` items run at once."""
+    executor = BatchExecutor(max_workers=16, concurrency=3)
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def work(n):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return n
+
+    start = time.monotonic()
+    assert executor.map(work, range(9)) == list(range(9))
+    elapsed = time.monotonic() - start
+    executor.close()
+
+    assert peak[0] == 3
+    assert elapsed < 0.18
+
+
+def test_map_async_bounds_concurrency():
+    """Test the async path also caps items in flight and keeps order."""
+    executor = BatchExecutor(concurrency=2)
+    running = [0]
+    peak = [0]
+
+    async def work(n):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if n == 1:
+            raise ConnectionError('down')
+        return n
+
+    results = asyncio.run(executor.map_async(work, range(5)))
+    assert results[0] == 0
+    assert isinstance(results[1], ConnectionError)
+    assert results[2:] == [2, 3, 4]
+    assert peak[0] == 2
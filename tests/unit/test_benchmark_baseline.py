@@ -0,0 +1,55 @@
+"""Unit tests for benchmark baselines and regression checks."""
+
+import io
+import pytest
+from benchmarks.baseline import Results, compare, load, report, save
+
+
+def make(values):
+    results = Results('primitives')
+    for name, (value, better) in values.items():
+        results.add(name, value, 'ns/op', better=better)
+    return results.to_dict()
+
+
+def test_save_and_load_round_trip(tmp_path):
+    """Test saved results load back with their environment."""
+    results = Results('primitives')
+    results.add('retry.calculate_delay', 400.0, 'ns/op')
+    path = str(tmp_path / 'baseline.json')
+
+    save(results, path)
+    loaded = load(path)
+    assert loaded['metrics'] == {
+        'retry.calculate_delay': {'value': 400.0, 'unit': 'ns/op', 'better': 'lower'}
+    }
+    assert loaded['environment']['python']
+
+
+def test_compare_flags_metrics_that_got_worse():
+    """Test regressions respect each metric's direction and the threshold."""
+    baseline = make({'latency': (100, 'lower'), 'throughput': (1000, 'higher'),
+                     'errors': (0, 'lower'), 'gone': (1, 'lower')})
+    current = make({'latency': (105, 'lower'), 'throughput': (800, 'higher'),
+                    'errors': (0.01, 'lower'), 'new': (1, 'lower')})
+
+    rows = {name: (change, regressed) for name, _, _, change, regressed
+            in compare(baseline, current, threshold=0.10)}
+    assert set(rows) == {'errors', 'latency', 'throughput'}
+    assert rows['latency'] == (pytest.approx(0.05), False)
+    assert rows['throughput'] == (pytest.approx(0.20), True)
+    assert rows['errors'][1] is True
+
+
+def test_report_exit_status():
+    """Test the report fails only when something regressed."""
+    out = io.StringIO()
+    assert report([('latency', 100, 90, -0.1, False)], 0.1, out) == 0
+    assert report([('latency', 100, 150, 0.5, True)], 0.1, out) == 1
+    assert 'REGRESSION' in out.getvalue()
+
+
+def test_results_reject_unknown_direction():
+    """Test a metric must say whether lower or higher is better."""
+    with pytest.raises(ValueError):
+        Results('x').add('a', 1, 'ms', better='sideways')
@@ -0,0 +1,188 @@
+"""Unit tests for the bulkhead."""
+
+import asyncio
+import threading
+import time
+import pytest
+from src.services.bulkhead import Bulkhead, BulkheadRejected, parse_api_key_priorities
+from src.services.deadline import Deadline
+
+HIGH, NORMAL, LOW = 0, 1, 2
+
+
+def queue_in_thread(bulkhead, rank, outcomes, deadline=None):
+    """Start a thread waiting for a slot; its outcome is appended to outcomes."""
+    def wait():
+        try:
+            bulkhead.enter(rank, deadline)
+            outcomes.append(('admitted', rank))
+        except BulkheadRejected as e:
+            outcomes.append((e.reason, rank))
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    return thread
+
+
+def wait_queued(bulkhead, count):
+    deadline = time.monotonic() + 2
+    while bulkhead.get_stats()['queued'] != count:
+        assert time.monotonic() < deadline, 'waiters never queued'
+        time.sleep(0.001)
+
+
+def test_requests_beyond_the_queue_are_rejected_at_once():
+    """Test a full bulkhead with a full queue turns requests away without waiting."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=0, max_queue_time=5, retry_after=3)
+    bulkhead.enter(NORMAL)
+
+    start = time.monotonic()
+    with pytest.raises(BulkheadRejected) as info:
+        bulkhead.enter(NORMAL)
+    assert time.monotonic() - start < 0.1
+    assert info.value.reason == 'queue_full' and info.value.retry_after == 3
+
+    bulkhead.release()
+    bulkhead.enter(NORMAL)
+    assert bulkhead.get_stats()['priorities']['normal']['admitted'] == 2
+
+
+def test_freed_slots_go_to_the_highest_priority_first():
+    """Test waiters are admitted by priority class, then in arrival order."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=10, max_queue_time=5)
+    bulkhead.enter(NORMAL)
+    outcomes = []
+    threads = []
+    for count, rank in enumerate([LOW, NORMAL, HIGH], start=1):
+        threads.append(queue_in_thread(bulkhead, rank, outcomes))
+        wait_queued(bulkhead, count)
+
+    for _ in range(3):
+        admitted = len(outcomes)
+        bulkhead.release()
+        while len(outcomes) == admitted:
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert outcomes == [('admitted', HIGH), ('admitted', NORMAL), ('admitted', LOW)]
+
+
+def test_full_queue_sheds_the_lowest_priority():
+    """Test a newcomer displaces a lower-priority waiter, but not an equal one."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=1, max_queue_time=5)
+    bulkhead.enter(NORMAL)
+    outcomes = []
+    low = queue_in_thread(bulkhead, LOW, outcomes)
+    wait_queued(bulkhead, 1)
+
+    high = queue_in_thread(bulkhead, HIGH, outcomes)
+    low.join(timeout=2)
+    assert outcomes == [('shed', LOW)]
+    with pytest.raises(BulkheadRejected) as info:
+        bulkhead.enter(HIGH)
+    assert info.value.reason == 'queue_full'
+
+    bulkhead.release()
+    high.join(timeout=2)
+    assert outcomes[-1] == ('admitted', HIGH)
+    stats = bulkhead.get_stats()['priorities']
+    assert stats['low']['shed'] == 1 and stats['high']['queue_full'] == 1
+
+
+def test_waits_are_bounded_by_queue_time_and_deadline():
+    """Test waiters give up after max_queue_time, or sooner if their deadline passes."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=10, max_queue_time=0.05)
+    bulkhead.enter(NORMAL)
+
+    start = time.monotonic()
+    with pytest.raises(BulkheadRejected) as info:
+        bulkhead.enter(NORMAL)
+    assert info.value.reason == 'queue_timeout'
+    assert 0.04 < time.monotonic() - start < 1
+
+    bulkhead.max_queue_time = 5
+    with pytest.raises(BulkheadRejected) as info:
+        bulkhead.enter(HIGH, Deadline(0.02))
+    assert info.value.reason == 'deadline'
+    assert bulkhead.get_stats()['queued'] == 0
+
+
+def test_release_skips_waiters_past_their_deadline():
+    """Test a freed slot isn't handed to a request nobody is waiting for any more."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=10, max_queue_time=5)
+    bulkhead.enter(NORMAL)
+    deadline = Deadline(5)
+    outcomes = []
+    thread = queue_in_thread(bulkhead, NORMAL, outcomes, deadline)
+    wait_queued(bulkhead, 1)
+
+    deadline.expires_at = time.monotonic() - 1
+    bulkhead.release()
+    thread.join(timeout=2)
+    assert outcomes == [('deadline', NORMAL)]
+    assert bulkhead.active == 0
+
+
+def test_async_waiters_are_admitted_and_shed():
+    """Test enter_async queues and sheds like enter on one event loop."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=1, max_queue_time=5)
+
+    async def scenario():
+        await bulkhead.enter_async(NORMAL)
+        low = asyncio.ensure_future(bulkhead.enter_async(LOW))
+        await asyncio.sleep(0)
+        high = asyncio.ensure_future(bulkhead.enter_async(HIGH))
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadRejected):
+            await low
+        bulkhead.release()
+        await asyncio.wait_for(high, 2)
+
+        # A cancelled waiter leaves the queue
+        waiter = asyncio.ensure_future(bulkhead.enter_async(NORMAL))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    stats = bulkhead.get_stats()
+    assert stats['active'] == 1 and stats['queued'] == 0
+    assert stats['priorities']['low']['shed'] == 1
+
+
+def test_classify_prefers_the_api_key():
+    """Test the priority comes from the API key, then X-Priority, then the default."""
+    bulkhead = Bulkhead(api_key_priorities=parse_api_key_priorities('gold:high, batch:low'))
+    assert bulkhead.classify({'X-API-Key': 'gold', 'X-Priority': 'low'}) == HIGH
+    assert bulkhead.classify({'X-API-Key': 'batch', 'X-Priority': 'high'}) == LOW
+    assert bulkhead.classify({'X-Priority': 'Low'}) == LOW
+    assert bulkhead.classify({'X-Priority': 'urgent'}) == NORMAL
+    assert bulkhead.classify({}) == NORMAL
+
+    with pytest.raises(ValueError):
+        Bulkhead(api_key_priorities={'key': 'urgent'})
+    with pytest.raises(ValueError):
+        parse_api_key_priorities('no-priority')
+
+
+def test_header_cannot_raise_priority_without_api_key():
+    """Test X-Priority above the default class is ignored for callers without a key."""
+    bulkhead = Bulkhead(max_concurrent=1, max_queue=1, max_queue_time=5,
+                        api_key_priorities={'gold': 'high'})
+    assert bulkhead.classify({'X-Priority': 'high'}) == NORMAL
+    assert bulkhead.classify({'X-API-Key': 'unknown', 'X-Priority': 'high'}) == NORMAL
+    assert bulkhead.classify({'X-API-Key': 'gold'}) == HIGH
+    assert Bulkhead(default_priority='low').classify({'X-Priority': 'normal'}) == LOW
+
+    # So a spoofed header can't shed a queued request of the default class
+    bulkhead.enter(NORMAL)
+    outcomes = []
+    thread = queue_in_thread(bulkhead, NORMAL, outcomes)
+    wait_queued(bulkhead, 1)
+    with pytest.raises(BulkheadRejected):
+        bulkhead.enter(bulkhead.classify({'X-Priority': 'high'}))
+    bulkhead.release()
+    thread.join()
+    bulkhead.release()
+    assert outcomes == [('admitted', NORMAL)]
@@ -1,7 +1,10 @@
 """Unit tests for Circuit Breaker."""
 
+import asyncio
+import threading
 import pytest
 import time
+from src.services import circuit_breaker as circuit_breaker_module
 from src.services.circuit_breaker import CircuitBreaker, CircuitState
 
 
@@ -68,3 +71,144 @@ def test_circuit_breaker_half_open_success():
     result = cb.call(succeeding_func)
     assert result == 'success'
     assert cb.get_state() == 'CLOSED'
+
+
+def test_circuit_breaker_call_async():
+    """Test async calls are protected by the circuit breaker."""
+    cb = CircuitBreaker(failure_threshold=1)
+    
+    async def failing_coro():
+        raise Exception('Test failure')
+    
+    with pytest.raises(Exception):
+        asyncio.run(cb.call_async(failing_coro))
+    assert cb.get_state() == 'OPEN'
+    
+    with pytest.raises(Exception) as exc_info:
+        asyncio.run(cb.call_async(failing_coro))
+    assert 'Circuit breaker is OPEN' in str(exc_info.value)
+
+
+class FakeClock:
+    """Manually advanced replacement for time.time()."""
+    
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker_module.time, 'time', fake)
+    return fake
+
+
+def test_trips_on_failure_rate_with_minimum_calls(clock):
+    """Test the breaker opens on failure rate once enough calls were seen."""
+    cb = CircuitBreaker(failure_threshold=1, failure_rate_threshold=0.5,
+                        minimum_calls=10)
+    
+    for _ in range(5):
+        cb.record_success(cb.acquire())
+    for _ in range(4):
+        cb.record_failure(cb.acquire())
+    assert cb.get_state() == 'CLOSED'
+    
+    cb.record_failure(cb.acquire())
+    assert cb.get_state() == 'OPEN'
+
+
+def test_old_outcomes_leave_the_window(clock):
+    """Test failures older than the rolling window are forgotten."""
+    cb = CircuitBreaker(failure_threshold=3, failure_rate_threshold=0.5,
+                        window_seconds=10, window_buckets=10)
+    
+    for _ in range(2):
+        cb.record_failure(cb.acquire())
+    clock.now += 11
+    cb.record_failure(cb.acquire())
+    
+    assert cb.get_state() == 'CLOSED'
+    assert cb.get_stats()['failures'] == 1
+
+
+def test_trips_on_slow_call_rate(clock):
+    """Test slow successful calls can open the breaker."""
+    cb = CircuitBreaker(minimum_calls=4, slow_call_duration=1.0,
+                        slow_call_rate_threshold=0.5)
+    
+    cb.record_success(cb.acquire(), duration=0.1)
+    cb.record_success(cb.acquire(), duration=0.1)
+    cb.record_success(cb.acquire(), duration=2.0)
+    assert cb.get_state() == 'CLOSED'
+    
+    cb.record_success(cb.acquire(), duration=2.0)
+    assert cb.get_state() == 'OPEN'
+
+
+def test_get_state_moves_open_to_half_open(clock):
+    """Test an OPEN breaker reports HALF_OPEN once the reset timeout passed."""
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    cb.record_failure(cb.acquire())
+    assert cb.get_state() == 'OPEN'
+    
+    clock.now += 30
+    assert cb.get_state() == 'HALF_OPEN'
+
+
+def test_half_open_admits_limited_trials(clock):
+    """Test HALF_OPEN admits at most half_open_max_calls concurrent trials."""
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout=30,
+                        success_threshold=2, half_open_max_calls=2)
+    cb.record_failure(cb.acquire())
+    clock.now += 30
+    
+    permits = [cb.acquire() for _ in range(5)]
+    assert sum(p is not None for p in permits) == 2
+    
+    cb.record_success(permits[0])
+    assert cb.get_state() == 'HALF_OPEN'
+    cb.record_success(permits[1])
+    assert cb.get_state() == 'CLOSED'
+
+
+def test_half_open_failure_reopens(clock):
+    """Test a failed trial reopens the breaker and stale permits are ignored."""
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout=30,
+                        half_open_max_calls=2)
+    cb.record_failure(cb.acquire())
+    clock.now += 30
+    
+    first, second = cb.acquire(), cb.acquire()
+    cb.record_failure(first)
+    assert cb.get_state() == 'OPEN'
+    
+    cb.record_success(second)
+    assert cb.get_state() == 'OPEN'
+
+
+def test_concurrent_half_open_trials_are_capped():
+    """Test racing threads never exceed the HALF_OPEN trial limit."""
+    cb = CircuitBreaker(failure_threshold=1, reset_timeout=0,
+                        half_open_max_calls=3)
+    cb.record_failure(cb.acquire())
+    cb.reset_timeout = 60
+    cb.last_open_time = time.time() - 60
+    
+    permits = []
+    barrier = threading.Barrier(16)
+    
+    def worker():
+        barrier.wait()
+        permits.append(cb.acquire())
+    
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sum(p is not None for p in permits) == 3
@@ -0,0 +1,179 @@
+"""Unit tests for the per-endpoint circuit breaker registry."""
+
+import pytest
+from src.services import circuit_breaker_registry as registry_module
+from src.services.circuit_breaker import CircuitBreaker
+from src.services.circuit_breaker_registry import CircuitBreakerRegistry, is_upstream_failure
+
+
+class FakeMonotonic:
+    """Controllable replacement for time.monotonic."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeMonotonic()
+    monkeypatch.setattr(registry_module.time, 'monotonic', fake)
+    return fake
+
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure(breaker.acquire())
+
+
+def test_breakers_are_per_host_and_endpoint():
+    """Test each host and path gets its own breaker, reused on later lookups."""
+    registry = CircuitBreakerRegistry(failure_threshold=2, minimum_calls=2)
+
+    orders = registry.for_url('http://api.example.com/orders')
+    assert registry.for_url('http://api.example.com/orders') is orders
+    assert registry.get('api.example.com', '/orders') is orders
+    assert registry.for_url('http://api.example.com/users') is not orders
+    assert registry.for_url('http://other.example.com/orders') is not orders
+    assert registry.for_endpoint('http://api.example.com', 'orders') is orders
+    assert registry.for_endpoint('http://api.example.com/orders') is orders
+    assert len(registry) == 3
+
+
+def test_failing_endpoint_does_not_open_others():
+    """Test tripping one endpoint's breaker leaves other endpoints CLOSED."""
+    registry = CircuitBreakerRegistry(failure_threshold=2, minimum_calls=2)
+    orders = registry.for_url('http://api.example.com/orders')
+    users = registry.for_url('http://api.example.com/users')
+
+    trip(orders)
+
+    assert orders.get_state() == 'OPEN'
+    assert users.get_state() == 'CLOSED'
+    assert users.acquire() is not None
+
+    summary = registry.get_summary()
+    assert summary['total'] == 2
+    assert summary['closed'] == 1
+    assert summary['open'] == ['api.example.com/orders']
+    assert summary['half_open'] == []
+
+
+def test_idle_closed_breakers_are_evicted(clock):
+    """Test unused CLOSED breakers are dropped while OPEN ones are kept."""
+    registry = CircuitBreakerRegistry(idle_timeout=60, failure_threshold=1,
+                                      minimum_calls=1)
+    registry.get('a', '/idle')
+    trip(registry.get('a', '/open'))
+
+    clock.now += 61
+    registry.get('a', '/fresh')
+
+    assert len(registry) == 2
+    assert registry.get_summary()['open'] == ['a/open']
+    assert registry.evictions == 1
+
+
+def test_cap_evicts_least_recently_used(clock):
+    """Test the registry stays at max_breakers by dropping the LRU breakers."""
+    registry = CircuitBreakerRegistry(max_breakers=3)
+    first = registry.get('a', '/1')
+    registry.get('a', '/2')
+    registry.get('a', '/3')
+    registry.get('a', '/1')
+    registry.get('a', '/4')
+
+    assert len(registry) == 3
+    assert registry.get('a', '/1') is first
+    assert 'a/2' not in registry._breakers
+    assert registry.evictions == 1
+
+
+
+def test_breakers_with_calls_in_flight_are_not_evicted(clock, tmp_path):
+    """Test idle or over-cap breakers stay until outstanding permits are reported."""
+    from src.services.shared_state import SharedCircuitBreaker
+
+    registry = CircuitBreakerRegistry(
+        breaker_factory=lambda key: SharedCircuitBreaker(str(tmp_path / key.replace('/', '_'))),
+        idle_timeout=60, max_breakers=1
+    )
+    busy = registry.get('a', '/busy')
+    permit = busy.acquire()
+
+    clock.now += 61
+    registry.get('a', '/other')
+    assert registry.get('a', '/busy') is busy
+
+    busy.record_success(permit, 0.01)
+    assert busy.in_flight == 0
+    clock.now += 61
+    registry.get('a', '/other')
+    assert 'a/busy' not in registry._breakers
+
+def test_custom_factory_receives_key():
+    """Test the factory is called once per key with that key."""
+    keys = []
+
+    def factory(key):
+        keys.append(key)
+        return CircuitBreaker()
+
+    registry = CircuitBreakerRegistry(factory)
+    registry.for_url('https://svc:8443/v1/items')
+    registry.for_url('https://svc:8443/v1/items')
+
+    assert keys == ['svc:8443/v1/items']
+
+
+class _Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.response = _Response(status_code)
+
+
+@pytest.mark.parametrize('error, expected', [
+    (ConnectionError('down'), True),
+    (TimeoutError('slow'), True),
+    (_HTTPError(500), True),
+    (_HTTPError(503), True),
+    (_HTTPError(429), True),
+    (_HTTPError(404), False),
+    (_HTTPError(400), False),
+])
+def test_is_upstream_failure(error, expected):
+    """Test only transport errors, 5xx and 429 count as upstream failures."""
+    assert is_upstream_failure(error) is expected
+
+
+def test_state_seconds_and_transitions_are_reported():
+    """Test time in each state accumulates over transitions and evictions."""
+    registry = CircuitBreakerRegistry(failure_threshold=1, minimum_calls=1,
+                                      max_breakers=1)
+    transitions = []
+    registry.on_transition = lambda previous, state: transitions.append(
+        (previous.value, state.value)
+    )
+
+    breaker = registry.get('api.example.com', '/a')
+    breaker.state_since -= 10
+    trip(breaker)
+    breaker.state_since -= 5
+    seconds = registry.get_state_seconds()
+    assert transitions == [('CLOSED', 'OPEN')]
+    assert seconds['CLOSED'] == pytest.approx(10, abs=1)
+    assert seconds['OPEN'] == pytest.approx(5, abs=1)
+
+    # An evicted CLOSED breaker's time is kept
+    breaker.reset()
+    breaker.state_since -= 20
+    registry.get('api.example.com', '/b')
+    assert len(registry) == 1
+    assert registry.get_state_seconds()['CLOSED'] == pytest.approx(30, abs=1)
@@ -0,0 +1,79 @@
+"""Unit tests for the pooled Client Registry."""
+
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.services.client_registry import ClientRegistry
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) or b'{}'
+        payload = json.dumps({'received': json.loads(body)}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _EchoHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/process'
+    server.shutdown()
+    server.server_close()
+
+
+def test_registry_returns_same_client_per_upstream():
+    """Test one client is shared per upstream URL."""
+    registry = ClientRegistry()
+    assert registry.get('http://a/x') is registry.get('http://a/x')
+    assert registry.get('http://a/x') is not registry.get('http://b/x')
+    registry.close()
+
+
+def test_connections_are_reused(upstream_url):
+    """Test sequential calls reuse one keep-alive connection."""
+    registry = ClientRegistry()
+    client = registry.get(upstream_url)
+
+    for i in range(5):
+        assert client.post(data={'n': i}) == {'received': {'n': i}}
+
+    stats = registry.get_stats()[upstream_url]
+    assert stats['requests'] == 5
+    assert stats['new_connections'] == 1
+    assert stats['hits'] == 4
+    registry.close()
+
+
+def test_idle_connections_are_reaped(upstream_url):
+    """Test connections idle past the timeout are replaced."""
+    registry = ClientRegistry(idle_timeout=0)
+    client = registry.get(upstream_url)
+
+    client.post(data={})
+    client.post(data={})
+    assert client.get_pool_stats()['reaped'] == 1
+    assert registry.reap_idle() == 1
+    registry.close()
+
+
+def test_closed_registry_rejects_new_clients():
+    """Test the shutdown hook closes the registry."""
+    registry = ClientRegistry()
+    registry.start_reaper(interval=0.01)
+    registry.close()
+
+    with pytest.raises(RuntimeError):
+        registry.get('http://a/x')
@@ -0,0 +1,60 @@
+"""Unit tests for the bounded client table."""
+
+import pytest
+from src.services import rate_limiter as rate_limiter_module
+from src.services.client_table import ClientTable
+from src.services.rate_limiter import create_rate_limiter
+
+
+def test_lru_eviction_at_capacity():
+    """Test the least recently written client is evicted at the cap."""
+    table = ClientTable(max_entries=2)
+    table.put('a', 1, now=0)
+    table.put('b', 2, now=1)
+    table.put('a', 3, now=2)
+    table.put('c', 4, now=3)
+
+    assert 'b' not in table
+    assert table.get('a', now=3) == 3
+    assert table.get_stats()['evictions'] == 1
+    assert len(table) == 2
+
+
+def test_expired_entries_are_hidden_and_removed_incrementally():
+    """Test expiry happens a few entries at a time on writes."""
+    table = ClientTable(max_entries=100, ttl=10, expire_batch=2)
+    for i in range(5):
+        table.put(str(i), i, now=0)
+
+    assert table.get('0', now=10) is None
+    table.put('new', 0, now=10)
+    assert len(table) == 4
+    assert table.expire(now=10) == 3
+    assert table.get_stats()['expirations'] == 5
+
+
+def test_expire_with_max_age_stops_at_first_fresh_entry():
+    """Test expiry only looks at the stale head of the table."""
+    table = ClientTable(max_entries=100, ttl=100)
+    table.put('old', 0, now=0)
+    table.put('fresh', 0, now=50)
+
+    assert table.expire(now=55, max_age=20) == 1
+    assert 'fresh' in table
+
+
+@pytest.mark.parametrize('algorithm', ['sliding_log', 'sliding_window', 'gcra'])
+def test_limiter_memory_is_bounded(monkeypatch, algorithm):
+    """Test a scan from many clients cannot grow the table past its cap."""
+    monkeypatch.setattr(rate_limiter_module.time, 'time', lambda: 1000.0)
+    limiter = create_rate_limiter(algorithm, window_size=60, max_requests=5,
+                                  max_clients=100)
+
+    for i in range(1000):
+        limiter.is_allowed(f'10.0.{i // 256}.{i % 256}')
+        limiter.get_remaining_requests(f'unknown-{i}')
+        limiter.get_reset_time(f'unknown-{i}')
+
+    stats = limiter.get_stats()
+    assert stats['size'] <= 100
+    assert stats['size'] + stats['evictions'] == 1000
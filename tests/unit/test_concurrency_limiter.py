@@ -0,0 +1,109 @@
+"""Unit tests for the adaptive concurrency limiter."""
+
+import threading
+import pytest
+from src.services.concurrency_limiter import (
+    AIMDLimit, AdaptiveConcurrencyLimiter, GradientLimit, create_concurrency_limiter
+)
+
+
+def run_calls(limiter, count, rtt, dropped=False, concurrent=None):
+    """Report count calls, keeping `concurrent` of them in flight (default: the limit)."""
+    for _ in range(count):
+        slots = concurrent or limiter.get_limit()
+        held = [limiter.try_acquire() for _ in range(slots)]
+        for acquired in held:
+            if acquired:
+                limiter.release(rtt, dropped)
+
+
+def test_calls_over_the_limit_are_rejected():
+    """Test the limiter admits up to its limit and counts rejections."""
+    limiter = create_concurrency_limiter('aimd', initial_limit=2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+    limiter.release()
+    assert limiter.try_acquire()
+    stats = limiter.get_stats()
+    assert stats['in_flight'] == 2 and stats['rejected'] == 1 and stats['limit'] == 2
+
+
+def test_release_without_feedback_keeps_the_limit():
+    """Test calls that say nothing about the upstream don't move the limit."""
+    limiter = create_concurrency_limiter('aimd', initial_limit=10)
+    limiter.try_acquire()
+    limiter.release()
+    assert limiter.limit == 10 and limiter.in_flight == 0
+
+
+def test_aimd_grows_when_used_and_backs_off_on_errors():
+    """Test AIMD grows while the limit is used and halves (here) on failure."""
+    limiter = AdaptiveConcurrencyLimiter(AIMDLimit(backoff_ratio=0.5), initial_limit=10)
+    run_calls(limiter, 10, 0.01)
+    grown = limiter.limit
+    assert 12 < grown < 20
+
+    # Mostly idle: no evidence the upstream could take more
+    run_calls(limiter, 1, 0.01, concurrent=1)
+    assert limiter.limit == grown
+
+    limiter.try_acquire()
+    limiter.release(0.01, dropped=True)
+    assert limiter.limit == pytest.approx(grown / 2)
+
+
+def test_aimd_latency_threshold_counts_slow_calls_as_drops():
+    """Test successes slower than the threshold shrink the limit."""
+    limiter = AdaptiveConcurrencyLimiter(AIMDLimit(latency_threshold=0.1), initial_limit=10)
+    run_calls(limiter, 1, 0.5, concurrent=1)
+    assert limiter.limit == pytest.approx(9)
+
+
+def test_gradient_grows_at_steady_latency_and_shrinks_when_it_rises():
+    """Test the gradient limit follows the ratio of long-term to current latency."""
+    limiter = AdaptiveConcurrencyLimiter(GradientLimit(), initial_limit=10, max_limit=1000)
+    run_calls(limiter, 5, 0.010)
+    grown = limiter.limit
+    assert grown > 10
+
+    run_calls(limiter, 5, 0.100)
+    assert limiter.limit < grown
+    assert limiter.get_stats()['long_rtt_ms'] < 100
+
+
+def test_limit_stays_within_bounds():
+    """Test the limit never leaves [min_limit, max_limit]."""
+    limiter = create_concurrency_limiter('gradient', initial_limit=5, min_limit=2, max_limit=8)
+    run_calls(limiter, 50, 0.01)
+    assert limiter.get_limit() == 8
+    for _ in range(50):
+        limiter.try_acquire()
+        limiter.release(0.01, dropped=True)
+    assert limiter.get_limit() == 2
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError):
+        create_concurrency_limiter('vegas2')
+
+
+def test_in_flight_never_exceeds_the_limit_under_contention():
+    """Test concurrent callers can't overshoot the limit."""
+    limiter = create_concurrency_limiter('aimd', initial_limit=4, max_limit=4)
+    peak = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(500):
+            if limiter.try_acquire():
+                with lock:
+                    peak.append(limiter.in_flight)
+                limiter.release(0.001)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) <= 4 and limiter.in_flight == 0
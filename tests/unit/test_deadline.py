@@ -0,0 +1,130 @@
+"""Unit tests for request deadlines and Retry-After handling."""
+
+import asyncio
+import time
+import pytest
+import requests
+from src.services.deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded
+from src.services.external_service_client import ExternalServiceClient
+from src.services.retry_strategy import RetryStrategy
+
+
+def http_error(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return requests.HTTPError(f'{status} error', response=response)
+
+
+class Flaky:
+    """Callable failing with the given errors before succeeding."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self, deadline=None):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+def test_from_header_never_extends_default():
+    """Test the header can shorten but not lengthen the configured deadline."""
+    assert Deadline.from_header('2', default=10).timeout == 2
+    assert Deadline.from_header('60', default=10).timeout == 10
+    assert Deadline.from_header(None, default=10).timeout == 10
+    assert Deadline.from_header('soon', default=10).timeout == 10
+    assert Deadline.from_header('-1', default=10).timeout == 10
+
+
+def test_cap_shortens_timeout_and_raises_when_expired():
+    """Test call timeouts are cut to the time remaining."""
+    deadline = Deadline(0.5)
+    assert deadline.cap(10) <= 0.5
+    assert deadline.cap(0.1) == 0.1
+
+    expired = Deadline(0)
+    assert expired.expired()
+    with pytest.raises(DeadlineExceeded):
+        expired.cap(10)
+
+
+def test_client_forwards_remaining_deadline():
+    """Test the client sends the time left upstream and bounds its timeout."""
+    client = ExternalServiceClient('http://upstream', timeout=10)
+    timeout, headers = client._call_options(Deadline(2))
+    client.close()
+
+    assert timeout <= 2
+    assert 1.9 < float(headers[DEADLINE_HEADER]) <= 2
+    assert client._call_options(None) == (10, None)
+
+
+def test_retry_skipped_without_time_for_another_attempt():
+    """Test no retry is made when the backoff would overrun the deadline."""
+    strategy = RetryStrategy(max_attempts=3, initial_delay_ms=200, jitter=False)
+    func = Flaky(ConnectionError('down'), ConnectionError('down'))
+
+    with pytest.raises(ConnectionError):
+        strategy.execute(func, deadline=Deadline(0.1))
+    assert len(func.calls) == 1
+
+
+def test_retry_made_when_deadline_allows():
+    """Test retries still happen when they fit in the deadline."""
+    strategy = RetryStrategy(max_attempts=3, initial_delay_ms=10, jitter=False)
+    func = Flaky(ConnectionError('down'))
+
+    assert strategy.execute(func, deadline=Deadline(5)) == 'ok'
+    assert len(func.calls) == 2
+
+
+def test_retry_after_replaces_backoff():
+    """Test an upstream Retry-After on 503 sets the delay before retrying."""
+    strategy = RetryStrategy(max_attempts=2, initial_delay_ms=1, jitter=False)
+    func = Flaky(http_error(503, retry_after='0.3'))
+
+    assert strategy.execute(func) == 'ok'
+    assert func.calls[1] - func.calls[0] >= 0.3
+
+
+def test_retry_after_beyond_limits_stops_retrying():
+    """Test a Retry-After past max_delay_ms or the deadline is not waited out."""
+    strategy = RetryStrategy(max_attempts=3, initial_delay_ms=1, max_delay_ms=1000)
+
+    func = Flaky(http_error(429, retry_after='120'))
+    with pytest.raises(requests.HTTPError):
+        strategy.execute(func)
+    assert len(func.calls) == 1
+
+    func = Flaky(http_error(429, retry_after='0.5'))
+    with pytest.raises(requests.HTTPError):
+        strategy.execute(func, deadline=Deadline(0.2))
+    assert len(func.calls) == 1
+
+
+def test_retry_after_ignored_for_other_statuses():
+    """Test Retry-After only applies to 429 and 503 responses."""
+    strategy = RetryStrategy(max_attempts=2, initial_delay_ms=1, jitter=False)
+    func = Flaky(http_error(500, retry_after='120'))
+
+    assert strategy.execute(func) == 'ok'
+    assert func.calls[1] - func.calls[0] < 1
+
+
+def test_execute_async_honours_deadline():
+    """Test the async path skips retries that can't finish in time."""
+    strategy = RetryStrategy(max_attempts=3, initial_delay_ms=200, jitter=False)
+    calls = []
+
+    async def failing(deadline=None):
+        calls.append(deadline)
+        raise ConnectionError('down')
+
+    deadline = Deadline(0.1)
+    with pytest.raises(ConnectionError):
+        asyncio.run(strategy.execute_async(failing, deadline=deadline))
+    assert calls == [deadline]
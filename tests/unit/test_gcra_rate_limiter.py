@@ -0,0 +1,102 @@
+"""Unit tests for the GCRA rate limiter."""
+
+import pytest
+from src.services import rate_limiter as rate_limiter_module
+from src.services.rate_limiter import GCRARateLimiter, create_rate_limiter
+
+
+class FakeClock:
+    """Manually advanced replacement for time.time()."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, 'time', fake)
+    return fake
+
+
+def test_burst_then_paced(clock):
+    """Test a full burst is admitted, then one request per interval."""
+    limiter = GCRARateLimiter(window_size=10, max_requests=10, burst=3)
+
+    assert [limiter.is_allowed('a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.get_retry_after('a') == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert limiter.is_allowed('a') is False
+    clock.now += 0.5
+    assert limiter.is_allowed('a') is True
+    assert limiter.is_allowed('a') is False
+
+
+def test_sustained_rate_over_long_run(clock):
+    """Test steady overload is held to the sustained rate."""
+    limiter = GCRARateLimiter(window_size=60, max_requests=60, burst=5)
+
+    allowed = 0
+    for _ in range(6000):
+        clock.now += 0.1
+        allowed += limiter.is_allowed('a')
+
+    # 600 seconds at one request per second plus the initial burst
+    assert 600 <= allowed <= 605
+
+
+def test_remaining_and_reset(clock):
+    """Test remaining burst capacity and reset time are O(1) lookups."""
+    limiter = GCRARateLimiter(window_size=10, max_requests=5, burst=4)
+
+    assert limiter.get_remaining_requests('a') == 4
+    limiter.is_allowed('a')
+    limiter.is_allowed('a')
+    assert limiter.get_remaining_requests('a') == 2
+    assert limiter.get_reset_time('a') == 0
+
+    limiter.is_allowed('a')
+    limiter.is_allowed('a')
+    assert limiter.get_remaining_requests('a') == 0
+    assert limiter.get_reset_time('a') == 2
+
+
+def test_unknown_client_lookups_do_not_create_entries(clock):
+    """Test read-only lookups don't allocate client state."""
+    limiter = GCRARateLimiter(window_size=10, max_requests=5)
+
+    assert limiter.get_reset_time('ghost') == 0
+    assert limiter.get_remaining_requests('ghost') == 5
+    assert len(limiter.tats) == 0
+
+
+def test_cleanup_drops_replenished_clients(clock):
+    """Test clients with a TAT in the past are removed."""
+    limiter = GCRARateLimiter(window_size=10, max_requests=5)
+    limiter.is_allowed('a')
+
+    clock.now += 10
+    limiter.cleanup_old_entries()
+    assert len(limiter.tats) == 0
+
+
+def test_factory_passes_burst():
+    """Test the factory builds a GCRA engine with its burst size."""
+    limiter = create_rate_limiter('gcra', window_size=60, max_requests=30, burst=7)
+    assert isinstance(limiter, GCRARateLimiter)
+    assert limiter.burst == 7
+    assert limiter.interval == 2.0
+
+
+def test_cost_consumes_multiple_units():
+    """Test a request with cost n is admitted only if all n units conform."""
+    limiter = GCRARateLimiter(window_size=10, max_requests=10, burst=5)
+
+    assert limiter.is_allowed('client', cost=3)
+    assert not limiter.is_allowed('client', cost=3)
+    assert limiter.is_allowed('client', cost=2)
+    assert not limiter.is_allowed('client')
@@ -0,0 +1,184 @@
+"""Unit tests for hedged requests."""
+
+import asyncio
+import threading
+import time
+import pytest
+from src.services.concurrency_limiter import AdaptiveConcurrencyLimiter, AIMDLimit
+from src.services.hedging import Hedger, LatencyTracker
+
+
+class SlowThenFast:
+    """Upstream stand-in whose first call is slow and later calls are fast."""
+
+    def __init__(self, slow=0.5, fast=0.01):
+        self.slow = slow
+        self.fast = fast
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next_latency(self):
+        with self._lock:
+            self.calls += 1
+            return self.slow if self.calls == 1 else self.fast
+
+    def __call__(self, data=None):
+        time.sleep(self._next_latency())
+        return {'call': self.calls, 'data': data}
+
+    async def call_async(self, data=None):
+        await asyncio.sleep(self._next_latency())
+        return {'call': self.calls, 'data': data}
+
+
+def warmed_hedger(latency=0.02, **kwargs):
+    hedger = Hedger(**kwargs)
+    for _ in range(hedger.tracker.min_samples):
+        hedger.tracker.record(latency)
+    return hedger
+
+
+def test_tracker_reports_percentile_after_min_samples():
+    """Test the tracked percentile appears once enough samples are seen."""
+    tracker = LatencyTracker(percentile=95, min_samples=20, recompute_every=1)
+    for i in range(19):
+        tracker.record(i / 1000)
+    assert tracker.get() is None
+
+    for i in range(19, 100):
+        tracker.record(i / 1000)
+    assert tracker.get() == pytest.approx(0.094)
+
+
+def test_no_hedge_until_latency_known():
+    """Test calls pass straight through while the percentile is unknown."""
+    hedger = Hedger(budget_ratio=1.0)
+    upstream = SlowThenFast(slow=0.05)
+
+    assert hedger.execute(upstream, data=1)['call'] == 1
+    assert upstream.calls == 1
+    assert hedger.get_stats()['hedges'] == 0
+    hedger.close()
+
+
+def test_hedge_wins_against_slow_primary():
+    """Test a hedge sent after the percentile returns before a slow primary."""
+    hedger = warmed_hedger(budget_ratio=1.0)
+    upstream = SlowThenFast(slow=0.5)
+
+    start = time.monotonic()
+    result = hedger.execute(upstream, data='x')
+    elapsed = time.monotonic() - start
+
+    assert result == {'call': 2, 'data': 'x'}
+    assert elapsed < 0.3
+    stats = hedger.get_stats()
+    assert stats['hedges'] == 1
+    assert stats['hedge_wins'] == 1
+    assert stats['hedge_losses'] == 0
+    hedger.close()
+
+
+def test_fast_primary_is_not_hedged():
+    """Test a primary finishing before the hedge delay sends no hedge."""
+    hedger = warmed_hedger(latency=0.2, budget_ratio=1.0)
+    upstream = SlowThenFast(slow=0.01)
+
+    assert hedger.execute(upstream)['call'] == 1
+    assert upstream.calls == 1
+    assert hedger.get_stats()['hedges'] == 0
+    hedger.close()
+
+
+def test_hedges_capped_by_budget():
+    """Test hedges stay within budget_ratio of requests."""
+    hedger = warmed_hedger(latency=0.01, budget_ratio=0.25, min_delay_ms=1)
+    threads = []
+
+    def slow(data=None):
+        threads.append(threading.current_thread())
+        time.sleep(0.03)
+        return data
+
+    for i in range(8):
+        assert hedger.execute(slow, data=i) == i
+
+    stats = hedger.get_stats()
+    assert stats['requests'] == 8
+    assert stats['hedges'] == 2
+    # Calls that couldn't be hedged ran on the caller's thread
+    assert threads.count(threading.current_thread()) == 6
+    hedger.close()
+
+
+def test_hedge_takes_a_concurrency_slot():
+    """Test a hedge holds a limiter slot while in flight and is denied without one."""
+    limiter = AdaptiveConcurrencyLimiter(AIMDLimit(), initial_limit=1, max_limit=1)
+    hedger = warmed_hedger(budget_ratio=1.0, limiter=limiter)
+    upstream = SlowThenFast(slow=0.2)
+
+    assert hedger.execute(upstream)['call'] == 2
+    assert limiter.get_stats()['accepted'] == 1
+    # The slot is returned by a callback just after the hedge completes
+    deadline = time.monotonic() + 1
+    while limiter.get_stats()['in_flight'] and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert limiter.get_stats()['in_flight'] == 0
+
+    # With the only slot taken, the slow primary runs unhedged
+    assert limiter.try_acquire()
+    assert hedger.execute(SlowThenFast(slow=0.1))['call'] == 1
+    assert hedger.get_stats()['hedges_denied'] == 1
+    limiter.release()
+    hedger.close()
+
+
+def test_primary_runs_inline_when_workers_busy():
+    """Test calls run on the caller's thread once every worker is in use."""
+    hedger = warmed_hedger(budget_ratio=1.0, max_workers=1)
+    release = threading.Event()
+    blocker = threading.Thread(target=hedger.execute, args=(release.wait,))
+    blocker.start()
+    while hedger.get_stats()['requests'] == 0:
+        time.sleep(0.001)
+
+    assert hedger.execute(threading.current_thread) is threading.current_thread()
+    release.set()
+    blocker.join()
+    hedger.close()
+
+
+def test_failed_hedge_falls_back_to_primary():
+    """Test a failing hedge doesn't fail the call while the primary succeeds."""
+    hedger = warmed_hedger(budget_ratio=1.0)
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.2)
+            return 'primary'
+        raise ConnectionError('hedge failed')
+
+    assert hedger.execute(upstream) == 'primary'
+    assert hedger.get_stats()['hedge_losses'] == 1
+    hedger.close()
+
+
+def test_async_hedge_cancels_loser():
+    """Test the async path returns the hedge and cancels the slow primary."""
+    hedger = warmed_hedger(budget_ratio=1.0)
+    upstream = SlowThenFast(slow=5)
+
+    async def main():
+        start = time.monotonic()
+        result = await hedger.execute_async(upstream.call_async, data='y')
+        await asyncio.sleep(0)
+        pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return result, time.monotonic() - start, pending
+
+    result, elapsed, pending = asyncio.run(main())
+    assert result == {'call': 2, 'data': 'y'}
+    assert elapsed < 1
+    assert pending == []
+    assert hedger.get_stats()['hedge_wins'] == 1
@@ -0,0 +1,132 @@
+"""Unit tests for JSON codecs and raw JSON splicing."""
+
+import json
+import pytest
+from src.services.json_codec import (
+    JsonCodec, OrjsonCodec, RawJson, check_json_bytes, get_codec, orjson, splice_json
+)
+
+CODECS = [JsonCodec()] + ([OrjsonCodec()] if orjson is not None else [])
+
+
+@pytest.mark.parametrize('codec', CODECS, ids=lambda codec: codec.name)
+def test_codec_round_trip(codec):
+    """Test codecs encode compact UTF-8 JSON bytes and decode them back."""
+    obj = {'s': 'é', 'n': [1, 2.5, None, True]}
+
+    encoded = codec.dumps(obj)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == obj
+    with pytest.raises(ValueError):
+        codec.loads(b'{"a":')
+
+
+
+@pytest.mark.parametrize('codec', CODECS, ids=lambda codec: codec.name)
+def test_codec_sorts_keys_and_escapes_like_json(codec):
+    """Test sort_keys and ensure_ascii give the standard library's bytes."""
+    obj = {'b': 'é😀', 'a': {'d': 1, 'c': ['ü']}}
+
+    for sort_keys in (False, True):
+        for ensure_ascii in (False, True):
+            expected = json.dumps(obj, separators=(',', ':'), sort_keys=sort_keys,
+                                  ensure_ascii=ensure_ascii).encode()
+            assert codec.dumps(obj, sort_keys=sort_keys, ensure_ascii=ensure_ascii) == expected
+
+
+@pytest.mark.parametrize('app_factory', ['flask', 'quart'])
+def test_provider_keeps_framework_defaults(app_factory):
+    """Test jsonify output matches the framework's DefaultJSONProvider."""
+    import asyncio
+    if app_factory == 'flask':
+        from flask.json.provider import DefaultJSONProvider
+        from src.main import create_app
+        app = create_app()
+    else:
+        from quart.json.provider import DefaultJSONProvider
+        from src.asgi import create_async_app
+        app = create_async_app()
+    obj = {'z': 'é', 'a': [1, {'y': None, 'b': True}]}
+    default = DefaultJSONProvider(app)
+
+    assert app.json.dumps(obj) == default.dumps(obj, separators=(',', ':'))
+    assert app.json.dumps(obj, indent=2) == default.dumps(obj, indent=2)
+    body = app.json.response(obj).get_data()
+    expected = default.response(obj).get_data()
+    if asyncio.iscoroutine(body):
+        body, expected = asyncio.run(body), asyncio.run(expected)
+    assert body == expected
+
+    app.json.sort_keys = False
+    app.json.ensure_ascii = False
+    assert app.json.dumps(obj) == json.dumps(obj, separators=(',', ':'), ensure_ascii=False)
+
+def test_get_codec():
+    """Test codecs are chosen by name and auto prefers orjson when installed."""
+    assert get_codec('json').name == 'json'
+    assert get_codec('auto').name == ('orjson' if orjson is not None else 'json')
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+
+
+def test_check_accepts_declared_json_cheaply():
+    """Test a JSON content type only gets its structure scanned."""
+    assert check_json_bytes(b' {"a": 1}\n', 'application/json') == b'{"a": 1}'
+    assert check_json_bytes(b'[1]', 'application/problem+json; charset=utf-8') == b'[1]'
+    # Brackets and quotes inside strings don't count
+    body = b'{"a": "}\\"{[", "b": [{"c": "]"}]}'
+    assert check_json_bytes(body, 'application/json') == body
+    # Not decoded, so a malformed but balanced middle passes the cheap check
+    assert check_json_bytes(b'{"a": }', 'application/json') == b'{"a": }'
+
+
+@pytest.mark.parametrize('body', [
+    b'', b'<html></html>', b'{"a": 1', b'[1, 2', b'{"a": [1}', b'{"a": 1}}',
+    # A truncated string, and a body that would add keys to the envelope
+    b'{"a":"}', b'{"a":1},"status":"pwned","x":{}',
+])
+def test_check_rejects_obviously_broken_bodies(body):
+    """Test empty, non-JSON and truncated bodies are rejected."""
+    with pytest.raises(ValueError):
+        check_json_bytes(body, 'application/json')
+
+
+def test_check_parses_undeclared_scalar_and_strict_bodies():
+    """Test bodies the content type doesn't vouch for are fully parsed."""
+    assert check_json_bytes(b'{"a": 1}', 'text/plain') == b'{"a": 1}'
+    assert check_json_bytes(b'42', 'application/json') == b'42'
+    with pytest.raises(ValueError):
+        check_json_bytes(b'{"a": }', 'text/plain')
+    with pytest.raises(ValueError):
+        check_json_bytes(b'{"a": }', 'application/json', strict=True)
+    with pytest.raises(ValueError):
+        check_json_bytes(b'nope', 'application/json')
+
+
+@pytest.mark.parametrize('codec', CODECS, ids=lambda codec: codec.name)
+def test_splice_matches_full_encoding(codec):
+    """Test splicing raw bytes gives the same JSON as decoding and re-encoding."""
+    upstream = {'received_data': {'q': [1, 'two']}, 'message': 'ok'}
+    raw = RawJson(json.dumps(upstream).encode())
+    envelope = {'status': 'success', 'external_response': raw, 'proxy_notes': 'CLOSED'}
+
+    spliced = json.loads(splice_json(envelope, codec))
+    assert spliced == {'status': 'success', 'external_response': upstream,
+                       'proxy_notes': 'CLOSED'}
+    assert list(spliced) == ['status', 'external_response', 'proxy_notes']
+
+    envelope['proxy_notes'] = 'é'
+    sorted_ascii = splice_json(envelope, codec, sort_keys=True, ensure_ascii=True)
+    assert sorted_ascii == (b'{"external_response":' + raw.body +
+                            b',"proxy_notes":"\\u00e9","status":"success"}')
+
+
+def test_check_keeps_spliced_envelope_intact():
+    """Test a body closing early can't inject envelope keys through the splice."""
+    body = b'{"a":1},"status":"pwned","x":{}'
+    with pytest.raises(ValueError):
+        check_json_bytes(body, 'application/json')
+    # The balanced prefix is still accepted and splices as one value
+    raw = RawJson(check_json_bytes(b'{"a":1}', 'application/json'))
+    spliced = json.loads(splice_json({'status': 'success', 'external_response': raw}))
+    assert spliced == {'status': 'success', 'external_response': {'a': 1}}
@@ -0,0 +1,130 @@
+"""Unit tests for the sharded Prometheus metrics."""
+
+import gc
+import threading
+import pytest
+from src.services.metrics import (
+    AsyncUpstreamCall, MetricsRegistry, ProxyMetrics, UpstreamCall, status_class
+)
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_counter_sums_cells_of_all_threads():
+    """Test increments from many threads are all counted."""
+    counter = MetricsRegistry().counter('hits_total', 'Hits')
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    run_threads(work, 8)
+    assert counter.labels().get() == 8000
+
+
+def test_cells_of_exited_threads_are_retired():
+    """Test finished threads' cells are folded in instead of kept."""
+    counter = MetricsRegistry().counter('hits_total', 'Hits')
+    shards = counter.labels()._shards
+
+    for _ in range(20):
+        run_threads(lambda: counter.inc(2), 5)
+    gc.collect()
+
+    assert counter.labels().get() == 200
+    assert len(shards._cells) <= 1
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test observations land in the first bucket bound they don't exceed."""
+    histogram = MetricsRegistry().histogram('latency_seconds', 'Latency', [0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    cumulative, total, count = histogram.labels().get()
+    assert cumulative == [2, 3, 4]
+    assert total == pytest.approx(3.65)
+    assert count == 4
+
+
+def test_render_text_format():
+    """Test families render with HELP, TYPE and escaped labels."""
+    registry = MetricsRegistry()
+    registry.counter('requests_total', 'Requests', ['path']).labels('/a"b').inc(3)
+    registry.histogram('size', 'Size', [10]).observe(4)
+    registry.collector('temperature', 'Temp', 'gauge', lambda: [({'room': 'x'}, 21.5)])
+
+    text = registry.render()
+    assert '# HELP requests_total Requests\n# TYPE requests_total counter\n' in text
+    assert 'requests_total{path="/a\\"b"} 3\n' in text
+    assert 'size_bucket{le="10"} 1\nsize_bucket{le="+Inf"} 1\nsize_sum 4\nsize_count 1\n' in text
+    assert 'temperature{room="x"} 21.5\n' in text
+
+
+def test_duplicate_names_and_wrong_labels_are_rejected():
+    """Test registering a name twice or passing the wrong labels fails."""
+    registry = MetricsRegistry()
+    counter = registry.counter('a_total', 'A', ['x'])
+    with pytest.raises(ValueError):
+        registry.gauge('a_total', 'A')
+    with pytest.raises(ValueError):
+        counter.labels('1', '2')
+
+
+def test_status_class():
+    """Test statuses map to their class and missing ones to 'error'."""
+    assert [status_class(s) for s in (200, 302, 429, 503, None)] == \
+        ['2xx', '3xx', '4xx', '5xx', 'error']
+
+
+def test_upstream_call_times_attempts_and_counts_them():
+    """Test each attempt is observed by outcome and attempts once per call."""
+    metrics = ProxyMetrics()
+    outcomes = [ConnectionError('down'), {'ok': True}]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    call = UpstreamCall(metrics, flaky)
+    with pytest.raises(ConnectionError):
+        call()
+    assert call() == {'ok': True}
+    call.finish()
+
+    assert metrics._upstream_latency['error'].get()[2] == 1
+    assert metrics._upstream_latency['2xx'].get()[2] == 1
+    assert metrics.upstream_attempts.labels().get()[1:] == (2, 1)
+
+
+def test_async_upstream_call():
+    """Test the async wrapper awaits and observes the call."""
+    import asyncio
+
+    metrics = ProxyMetrics()
+
+    async def upstream():
+        return 42
+
+    call = AsyncUpstreamCall(metrics, upstream)
+    assert asyncio.run(call()) == 42
+    assert metrics._upstream_latency['2xx'].get()[2] == 1
+
+
+def test_rate_limit_decisions_count_cost():
+    """Test allowed and denied decisions are counted in requests charged."""
+    metrics = ProxyMetrics()
+    metrics.record_rate_limit(True, cost=5)
+    metrics.record_rate_limit(False)
+
+    text = metrics.render()
+    assert 'proxy_rate_limit_decisions_total{decision="allowed"} 5' in text
+    assert 'proxy_rate_limit_decisions_total{decision="denied"} 1' in text
@@ -0,0 +1,162 @@
+"""Unit tests for upstream micro-batching."""
+
+import asyncio
+import threading
+import pytest
+from src.services.deadline import Deadline
+from src.services.micro_batcher import BatchItemError, MicroBatcher, split_batch_response
+from src.services.circuit_breaker_registry import is_upstream_failure
+
+
+class BulkUpstream:
+    """Records bulk calls and answers every item with its own payload."""
+
+    def __init__(self, failing=(), error=None):
+        self.failing = set(failing)
+        self.error = error
+        self.payloads = []
+        self.deadlines = []
+
+    def __call__(self, payload, deadline):
+        self.payloads.append(payload)
+        self.deadlines.append(deadline)
+        if self.error is not None:
+            raise self.error
+        return {'results': [
+            {'status_code': 500, 'body': {'message': 'boom'}} if item in self.failing
+            else {'status_code': 200, 'body': {'echo': item}}
+            for item in payload['items']
+        ]}
+
+
+def submit_concurrently(batcher, items):
+    results = [None] * len(items)
+
+    def worker(i):
+        try:
+            results[i] = batcher.submit(items[i])
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_full_batch_is_sent_as_one_call():
+    """Test max_items concurrent calls share one bulk call, each getting its own result."""
+    upstream = BulkUpstream()
+    batcher = MicroBatcher(upstream, max_items=5, max_wait_ms=5000)
+
+    results = submit_concurrently(batcher, list(range(5)))
+
+    assert len(upstream.payloads) == 1
+    assert sorted(upstream.payloads[0]['items']) == list(range(5))
+    assert results == [{'echo': i} for i in range(5)]
+    assert batcher.get_stats() == {'batches': 1, 'items': 5, 'average_batch_size': 5.0}
+
+
+def test_partial_batch_is_sent_after_max_wait():
+    """Test a lone call is sent once max_wait_ms passes."""
+    upstream = BulkUpstream()
+    batcher = MicroBatcher(upstream, max_items=100, max_wait_ms=1)
+
+    assert batcher.submit('a') == {'echo': 'a'}
+    assert upstream.payloads == [{'items': ['a']}]
+
+
+def test_item_errors_are_mapped_to_their_callers():
+    """Test a failed item raises only for its caller, with the item's status."""
+    upstream = BulkUpstream(failing={1})
+    batcher = MicroBatcher(upstream, max_items=3, max_wait_ms=5000)
+
+    results = submit_concurrently(batcher, [0, 1, 2])
+
+    assert results[0] == {'echo': 0} and results[2] == {'echo': 2}
+    assert isinstance(results[1], BatchItemError)
+    assert results[1].response.status_code == 500
+    assert is_upstream_failure(results[1])
+
+
+def test_bulk_call_failure_fails_every_item():
+    """Test an error from the bulk call itself is raised to every caller."""
+    error = ConnectionError('down')
+    batcher = MicroBatcher(BulkUpstream(error=error), max_items=3, max_wait_ms=5000)
+
+    assert submit_concurrently(batcher, [0, 1, 2]) == [error] * 3
+
+
+def test_bulk_call_gets_tightest_deadline():
+    """Test the bulk call is bounded by the item deadline with least time left."""
+    upstream = BulkUpstream()
+    batcher = MicroBatcher(upstream, max_items=2, max_wait_ms=5000)
+    short, long = Deadline(5), Deadline(60)
+    threads = [threading.Thread(target=batcher.submit, args=(i, d))
+               for i, d in enumerate((long, short))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.deadlines == [short]
+
+
+def test_split_batch_response_handles_missing_items():
+    """Test results missing from a short bulk response become 502 errors."""
+    outcomes = split_batch_response({'results': [{'status_code': 200, 'body': 1}]}, 2)
+
+    assert outcomes[0] == 1
+    assert isinstance(outcomes[1], BatchItemError)
+    assert outcomes[1].response.status_code == 502
+    assert all(isinstance(o, BatchItemError) for o in split_batch_response(None, 2))
+
+
+def test_client_error_items_do_not_count_against_upstream():
+    """Test a 4xx item keeps its status so the breaker ignores it."""
+    outcome = split_batch_response(
+        {'results': [{'status_code': 422, 'body': {'message': 'bad input'}}]}, 1
+    )[0]
+
+    assert str(outcome) == 'bad input'
+    assert not is_upstream_failure(outcome)
+
+
+def test_async_calls_share_one_bulk_call():
+    """Test concurrent submit_async calls are batched and split in order."""
+    payloads = []
+
+    async def send(payload, deadline):
+        payloads.append(payload)
+        return {'results': [{'status_code': 200, 'body': item * 10}
+                            for item in payload['items']]}
+
+    batcher = MicroBatcher(send, max_items=100, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(*(batcher.submit_async(i) for i in range(4)))
+
+    assert asyncio.run(main()) == [0, 10, 20, 30]
+    assert payloads == [{'items': [0, 1, 2, 3]}]
+
+
+def test_async_cancelled_leader_releases_waiters():
+    """Test waiters fail instead of hanging when the batch leader is cancelled."""
+    async def send(payload, deadline):
+        await asyncio.sleep(10)
+
+    batcher = MicroBatcher(send, max_items=100, max_wait_ms=1)
+
+    async def main():
+        leader = asyncio.ensure_future(batcher.submit_async('a'))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(batcher.submit_async('b'))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(RuntimeError):
+            await waiter
+        return batcher._async_pending
+
+    assert asyncio.run(main()) is None
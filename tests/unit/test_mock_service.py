@@ -0,0 +1,120 @@
+"""Unit tests for the mock upstream's fault and latency injection."""
+
+import asyncio
+import random
+import pytest
+from external_mock_service.app import FaultInjector, app, faults
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def injector(**profile):
+    return FaultInjector(dict({'fail_rate': 0.0, 'latency_ms': 10}, **profile),
+                         rng=random.Random(7), clock=FakeClock())
+
+
+def test_faults_are_drawn_at_their_rates():
+    """Test each fault is drawn about as often as its rate."""
+    injected = injector(fail_rate=0.1, throttle_rate=0.2, reset_rate=0.3)
+    for _ in range(10000):
+        injected.decide()
+
+    counts = injected.counts
+    assert counts['error'] == pytest.approx(1000, rel=0.1)
+    assert counts['throttle'] == pytest.approx(2000, rel=0.1)
+    assert counts['reset'] == pytest.approx(3000, rel=0.1)
+    assert counts['ok'] == pytest.approx(4000, rel=0.1)
+    assert counts['hang'] == counts['drip'] == 0
+
+
+@pytest.mark.parametrize('distribution, low, high', [
+    ('fixed', 10, 10), ('lognormal', 1, 100), ('bimodal', 10, 1000), ('long_tail', 10, 30000)
+])
+def test_latency_distributions(distribution, low, high):
+    """Test latencies stay within their distribution's range and have its median."""
+    injected = injector(latency=distribution, slow_fraction=0.2, tail_alpha=1.0)
+    samples = sorted(injected.latency_ms(injected.profile()) for _ in range(2000))
+
+    assert low <= samples[0] and samples[-1] <= high
+    # The median of a Pareto tail with alpha 1 is twice its minimum
+    median = 20 if distribution == 'long_tail' else 10
+    assert samples[1000] == pytest.approx(median, rel=0.2)
+    if distribution == 'bimodal':
+        assert samples.count(1000) == pytest.approx(400, rel=0.2)
+
+
+def test_schedule_phases_override_the_profile_over_time():
+    """Test an outage schedule applies its phases in turn, then ends or repeats."""
+    injected = injector()
+    injected.configure({'schedule': [{'seconds': 10, 'fail_rate': 1.0},
+                                     {'seconds': 5, 'latency_ms': 500}]})
+    clock = injected.clock
+
+    assert injected.profile()['fail_rate'] == 1.0
+    clock.now = 12
+    assert injected.profile()['fail_rate'] == 0.0 and injected.profile()['latency_ms'] == 500
+    clock.now = 16
+    assert injected.active_phase() is None and injected.profile()['latency_ms'] == 10
+
+    injected.configure({'repeat': True})
+    assert injected.active_phase() == 0
+
+
+def test_configure_validates_and_patches_or_replaces():
+    """Test bad settings are rejected and PATCH keeps what PUT resets."""
+    injected = injector()
+    for bad in ({'profile': {'nope': 1}}, {'profile': {'fail_rate': 2}},
+                {'profile': {'fail_rate': 0.6, 'reset_rate': 0.6}},
+                {'profile': {'latency': 'uniform'}}, {'schedule': [{'fail_rate': 1}]},
+                {'profile': {'throttle_status': 500}}, {'other': 1}, None):
+        with pytest.raises(ValueError):
+            injected.configure(bad)
+
+    injected.configure({'profile': {'throttle_rate': 0.5}})
+    injected.configure({'profile': {'latency_ms': 1}})
+    assert injected.profile()['throttle_rate'] == 0.5
+    injected.configure({'profile': {'latency_ms': 1}}, replace=True)
+    assert injected.profile()['throttle_rate'] == 0.0
+
+
+@pytest.fixture
+def client():
+    yield app.test_client()
+    faults.reset()
+
+
+def test_control_endpoint_changes_responses(client):
+    """Test faults set through /control/faults apply to the next requests."""
+    async def scenario():
+        response = await client.put('/control/faults', json={
+            'profile': {'latency_ms': 0, 'fail_rate': 0.0, 'throttle_rate': 1.0, 'throttle_status': 503,
+                        'retry_after_seconds': 7}
+        })
+        assert response.status_code == 200
+        throttled = await client.post('/external-api/process', json={'q': 1})
+        assert throttled.status_code == 503
+        assert throttled.headers['Retry-After'] == '7'
+
+        await client.patch('/control/faults', json={'profile': {'throttle_rate': 0.0,
+                                                                'drip_rate': 1.0,
+                                                                'drip_interval_ms': 0}})
+        dripped = await client.post('/external-api/process', json={'q': 1})
+        assert dripped.status_code == 200
+        assert (await dripped.get_json())['received_data'] == {'q': 1}
+
+        bad = await client.patch('/control/faults', json={'profile': {'fail_rate': -1}})
+        assert bad.status_code == 400
+
+        state = await (await client.get('/control/faults')).get_json()
+        assert state['counts']['throttle'] == 1 and state['counts']['drip'] == 1
+
+        await client.delete('/control/faults')
+        assert faults.profile()['drip_rate'] == 0.0
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+"""Multi-threaded stress tests for the rate limiter engines."""
+
+import threading
+import time
+import pytest
+from src.services.rate_limiter import create_rate_limiter
+
+ALGORITHMS = ['sliding_log', 'sliding_window', 'gcra']
+
+
+def _hammer(limiter, client_ids, calls_per_thread, threads):
+    """Run is_allowed from many threads; return (admitted per client, elapsed)."""
+    admitted = {client_id: 0 for client_id in client_ids}
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(index):
+        local = {client_id: 0 for client_id in client_ids}
+        start_barrier.wait()
+        for i in range(calls_per_thread):
+            client_id = client_ids[(index + i) % len(client_ids)]
+            local[client_id] += limiter.is_allowed(client_id)
+        with lock:
+            for client_id, count in local.items():
+                admitted[client_id] += count
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return admitted, time.perf_counter() - start
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_no_over_admission_on_shared_client(algorithm):
+    """Test concurrent checks for one client never exceed its quota."""
+    limiter = create_rate_limiter(algorithm, window_size=600, max_requests=500)
+
+    admitted, _ = _hammer(limiter, ['shared'], calls_per_thread=200, threads=32)
+    assert admitted['shared'] == 500
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_no_over_admission_across_many_clients(algorithm):
+    """Test per-client quotas hold when threads interleave many clients."""
+    limiter = create_rate_limiter(algorithm, window_size=600, max_requests=50)
+    client_ids = [f'client-{i}' for i in range(64)]
+
+    admitted, _ = _hammer(limiter, client_ids, calls_per_thread=400, threads=16)
+    assert all(count == 50 for count in admitted.values())
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_throughput_scaling(algorithm, record_property):
+    """Measure checks per second from 1 to 32 threads on distinct clients."""
+    total_calls = 64000
+    for threads in (1, 2, 4, 8, 16, 32):
+        limiter = create_rate_limiter(algorithm, window_size=600,
+                                      max_requests=10 ** 9)
+        client_ids = [f'client-{i}' for i in range(1024)]
+        _, elapsed = _hammer(limiter, client_ids, total_calls // threads, threads)
+        record_property(f'{algorithm}_threads_{threads}_ops_per_sec',
+                        round(total_calls / elapsed))
+
+        assert sum(len(shard) for shard in _tables(limiter)) == len(client_ids)
+
+
+def _tables(limiter):
+    for name in ('requests', 'counters', 'tats'):
+        table = getattr(limiter, name, None)
+        if table is not None:
+            return table.shards
+    return []
+
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_cost_is_charged_atomically(algorithm):
+    """Test multi-unit checks admit whole batches only while quota remains."""
+    limiter = create_rate_limiter(algorithm, window_size=600, max_requests=10)
+
+    assert limiter.is_allowed('client', cost=6)
+    assert not limiter.is_allowed('client', cost=5)
+    assert limiter.is_allowed('client', cost=4)
+    assert not limiter.is_allowed('client')
+    assert limiter.get_remaining_requests('client') == 0
@@ -0,0 +1,124 @@
+"""Unit tests for the upstream response cache."""
+
+import json
+import pytest
+from src.services import response_cache as response_cache_module
+from src.services.response_cache import (
+    ResponseCache, canonical_key, ttl_from_headers, wants_cache
+)
+
+
+class FakeMonotonic:
+    """Controllable replacement for time.monotonic."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeMonotonic()
+    monkeypatch.setattr(response_cache_module.time, 'monotonic', fake)
+    return fake
+
+
+def body_of_size(size):
+    """JSON body whose compact serialization is exactly size bytes."""
+    return {'v': 'x' * (size - len(json.dumps({'v': ''}, separators=(',', ':'))))}
+
+
+def test_canonical_key_ignores_key_order():
+    """Test equal bodies hash equal and differing calls do not."""
+    key = canonical_key('post', 'http://up/a', {'b': 1, 'a': [1, 2]})
+    assert key == canonical_key('POST', 'http://up/a', {'a': [1, 2], 'b': 1})
+    assert key != canonical_key('POST', 'http://up/b', {'a': [1, 2], 'b': 1})
+    assert key != canonical_key('POST', 'http://up/a', {'a': [2, 1], 'b': 1})
+    assert key != canonical_key('GET', 'http://up/a', {'a': [1, 2], 'b': 1})
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('true', True), ('1', True), ('USE', True), (None, False), ('', False), ('no', False)
+])
+def test_wants_cache(value, expected):
+    assert wants_cache(value) is expected
+
+
+@pytest.mark.parametrize('cache_control, expected', [
+    (None, 30),
+    ('public', 30),
+    ('max-age=120', 120),
+    ('public, s-maxage=10, max-age=120', 10),
+    ('no-store', 0),
+    ('max-age=60, private', 0),
+    ('no-cache', 0),
+    ('max-age=soon', 0),
+])
+def test_ttl_from_cache_control(cache_control, expected):
+    """Test the entry lifetime follows the upstream's Cache-Control."""
+    headers = {'Cache-Control': cache_control} if cache_control else {}
+    assert ttl_from_headers(headers, default=30) == expected
+
+
+def test_hit_miss_and_expiry(clock):
+    """Test entries are served until their TTL passes."""
+    cache = ResponseCache(default_ttl=10)
+    assert cache.get('k') is None
+
+    assert cache.put('k', {'answer': 42})
+    assert cache.get('k') == {'answer': 42}
+
+    clock.now += 10
+    assert cache.get('k') is None
+
+    stats = cache.get_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['expirations'] == 1
+    assert stats['entries'] == 0
+    assert stats['bytes'] == 0
+
+
+def test_upstream_max_age_overrides_default(clock):
+    """Test a Cache-Control max-age sets the entry's own TTL."""
+    cache = ResponseCache(default_ttl=10)
+    cache.put('long', {'v': 1}, {'Cache-Control': 'max-age=100'})
+    assert not cache.put('never', {'v': 2}, {'Cache-Control': 'no-store'})
+
+    clock.now += 50
+    assert cache.get('long') == {'v': 1}
+    assert cache.get('never') is None
+
+
+def test_byte_limit_evicts_least_recently_used(clock):
+    """Test the cache stays under max_bytes by evicting LRU entries."""
+    cache = ResponseCache(max_bytes=300)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, body_of_size(100))
+    assert cache.get_stats()['bytes'] == 300
+
+    cache.get('a')
+    cache.put('d', body_of_size(100))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get_stats()['bytes'] == 300
+
+
+def test_oversized_body_is_not_cached(clock):
+    """Test a body larger than the whole cache is refused."""
+    cache = ResponseCache(max_bytes=50)
+    assert not cache.put('big', body_of_size(51))
+    assert len(cache) == 0
+
+
+def test_replacing_entry_updates_size(clock):
+    """Test re-putting a key accounts only for the new body."""
+    cache = ResponseCache()
+    cache.put('k', body_of_size(100))
+    cache.put('k', body_of_size(40))
+    assert cache.get_stats()['bytes'] == 40
+    assert len(cache) == 1
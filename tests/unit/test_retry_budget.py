@@ -0,0 +1,118 @@
+"""Unit tests for the shared retry budget."""
+
+import threading
+import pytest
+from src.services import retry_budget as retry_budget_module
+from src.services.retry_budget import RetryBudget
+from src.services.retry_strategy import RetryStrategy
+
+
+class FakeMonotonic:
+    """Controllable replacement for time.monotonic."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeMonotonic()
+    monkeypatch.setattr(retry_budget_module.time, 'monotonic', fake)
+    return fake
+
+
+def test_retries_limited_to_ratio_of_successes(clock):
+    """Test 100 successful first attempts at 10% earn exactly 10 retries."""
+    budget = RetryBudget(ratio=0.1, min_retries_per_second=0)
+    for _ in range(100):
+        budget.record_success()
+
+    allowed = sum(budget.try_acquire() for _ in range(20))
+    assert allowed == 10
+    stats = budget.get_stats()
+    assert stats['retries_allowed'] == 10
+    assert stats['retries_denied'] == 10
+
+
+def test_minimum_retries_per_second_floor(clock):
+    """Test the floor allows retries without traffic and refills over time."""
+    budget = RetryBudget(ratio=0.1, min_retries_per_second=2)
+
+    assert budget.try_acquire()
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+    clock.now += 0.5
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+
+    # The floor does not accumulate beyond one second's worth
+    clock.now += 60
+    assert sum(budget.try_acquire() for _ in range(5)) == 2
+
+
+def test_banked_tokens_are_capped(clock):
+    """Test a long healthy period can't bank an unbounded retry burst."""
+    budget = RetryBudget(ratio=1.0, min_retries_per_second=0, max_tokens=5)
+    for _ in range(100):
+        budget.record_success()
+
+    assert sum(budget.try_acquire() for _ in range(10)) == 5
+
+
+def test_concurrent_withdrawals_never_overdraw():
+    """Test concurrent retries never spend more than was deposited."""
+    budget = RetryBudget(ratio=1.0, min_retries_per_second=0, max_tokens=1000)
+    for _ in range(500):
+        budget.record_success()
+    allowed = []
+
+    def worker():
+        allowed.append(sum(budget.try_acquire() for _ in range(100)))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(allowed) == 500
+    assert budget.get_stats()['retries_denied'] == 500
+
+
+def test_strategy_stops_retrying_when_budget_exhausted():
+    """Test RetryStrategy makes a single attempt once the budget is spent."""
+    budget = RetryBudget(ratio=0.1, min_retries_per_second=0)
+    strategy = RetryStrategy(max_attempts=3, initial_delay_ms=1, budget=budget)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError('down')
+
+    with pytest.raises(ConnectionError):
+        strategy.execute(failing)
+    assert len(calls) == 1
+    assert budget.get_stats()['retries_denied'] == 1
+
+
+def test_strategy_successes_fund_retries():
+    """Test successful first attempts deposit into the budget they share."""
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0)
+    strategy = RetryStrategy(max_attempts=2, initial_delay_ms=1, budget=budget)
+    for _ in range(2):
+        assert strategy.execute(lambda: 'ok') == 'ok'
+
+    outcomes = [ConnectionError('blip'), 'recovered']
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert strategy.execute(flaky) == 'recovered'
+    assert budget.get_stats()['retries_allowed'] == 1
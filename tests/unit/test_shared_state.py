@@ -0,0 +1,110 @@
+"""Unit tests for the shared memory state backend."""
+
+import multiprocessing
+import time
+import pytest
+from src.services import circuit_breaker as circuit_breaker_module
+from src.services.rate_limiter import create_rate_limiter
+from src.services.shared_state import SharedCircuitBreaker, SharedClientTable
+
+
+def _admit(path, algorithm, calls, results):
+    limiter = create_rate_limiter(algorithm, window_size=600, max_requests=100,
+                                  backend='shared_memory', shared_path=path)
+    results.put(sum(limiter.is_allowed('shared-client') for _ in range(calls)))
+
+
+@pytest.mark.parametrize('algorithm', ['sliding_window', 'gcra'])
+def test_workers_share_one_quota(tmp_path, algorithm):
+    """Test several processes together admit exactly one quota."""
+    path = str(tmp_path / 'ratelimit')
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [
+        context.Process(target=_admit, args=(path, algorithm, 60, results))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(results.get() for _ in workers) == 100
+
+
+def test_state_survives_reopen(tmp_path):
+    """Test a restarted worker sees the state left by its predecessor."""
+    path = str(tmp_path / 'ratelimit')
+    first = create_rate_limiter('gcra', window_size=60, max_requests=3,
+                                backend='shared_memory', shared_path=path)
+    for _ in range(3):
+        assert first.is_allowed('a')
+    first.tats.close()
+
+    second = create_rate_limiter('gcra', window_size=60, max_requests=3,
+                                 backend='shared_memory', shared_path=path)
+    assert second.is_allowed('a') is False
+    assert second.get_reset_time('a') > 0
+
+
+def test_table_is_fixed_size_and_evicts(tmp_path):
+    """Test a full bucket evicts its least recently written slot."""
+    table = SharedClientTable(str(tmp_path / 'table'), max_entries=8, ttl=100)
+    start = time.time()
+    for i in range(20):
+        table.put(f'client-{i}', [i, 1, 0], now=start + i)
+
+    assert len(table) == 8
+    assert table.evictions == 12
+    assert table.get('client-19', now=start + 20) == [19, 1, 0]
+    assert table.get('client-0', now=start + 20) is None
+    assert table.expire(now=start + 1000) == 8
+
+
+def test_sliding_log_rejects_shared_backend(tmp_path):
+    """Test the unbounded exact log can't be placed in shared memory."""
+    with pytest.raises(ValueError):
+        create_rate_limiter('sliding_log', backend='shared_memory',
+                            shared_path=str(tmp_path / 'x'))
+
+
+def test_breaker_state_is_shared(tmp_path):
+    """Test a breaker tripped by one worker is open for every worker."""
+    path = str(tmp_path / 'breaker')
+    first = SharedCircuitBreaker(path, failure_threshold=2)
+    second = SharedCircuitBreaker(path, failure_threshold=2)
+
+    first.record_failure(first.acquire())
+    second.record_failure(second.acquire())
+    assert first.get_state() == 'OPEN'
+    assert second.get_state() == 'OPEN'
+
+    with pytest.raises(Exception):
+        second.call(lambda: 'never called')
+
+    first.reset()
+    assert second.get_state() == 'CLOSED'
+
+
+def test_half_open_trials_are_limited_host_wide(tmp_path, monkeypatch):
+    """Test HALF_OPEN trial permits are shared between workers."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(circuit_breaker_module.time, 'time', lambda: now[0])
+    path = str(tmp_path / 'breaker')
+    first = SharedCircuitBreaker(path, failure_threshold=1, reset_timeout=10,
+                                 half_open_max_calls=1, success_threshold=2)
+    second = SharedCircuitBreaker(path, failure_threshold=1, reset_timeout=10,
+                                  half_open_max_calls=1, success_threshold=2)
+    first.record_failure(first.acquire())
+
+    now[0] += 10
+    trial = first.acquire()
+    assert trial is not None
+    assert second.get_state() == 'HALF_OPEN'
+    assert second.acquire() is None
+
+    first.record_success(trial)
+    second_trial = second.acquire()
+    assert second_trial is not None
+    second.record_success(second_trial)
+    assert first.get_state() == 'CLOSED'
@@ -0,0 +1,160 @@
+"""Unit tests for single-flight request coalescing."""
+
+import asyncio
+import threading
+import time
+import pytest
+from src.services.single_flight import SingleFlight
+
+
+class SlowUpstream:
+    """Counts calls and blocks each one until released."""
+
+    def __init__(self, result='ok', error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def run_concurrently(flight, key, func, count, **kwargs):
+    results = [None] * count
+
+    def worker(i):
+        try:
+            results[i] = flight.do(key, func, **kwargs)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_waiters(flight, count):
+    deadline = time.monotonic() + 5
+    while flight.coalesced < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def test_concurrent_identical_calls_share_one_call():
+    """Test waiters get the leader's result from a single upstream call."""
+    flight = SingleFlight()
+    upstream = SlowUpstream(result={'v': 1})
+
+    threads, results = run_concurrently(flight, 'k', upstream, 10)
+    wait_for_waiters(flight, 9)
+    upstream.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.calls == 1
+    assert results == [{'v': 1}] * 10
+    stats = flight.get_stats()
+    assert stats['upstream_calls'] == 1
+    assert stats['coalesced'] == 9
+    assert stats['coalescing_ratio'] == pytest.approx(0.9)
+    assert stats['in_flight'] == 0
+
+
+def test_error_is_shared_and_key_released():
+    """Test a failing call fails every waiter and the next call starts fresh."""
+    flight = SingleFlight()
+    upstream = SlowUpstream(error=ConnectionError('down'))
+
+    threads, results = run_concurrently(flight, 'k', upstream, 5)
+    wait_for_waiters(flight, 4)
+    upstream.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert upstream.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+    assert flight.do('k', lambda: 'recovered') == 'recovered'
+    assert flight.get_stats()['in_flight'] == 0
+
+
+def test_distinct_keys_are_not_coalesced():
+    """Test calls with different keys run independently."""
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.get_stats()['coalesced'] == 0
+
+
+def test_waiter_times_out_without_affecting_leader():
+    """Test a waiter gives up after wait_timeout while the leader finishes."""
+    flight = SingleFlight()
+    upstream = SlowUpstream()
+
+    leader, leader_result = run_concurrently(flight, 'k', upstream, 1)
+    while upstream.calls == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(TimeoutError):
+        flight.do('k', upstream, wait_timeout=0.05)
+
+    upstream.release.set()
+    leader[0].join()
+    assert leader_result == ['ok']
+    assert upstream.calls == 1
+
+
+def test_async_calls_share_one_call():
+    """Test the async path coalesces concurrent calls on one loop."""
+    flight = SingleFlight()
+    calls = []
+
+    async def upstream(n):
+        calls.append(n)
+        await asyncio.sleep(0.05)
+        return n * 2
+
+    async def main():
+        return await asyncio.gather(*(
+            flight.do_async('k', upstream, 21) for _ in range(10)
+        ))
+
+    assert asyncio.run(main()) == [42] * 10
+    assert calls == [21]
+    assert flight.get_stats()['coalescing_ratio'] == pytest.approx(0.9)
+
+
+def test_async_error_and_cancellation_release_waiters():
+    """Test async waiters see the leader's error, or a failure if it is cancelled."""
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ConnectionError('down')
+
+    async def hanging():
+        await asyncio.sleep(10)
+
+    async def main():
+        errors = await asyncio.gather(
+            *(flight.do_async('fail', failing) for _ in range(3)),
+            return_exceptions=True
+        )
+
+        leader = asyncio.ensure_future(flight.do_async('hang', hanging))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do_async('hang', hanging))
+        await asyncio.sleep(0)
+        leader.cancel()
+        waiter_error = await asyncio.gather(waiter, return_exceptions=True)
+        return errors, waiter_error[0]
+
+    errors, waiter_error = asyncio.run(main())
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert isinstance(waiter_error, RuntimeError)
+    assert flight.get_stats()['in_flight'] == 0
@@ -0,0 +1,116 @@
+"""Unit tests for the sliding window counter rate limiter."""
+
+import random
+import pytest
+from src.services import rate_limiter as rate_limiter_module
+from src.services.rate_limiter import (
+    RateLimiter,
+    SlidingWindowCounterRateLimiter,
+    create_rate_limiter,
+)
+
+
+class FakeClock:
+    """Manually advanced replacement for time.time()."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, 'time', fake)
+    return fake
+
+
+def test_allows_up_to_quota_then_denies(clock):
+    """Test quota is enforced within a window."""
+    limiter = SlidingWindowCounterRateLimiter(window_size=60, max_requests=3)
+
+    assert [limiter.is_allowed('a') for _ in range(4)] == [True, True, True, False]
+    assert limiter.get_remaining_requests('a') == 0
+    assert limiter.is_allowed('b') is True
+
+
+def test_state_is_constant_size_per_client(clock):
+    """Test large quotas don't grow per-client state."""
+    limiter = SlidingWindowCounterRateLimiter(window_size=60, max_requests=5000)
+
+    for _ in range(5000):
+        limiter.is_allowed('a')
+    assert len(limiter.counters.get('a', clock.now)) == 3
+    assert limiter.is_allowed('a') is False
+
+
+def test_previous_window_is_weighted(clock):
+    """Test the previous window's count decays across the current window."""
+    limiter = SlidingWindowCounterRateLimiter(window_size=60, max_requests=10)
+    clock.now = 60 * 20000.0
+
+    for _ in range(10):
+        assert limiter.is_allowed('a')
+
+    # Halfway into the next window half of the previous count still applies
+    clock.now += 90
+    assert limiter.get_remaining_requests('a') == 5
+    assert limiter.get_reset_time('a') == 0
+    assert sum(limiter.is_allowed('a') for _ in range(10)) == 5
+
+    # Everything expires after two full windows
+    clock.now += 120
+    assert limiter.get_remaining_requests('a') == 10
+
+
+def test_reset_time_when_limited(clock):
+    """Test reset time points at the moment a request is allowed again."""
+    limiter = SlidingWindowCounterRateLimiter(window_size=60, max_requests=10)
+    clock.now = 60 * 20000.0
+
+    for _ in range(10):
+        limiter.is_allowed('a')
+    clock.now += 30
+
+    reset = limiter.get_reset_time('a')
+    assert reset == 31
+    clock.now += reset
+    assert limiter.is_allowed('a') is True
+
+
+def test_unknown_client_lookups_do_not_create_entries(clock):
+    """Test read-only lookups don't allocate client state."""
+    limiter = SlidingWindowCounterRateLimiter(window_size=60, max_requests=10)
+
+    assert limiter.get_remaining_requests('ghost') == 10
+    assert limiter.get_reset_time('ghost') == 0
+    assert len(limiter.counters) == 0
+
+
+@pytest.mark.parametrize('rate_multiplier', [0.5, 1.5, 3.0])
+def test_accuracy_against_exact_engine(clock, rate_multiplier):
+    """Test admissions track the exact sliding log on random traffic."""
+    window, quota = 10, 100
+    exact = RateLimiter(window_size=window, max_requests=quota)
+    approx = SlidingWindowCounterRateLimiter(window_size=window, max_requests=quota)
+    rng = random.Random(42)
+    mean_gap = window / (quota * rate_multiplier)
+
+    exact_allowed = approx_allowed = 0
+    for _ in range(int(quota * rate_multiplier * 20)):
+        clock.now += rng.expovariate(1 / mean_gap)
+        exact_allowed += exact.is_allowed('c')
+        approx_allowed += approx.is_allowed('c')
+
+    assert abs(approx_allowed - exact_allowed) <= 0.05 * exact_allowed
+
+
+def test_factory_selects_engine():
+    """Test engines are selectable by name."""
+    assert isinstance(create_rate_limiter('sliding_log'), RateLimiter)
+    assert isinstance(create_rate_limiter('sliding_window', max_requests=5),
+                      SlidingWindowCounterRateLimiter)
+    with pytest.raises(ValueError):
+        create_rate_limiter('nope')
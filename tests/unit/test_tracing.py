@@ -0,0 +1,145 @@
+"""Unit tests for request tracing."""
+
+import json
+import asyncio
+from src.services.deadline import DEADLINE_HEADER, Deadline
+from src.services.external_service_client import ExternalServiceClient
+from src.services.retry_strategy import RetryStrategy
+from src.services.tracing import (
+    JsonLinesExporter, SpanExporter, Tracer, parse_traceparent, propagation_headers, span
+)
+
+CALLER = '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'
+
+
+class CollectingExporter(SpanExporter):
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def test_spans_are_noops_outside_a_trace():
+    """Test untraced code gets the shared no-op span and no headers."""
+    assert span('a') is span('b')
+    with span('a') as s:
+        s.set('k', 1)
+    assert propagation_headers() == {}
+
+
+def test_spans_nest_under_the_request():
+    """Test spans record their parent and are summed per name in Server-Timing."""
+    tracer = Tracer()
+    trace = tracer.start('/api/proxy/data')
+    with span('upstream') as upstream:
+        with span('backoff'):
+            pass
+        with span('backoff'):
+            pass
+    tracer.finish(trace)
+
+    backoffs = [s for s in trace.spans if s.name == 'backoff']
+    assert [s.parent_id for s in backoffs] == [upstream.span_id] * 2
+    assert upstream.parent_id == trace.root.span_id
+    assert [entry.split(';')[0] for entry in trace.server_timing().split(', ')] == \
+        ['backoff', 'upstream', 'total']
+    assert span('after') is span('other')
+
+
+def test_traceparent_is_continued_and_propagated():
+    """Test a caller's trace id is kept and upstream calls get the current span as parent."""
+    tracer = Tracer()
+    trace = tracer.start('/api/proxy/data', CALLER)
+    assert trace.root.parent_id == '00f067aa0ba902b7'
+    with span('upstream') as upstream:
+        header = propagation_headers()['traceparent']
+    tracer.finish(trace)
+
+    assert header == f'00-4bf92f3577b34da6a3ce929d0e0e4736-{upstream.span_id}-01'
+
+
+def test_parse_traceparent_rejects_malformed_headers():
+    """Test invalid traceparent values start a new trace instead."""
+    assert parse_traceparent(CALLER) == ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7', '01')
+    for value in (None, '', 'garbage', CALLER.replace('00-', 'ff-', 1),
+                  '00-' + '0' * 32 + '-00f067aa0ba902b7-01', CALLER.replace('4bf9', 'xyz!'),
+                  CALLER + '-extra'):
+        assert parse_traceparent(value) is None
+
+    trace = Tracer().start('/x', 'garbage')
+    assert trace.root.parent_id is None and len(trace.trace_id) == 32
+    Tracer().finish(trace)
+
+
+def test_client_sends_traceparent_with_deadline():
+    """Test upstream call headers carry both the trace and the deadline."""
+    client = ExternalServiceClient('http://upstream')
+    assert client._call_options(None) == (client.timeout, None)
+
+    tracer = Tracer()
+    trace = tracer.start('/api/proxy/data')
+    timeout, headers = client._call_options(Deadline(5))
+    tracer.finish(trace)
+    client.close()
+
+    assert set(headers) == {'traceparent', DEADLINE_HEADER}
+    assert headers['traceparent'].split('-')[2] == trace.root.span_id
+
+
+def test_retry_backoff_is_a_span():
+    """Test sleeps between retries are recorded as backoff spans."""
+    outcomes = [ConnectionError('down'), 'ok']
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    tracer = Tracer()
+    trace = tracer.start('/api/proxy/data')
+    assert RetryStrategy(max_attempts=2, initial_delay_ms=1, jitter=False).execute(flaky) == 'ok'
+    tracer.finish(trace)
+
+    assert [s.name for s in trace.spans] == ['backoff', '/api/proxy/data']
+
+
+def test_async_spans_follow_the_task():
+    """Test concurrent tasks each record spans into their own trace."""
+    tracer = Tracer()
+
+    async def request(name):
+        trace = tracer.start(name)
+        with span('upstream'):
+            await asyncio.sleep(0.01)
+        tracer.finish(trace)
+        return trace
+
+    async def main():
+        return await asyncio.gather(request('a'), request('b'))
+
+    for trace in asyncio.run(main()):
+        assert [s.name for s in trace.spans] == ['upstream', trace.root.name]
+
+
+def test_exporters_receive_finished_traces(tmp_path):
+    """Test traces are handed to every exporter and failures are contained."""
+    class Broken(SpanExporter):
+        def export(self, trace):
+            raise RuntimeError('collector down')
+
+    path = tmp_path / 'traces.jsonl'
+    collecting = CollectingExporter()
+    tracer = Tracer(exporters=[Broken(), JsonLinesExporter(str(path)), collecting])
+    trace = tracer.start('/api/proxy/data', CALLER)
+    with span('cache', hit=False):
+        pass
+    tracer.finish(trace)
+    tracer.close()
+
+    assert collecting.traces == [trace]
+    record = json.loads(path.read_text())
+    assert record['trace_id'] == '4bf92f3577b34da6a3ce929d0e0e4736'
+    assert record['spans'][0]['name'] == 'cache'
+    assert record['spans'][0]['attributes'] == {'hit': False}